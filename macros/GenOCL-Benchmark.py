@@ -0,0 +1,575 @@
+"""
+=========================================================
+                   GenOCL-Benchmark.py
+ Measure the cost of the GenOCL transformation
+=========================================================
+
+The functions of GenOCL.py are loaded as a library (see
+GENOCL_AS_LIBRARY at the end of GenOCL.py) and applied to
+snapshot records built here, so this script can be run as
+a Modelio macro as well as with a plain python 2 interpreter:
+
+	python GenOCL-Benchmark.py templates
+	python GenOCL-Benchmark.py scaling results.json
+	python GenOCL-Benchmark.py profiles
+	python GenOCL-Benchmark.py exml
+	python GenOCL-Benchmark.py projects
+
+Micro-benchmark of the templates
+--------------------------------
+Each USE construct (class header, attribute, operation,
+association end, enumeration, commented invariant) is rendered
+with the former '+' concatenation loops ("before") and with the
+precompiled templates of GenOCL ("after"), for lists of 1, 10
+and 100 parents, parameters, literals or notes. Both versions
+must produce the same text. The cost of one render is printed
+in microseconds.
+
+Scaling benchmark
+-----------------
+Synthetic models (see lib/umlmodel.py) of SCALING_SIZES classes,
+with attributes, operations, inheritance chains, associations of
+each kind, enumerations and constraints in proportion, are
+generated with GenOCL. The wall time of the generation, the peak
+memory and the size of the output are printed and written in
+JSON to RESULTS_FILE, so that the results of two versions of
+GenOCL can be compared.
+
+Generation profiles
+-------------------
+The synthetic model of PROFILES_SIZE classes and the root
+package of each project of PROJECTS, read with lib/exml.py,
+are generated with each generation profile of GenOCL (see
+PROFILES). The wall time and the number of properties of the
+model elements read are printed for each profile. A profile
+saves the reads of the parts it leaves out, each a Jython bean
+call in Modelio; a read of lib/umlmodel.py costs little, so the
+times measured here only differ when the parts left out are a
+large share of the output (the constraints of CyberResidences).
+
+EXML parsing
+------------
+The EXML files of the projects of the workspace (EXML_PROJECTS)
+are parsed with lib/exml.py sequentially and with each number
+of workers of EXML_WORKERS (processes with python, threads with
+jython). The number of files parsed per second is printed and
+the parallel results are checked against the sequential ones.
+
+Bundled projects
+----------------
+The root package of each project of PROJECTS is read with
+lib/exml.py and generated:
+  - by the current generator, its output written one print
+    statement per line on a sink standing for the console (a
+    null file, much faster than the Modelio console), and
+    written by the Emitter in one bulk write. This compares
+    the cost of the two ways of writing the same text only:
+    the print functions of the baseline generator are not
+    measured, the gain of the snapshot is in the reads below,
+  - with the model and the snapshot records wrapped in
+    counting proxies (see lib/genprofiler.py): the properties
+    of the model read by the snapshot, each read once, and the
+    properties of the records read by the rendering, each of
+    which was a bean read of the model before the snapshot.
+"""
+
+import os
+import gc
+import sys
+import time
+import json
+
+# The functions shared by the GenOCL scripts are in lib/genoclscript.py,
+# next to this file or in the macros directory of the Modelio workspace
+# when run as a macro
+if '__file__' in globals():
+	sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib'))
+else:
+	from org.modelio.api.modelio import Modelio
+	sys.path.append(os.path.join(Modelio.getInstance().getContext().getWorkspacePath().toString(), 'macros', 'lib'))
+import genoclscript
+
+# Benchmark options
+# BENCHMARKS: benchmarks to run ('templates', 'scaling', 'profiles',
+#    'exml', 'projects')
+# SCALING_SIZES: numbers of classes of the synthetic models
+# SCALING_REPEAT: number of generations measured for each size
+# RESULTS_FILE: JSON file of the scaling results (None for no file)
+BENCHMARKS = ['templates', 'scaling', 'profiles', 'exml', 'projects']
+SCALING_SIZES = [10, 100, 1000]
+SCALING_REPEAT = 3
+RESULTS_FILE = None
+# PROFILES_SIZE: number of classes of the model of the profiles benchmark
+# PROFILES_REPEAT: number of generations measured for each profile
+PROFILES_SIZE = 1000
+PROFILES_REPEAT = 10
+# EXML_PROJECTS: project directories of the EXML benchmark, relative
+#    to the workspace
+# EXML_WORKERS: numbers of parallel workers measured
+# EXML_REPEAT: number of parsings measured for each number of workers
+EXML_PROJECTS = ['CyberResidences', 'UMLTestCases', 'SandboxProject']
+EXML_WORKERS = [2, 4, 8]
+EXML_REPEAT = 3
+# PROJECTS: project directories of the projects benchmark, relative to
+#    the workspace
+# PROJECTS_REPEAT: number of generations measured for each project
+PROJECTS = ['CyberResidences', 'UMLTestCases', 'SandboxProject']
+PROJECTS_REPEAT = 5
+
+
+#---------------------------------------------------------
+#   Former versions of the constructs (before)
+#---------------------------------------------------------
+
+def noteBefore(notes):
+	result = ''
+	for note in notes:
+		if len(note) > 0:
+			result = result + '-- '+ note
+	return result
+
+def classHeaderBefore(g, clazz):
+	parents = clazz.parents
+	i = 0
+	size = len(parents)
+	result = ' < '
+	while i < (size - 1):
+		result = result + parents[i] + ', '
+		i = i + 1
+	if size > 0:
+		result = result + parents[i]
+	else:
+		result = ''
+	return g['abstract'](clazz) + 'class ' + clazz.name + result
+
+def attributeBefore(g, attribute):
+	return '\t' + attribute.name + ' : ' + attribute.oclType + ' ' + g['normalizeNote'](noteBefore(attribute.notes))
+
+def operationBefore(g, operation):
+	i = 0
+	parameters = operation.parameters
+	n = len(parameters)
+	result = ''
+	if n > 0:
+		while i < (n-1):
+			result = result + parameters[i].name + ' : ' + parameters[i].oclType + ', '
+			i = i + 1
+		result = result + parameters[i].name + ' : ' + parameters[i].oclType
+	return '\t' + operation.name + '(' + result + ') ' + g['return2OCL'](operation.returnValue)
+
+def associationEndBefore(g, end):
+	return '\t' + end.ownerName + '[' + end.multiplicityMin + '..' + end.multiplicityMax + ']' + g['associationRoleName'](end) + g['orderedEndKeyWord'](end)
+
+def enumerationBefore(g, enumeration):
+	out = g['Emitter']()
+	i = 0
+	values = enumeration.literals
+	n = len(values)
+	out.line(g['normalizeNote'](noteBefore(enumeration.notes)))
+	out.line('enum ' + enumeration.name)
+	out.line('{')
+	while i < (n - 1):
+		out.line('\t' + values[i] + ',')
+		i = i + 1
+	out.line('\t' + values[i])
+	out.line('}\n')
+	return out.getvalue()
+
+def invariantBefore(g, constraint):
+	out = g['Emitter']()
+	out.line('-- context ' + constraint.ownerName + ' inv ' + constraint.name)
+	for note in constraint.notes:
+		if len(note) != 0:
+			out.line('\t-- ' + note)
+	out.line('\n')
+	return out.getvalue()
+
+#---------------------------------------------------------
+#   Current versions of the constructs (after)
+#---------------------------------------------------------
+
+def classHeaderAfter(g, clazz):
+	return g['CLASS_HEADER'] % (g['abstract'](clazz), clazz.name, g['inheritance'](clazz))
+
+def attributeAfter(g, attribute):
+	return g['ATTRIBUTE'] % (attribute.name, attribute.oclType, g['normalizeNote'](g['umlNote2OCL'](attribute.notes)))
+
+def operationAfter(g, operation):
+	return g['OPERATION'] % (operation.name, g['parameter2OCL'](operation.parameters), g['return2OCL'](operation.returnValue))
+
+def associationEndAfter(g, end):
+	return g['ASSOCIATION_END'] % (end.ownerName, end.multiplicityMin, end.multiplicityMax, g['associationRoleName'](end), g['orderedEndKeyWord'](end))
+
+def enumerationAfter(g, enumeration):
+	return g['fragment'](g['umlEnumeration2OCL'], enumeration, None)
+
+def invariantAfter(g, constraint):
+	return g['fragment'](g['constraint2OCL'], constraint, None)
+
+#---------------------------------------------------------
+#   Records of the benchmark
+#---------------------------------------------------------
+
+def record(recordClass, **values):
+	rec = recordClass()
+	for slot in recordClass.__slots__:
+		setattr(rec, slot, values.get(slot))
+	return rec
+
+def attributeRecord(g, i, notes):
+	return record(g['AttributeRec'], name='attribute' + str(i), typeName='string', oclType='String',
+		notes=['note of attribute ' + str(j) for j in range(notes)], multiplicityMin='1', multiplicityMax='1')
+
+def constructRecords(g, size):
+	'''
+	Return (construct, record) for each construct with lists
+	of the given size
+	'''
+	names = ['Class' + str(i) for i in range(size)]
+	clazz = record(g['ClassRec'], name='Benchmark', notes=[], isAbstract=True, parents=names, attributes=[], operations=[])
+	attribute = attributeRecord(g, 0, size)
+	operation = record(g['OperationRec'], name='operation', notes=[],
+		parameters=[attributeRecord(g, i, 1) for i in range(size)], returnValue=attributeRecord(g, size, 0))
+	end = record(g['EndRec'], ownerName='Benchmark', name='role', multiplicityMin='0', multiplicityMax='*', isOrdered=True)
+	enumeration = record(g['EnumRec'], name='Kind', notes=[], literals=['LITERAL' + str(i) for i in range(size)])
+	constraint = record(g['ConstraintRec'], ownerName='Benchmark', name='invariant',
+		notes=['note ' + str(i) for i in range(size)])
+	return [
+		('class header', clazz, classHeaderBefore, classHeaderAfter),
+		('attribute', attribute, attributeBefore, attributeAfter),
+		('operation', operation, operationBefore, operationAfter),
+		('association end', end, associationEndBefore, associationEndAfter),
+		('enumeration', enumeration, enumerationBefore, enumerationAfter),
+		('invariant', constraint, invariantBefore, invariantAfter)]
+
+#---------------------------------------------------------
+#   Micro-benchmark
+#---------------------------------------------------------
+
+def renderCost(g, render, rec, duration=0.2):
+	'''
+	Return the cost of one render in microseconds
+	'''
+	count = 0
+	loops = 100
+	startTime = time.time()
+	while True:
+		for i in xrange(loops):
+			render(g, rec)
+		count = count + loops
+		elapsed = time.time() - startTime
+		if elapsed >= duration:
+			return elapsed * 1000000.0 / count
+		loops = loops * 2
+
+def templateBenchmark(g, sizes=(1, 10, 100)):
+	'''
+	Print the render cost of each construct before and after
+	the templates and return the rows of the table
+	'''
+	rows = []
+	print '%-16s %5s %12s %12s %8s' % ('construct', 'size', 'before (us)', 'after (us)', 'ratio')
+	for size in sizes:
+		for (construct, rec, before, after) in constructRecords(g, size):
+			if before(g, rec) != after(g, rec):
+				raise AssertionError('different text for ' + construct)
+			costBefore = renderCost(g, before, rec)
+			costAfter = renderCost(g, after, rec)
+			rows.append((construct, size, costBefore, costAfter))
+			print '%-16s %5d %12.2f %12.2f %8.2f' % (construct, size, costBefore, costAfter, costBefore / costAfter)
+	return rows
+
+#---------------------------------------------------------
+#   Scaling benchmark
+#---------------------------------------------------------
+
+def resetPeakMemory():
+	if genoclscript.isJython():
+		from java.lang.management import ManagementFactory
+		for pool in ManagementFactory.getMemoryPoolMXBeans():
+			pool.resetPeakUsage()
+
+def peakMemory():
+	'''
+	Return the peak memory in bytes: the peak heap usage since
+	resetPeakMemory with Jython, the maximum resident set size
+	of the process with CPython (it never decreases, so the sizes
+	are run in increasing order)
+	'''
+	if genoclscript.isJython():
+		from java.lang.management import ManagementFactory, MemoryType
+		pools = ManagementFactory.getMemoryPoolMXBeans()
+		return sum([pool.getPeakUsage().getUsed() for pool in pools if pool.getType() == MemoryType.HEAP])
+	import resource
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':
+		return peak
+	return peak * 1024
+
+def scalingParameters(size):
+	'''
+	Return the parameters of the synthetic model of size classes
+	'''
+	return {
+		'classes' : size,
+		'attributes' : 5,
+		'operations' : 2,
+		'parameters' : 2,
+		'inheritanceDepth' : 4,
+		'associations' : size,
+		'naryAssociations' : size // 10,
+		'associationClasses' : size // 10,
+		'enumerations' : max(1, size // 10),
+		'literals' : 5,
+		'constraints' : size // 5,
+		'packages' : max(1, size // 50)}
+
+def generateModel(g, root, profile='full'):
+	'''
+	Return the specification of the model generated by GenOCL
+	'''
+	context = g['GenerationContext']('Synthetic', profile=g['PROFILES'][profile])
+	return ''.join(g['iterSelection2OCL']([root], context))
+
+def scalingBenchmark(g, sizes=SCALING_SIZES, repeat=SCALING_REPEAT):
+	'''
+	Generate the synthetic model of each size, print the results
+	and return them
+	'''
+	import umlmodel
+	runs = []
+	print '%8s %10s %10s %12s %10s %8s' % ('classes', 'build (s)', 'gen (s)', 'memory (MB)', 'bytes', 'lines')
+	for size in sorted(sizes):
+		parameters = scalingParameters(size)
+		startTime = time.time()
+		root = umlmodel.syntheticModel(**parameters)
+		buildTime = time.time() - startTime
+		
+		resetPeakMemory()
+		times = []
+		for i in range(repeat):
+			startTime = time.time()
+			text = generateModel(g, root)
+			times.append(time.time() - startTime)
+		memory = peakMemory()
+		
+		run = {
+			'parameters' : parameters,
+			'elements' : umlmodel.modelSize(root),
+			'buildSeconds' : buildTime,
+			'generationSeconds' : times,
+			'bestGenerationSeconds' : min(times),
+			'peakMemoryBytes' : memory,
+			'outputBytes' : len(text),
+			'outputLines' : text.count('\n')}
+		runs.append(run)
+		print '%8d %10.3f %10.3f %12.1f %10d %8d' % (size, buildTime, min(times), memory / 1048576.0, len(text), run['outputLines'])
+	return runs
+
+#---------------------------------------------------------
+#   Generation profiles
+#---------------------------------------------------------
+
+def modelProfiles(g, modelName, root, repeat):
+	'''
+	Generate root with each profile, print the time and the number
+	of property reads of each one and return them by profile name
+	'''
+	import genprofiler
+	results = {}
+	for name in ('full', 'with-comments', 'with-constraints', 'structure-only'):
+		times = []
+		for i in range(repeat):
+			# the garbage of the previous run is not collected in this one
+			gc.collect()
+			startTime = time.time()
+			text = generateModel(g, root, name)
+			times.append(time.time() - startTime)
+		# property reads counted on a proxy of the model (see lib/genprofiler.py)
+		profiler = genprofiler.Profiler()
+		generateModel(g, profiler.proxy(root), name)
+		reads = sum([stats.reads for stats in profiler.stats.values()])
+		results[name] = {'generationSeconds' : min(times), 'propertyReads' : reads, 'outputBytes' : len(text)}
+		print '%-16s %-18s %10.4f %10d %10d' % (modelName, name, min(times), reads, len(text))
+	return results
+
+def profilesBenchmark(g, size=PROFILES_SIZE, projects=PROJECTS, repeat=PROFILES_REPEAT):
+	'''
+	Generate the synthetic model of size classes and the root package
+	of each project with each profile, print the time and the number
+	of property reads of each one and return them by model and by
+	profile name
+	'''
+	import umlmodel
+	import exml
+	workspace = os.path.dirname(genoclscript.macrosDirectory())
+	results = {}
+	print '%-16s %-18s %10s %10s %10s' % ('model', 'profile', 'gen (s)', 'reads', 'bytes')
+	root = umlmodel.syntheticModel(**scalingParameters(size))
+	results['synthetic'] = modelProfiles(g, 'synthetic', root, repeat)
+	for project in projects:
+		model = exml.loadProject(os.path.join(workspace, project))
+		for root in model.rootPackages(project):
+			results[project] = modelProfiles(g, project, root, repeat)
+	return results
+
+#---------------------------------------------------------
+#   EXML parsing
+#---------------------------------------------------------
+
+def exmlFingerprint(results):
+	'''
+	Return the content of the ExmlObject parsed, to compare two parsings
+	'''
+	return [[(o.uid, o.mc, o.name, o.pid, sorted(o.attributes.items()), o.comps, o.links) for o in objects] for objects in results]
+
+def exmlBenchmark(projects=EXML_PROJECTS, workersList=EXML_WORKERS, repeat=EXML_REPEAT):
+	'''
+	Parse the EXML files of the projects sequentially and with each
+	number of workers, print the files parsed per second and return
+	them by number of workers (1 for the sequential parsing)
+	'''
+	import exml
+	workspace = os.path.dirname(genoclscript.macrosDirectory())
+	paths = []
+	for project in projects:
+		paths.extend([path for (fragment, path) in exml.projectFiles(os.path.join(workspace, project))])
+	
+	results = {}
+	reference = None
+	print '%d EXML files (%s)' % (len(paths), ', '.join(projects))
+	print '%8s %10s %12s %8s' % ('workers', 'parse (s)', 'files/s', 'same')
+	for workers in [1] + list(workersList):
+		times = []
+		for i in range(repeat):
+			startTime = time.time()
+			parsed = exml.parseFiles(paths, workers)
+			times.append(time.time() - startTime)
+		fingerprint = exmlFingerprint(parsed)
+		if reference is None:
+			reference = fingerprint
+		results[workers] = len(paths) / min(times)
+		print '%8d %10.3f %12.0f %8s' % (workers, min(times), results[workers], fingerprint == reference)
+	return results
+
+#---------------------------------------------------------
+#   Bundled projects
+#---------------------------------------------------------
+
+def printedGeneration(g, packages, sink):
+	'''
+	Generate the packages and write the text the way GenOCL did
+	before the Emitter, one print statement per line on sink
+	(only the writing is the former one)
+	'''
+	context = g['GenerationContext']('Project')
+	for text in g['iterSelection2OCL'](packages, context):
+		for line in text.splitlines():
+			print >>sink, line
+
+def emittedGeneration(g, packages, path):
+	'''
+	Generate the packages with the Emitter in the file at path
+	'''
+	context = g['GenerationContext']('Project', False, path)
+	context.output(g['iterSelection2OCL'](packages, context))
+
+def bestTime(function, repeat):
+	times = []
+	for i in range(repeat):
+		gc.collect()
+		startTime = time.time()
+		function()
+		times.append(time.time() - startTime)
+	return min(times)
+
+def projectsBenchmark(g, projects=PROJECTS, repeat=PROJECTS_REPEAT):
+	'''
+	Generate the root package of each project, compare the cost of
+	writing the text line by line and with the Emitter, count the property reads of the snapshot
+	and of the rendering, print them and return them by project
+	'''
+	import tempfile
+	import exml
+	import genprofiler
+	workspace = os.path.dirname(genoclscript.macrosDirectory())
+	(handle, outputFile) = tempfile.mkstemp('.use')
+	os.close(handle)
+	sink = open(os.devnull, 'w')
+	results = {}
+	print '%-16s %8s %15s %17s %10s %14s %14s' % ('project', 'lines', 'print write (s)', 'emitter write (s)', 'write gain',
+		'snapshot reads', 'render reads')
+	try:
+		for project in projects:
+			model = exml.loadProject(os.path.join(workspace, project))
+			packages = model.rootPackages(project)
+			printTime = bestTime(lambda: printedGeneration(g, packages, sink), repeat)
+			emitterTime = bestTime(lambda: emittedGeneration(g, packages, outputFile), repeat)
+			f = open(outputFile)
+			try:
+				lines = len(f.readlines())
+			finally:
+				f.close()
+			
+			# reads of the model by the snapshot, then of the records by the rendering
+			context = g['GenerationContext']('Project')
+			profiler = genprofiler.Profiler()
+			contents = list(g['iterSelectionContents']([profiler.proxy(p) for p in packages], context))
+			snapshotReads = sum([stats.reads for stats in profiler.stats.values()])
+			profiler = genprofiler.Profiler()
+			''.join(g['iterSnapshot2OCL']([(name, profiler.proxy(c)) for (name, c) in contents], context))
+			renderReads = sum([stats.reads for stats in profiler.stats.values()])
+			
+			results[project] = {
+				'outputLines' : lines,
+				'printSeconds' : printTime,
+				'emitterSeconds' : emitterTime,
+				'snapshotReads' : snapshotReads,
+				'renderReads' : renderReads}
+			print '%-16s %8d %15.4f %17.4f %9.1fx %14d %14d' % (project, lines, printTime, emitterTime,
+				printTime / max(emitterTime, 1e-6), snapshotReads, renderReads)
+	finally:
+		sink.close()
+		os.remove(outputFile)
+	return results
+
+def writeResults(path, runs):
+	'''
+	Write the results of the scaling benchmark in JSON
+	'''
+	results = {
+		'date' : time.strftime('%Y-%m-%d %H:%M:%S'),
+		'python' : sys.version,
+		'platform' : sys.platform,
+		'runs' : runs}
+	f = open(path, 'w')
+	try:
+		json.dump(results, f, indent=2, sort_keys=True)
+	finally:
+		f.close()
+
+def main(arguments):
+	'''
+	Run the benchmarks named in the arguments, or BENCHMARKS.
+	The argument after 'scaling', if any, is the results file.
+	'''
+	benchmarks = [a for a in arguments if a in ('templates', 'scaling', 'profiles', 'exml', 'projects')] or BENCHMARKS
+	resultsFile = RESULTS_FILE
+	if 'scaling' in arguments and arguments.index('scaling') + 1 < len(arguments):
+		resultsFile = arguments[arguments.index('scaling') + 1]
+	
+	g = genoclscript.loadGenOCL()
+	if 'templates' in benchmarks:
+		templateBenchmark(g)
+	if 'scaling' in benchmarks:
+		runs = scalingBenchmark(g)
+		if resultsFile is not None:
+			writeResults(resultsFile, runs)
+	if 'profiles' in benchmarks:
+		profilesBenchmark(g)
+	if 'exml' in benchmarks:
+		exmlBenchmark()
+	if 'projects' in benchmarks:
+		projectsBenchmark(g)
+
+main(getattr(sys, 'argv', [])[1:])
@@ -0,0 +1,136 @@
+"""
+=========================================================
+                   GenOCL-Headless.py
+ Run GenOCL on a Modelio project without Modelio
+=========================================================
+
+The model of a project is read from its EXML files with
+lib/exml.py, and the functions of GenOCL.py, loaded as a
+library (see GENOCL_AS_LIBRARY), are applied to it. Neither
+the Modelio JVM nor its GUI are started, so the generation
+can run in continuous integration or in batch jobs with a
+plain python 2 (or jython) interpreter:
+
+	python GenOCL-Headless.py ../CyberResidences
+	python GenOCL-Headless.py ../CyberResidences CyberResidences.use
+	python GenOCL-Headless.py ../UMLTestCases tests.use Operations Enumerations
+
+The first form prints the USE specification of the root
+package of the project on the console, the second one writes
+it in a .use file, the third one generates the packages of
+the project with the given names instead of its root package.
+"""
+
+import os
+import sys
+import time
+
+# The functions shared by the GenOCL scripts are in lib/genoclscript.py,
+# next to this file or in the macros directory of the Modelio workspace
+# when run as a macro
+if '__file__' in globals():
+	sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib'))
+else:
+	from org.modelio.api.modelio import Modelio
+	sys.path.append(os.path.join(Modelio.getInstance().getContext().getWorkspacePath().toString(), 'macros', 'lib'))
+import genoclscript
+
+# Headless options
+# MODEL_NAME: name of the generated USE model (None for the name
+#    of the project directory)
+# FRAGMENTS: names of the fragments of the project read (None for
+#    all of them, the references to the elements of the fragments
+#    not read are resolved from their names)
+# PARSE_WORKERS: number of processes (threads with jython) parsing
+#    the EXML files (1 to parse them in sequence)
+# PARSE_CACHE_FILE: file where the parsed EXML files are kept between
+#    two runs so that only the changed files are parsed again (None
+#    for no cache)
+# LAZY_LOADING: read the EXML file of an element only when the
+#    generation navigates to it (see exml.LazyModel) instead of reading
+#    the whole project first (PARSE_WORKERS and PARSE_CACHE_FILE are
+#    then not used)
+# LAZY_INDEX_FILE: index of the project (see lib/exmlindex.py), relative
+#    to the workspace, where the lazy loading finds the files of the
+#    association classes and of the owners of the ends; %s is the name of
+#    the project. The index is built at the first run and only the files
+#    changed are read afterwards (None to search the files instead).
+# CHECK_OUTPUT: check the specification with lib/usecheck.py
+# SHOW_TIMING: print the load and generation times
+MODEL_NAME = None
+FRAGMENTS = None
+PARSE_WORKERS = 1
+PARSE_CACHE_FILE = None
+LAZY_LOADING = False
+LAZY_INDEX_FILE = os.path.join('.genocl-cache', '%s.index')
+CHECK_OUTPUT = False
+SHOW_TIMING = True
+
+def projectPackages(model, projectName, packageNames):
+	'''
+	Return the packages of the project named packageNames, or its
+	root package if no name is given
+	'''
+	if len(packageNames) == 0:
+		return model.rootPackages(projectName)
+	packages = []
+	for name in packageNames:
+		found = model.packagesNamed(name, projectName)
+		if len(found) == 0:
+			print '-- No package %s in %s' % (name, projectName)
+		packages.extend(found)
+	return packages
+
+def generateProject(g, projectDirectory, outputFile=None, packageNames=[]):
+	'''
+	Generate the USE specification of a project directory on the
+	console or in outputFile. Return the number of lines.
+	'''
+	import exml
+	projectName = os.path.basename(os.path.normpath(projectDirectory))
+	startTime = time.time()
+	cache = None
+	if LAZY_LOADING:
+		index = None
+		if LAZY_INDEX_FILE is not None:
+			import exmlindex
+			workspace = os.path.dirname(os.path.abspath(projectDirectory))
+			index = exmlindex.WorkspaceIndex(workspace, os.path.join(workspace, LAZY_INDEX_FILE % projectName), [projectName])
+			index.update()
+			index.save()
+		model = exml.LazyModel(projectDirectory, FRAGMENTS, index)
+	else:
+		if PARSE_CACHE_FILE is not None:
+			cache = exml.ParseCache(PARSE_CACHE_FILE)
+		model = exml.loadProject(projectDirectory, FRAGMENTS, PARSE_WORKERS, cache)
+		if cache is not None:
+			cache.save()
+	loadTime = time.time() - startTime
+
+	packages = projectPackages(model, projectName, packageNames)
+	context = g['GenerationContext'](MODEL_NAME or g['useModelName'](projectName), outputFile is None, outputFile, check=CHECK_OUTPUT)
+	nbLines = context.output(g['iterSelection2OCL'](packages, context))
+	if context.problems is not None:
+		g['printProblems'](context.problems)
+	if cache is not None:
+		print '-- %d file(s) reused, %d file(s) parsed' % (cache.reused, cache.parsed)
+	if LAZY_LOADING:
+		print '-- %d of %d file(s) read' % (len(model.loaded), len(model.paths))
+	if SHOW_TIMING:
+		print '-- %s: %d element(s) read in %.3f s, %d line(s) generated in %.3f s' % (
+			projectName, len(model.objects), loadTime, nbLines, time.time() - startTime - loadTime)
+	return nbLines
+
+def main(arguments):
+	'''
+	Generate the project named in the arguments (see above)
+	'''
+	if len(arguments) == 0:
+		print '-- Usage: GenOCL-Headless.py project [output.use [package ...]]'
+		return
+	outputFile = None
+	if len(arguments) > 1:
+		outputFile = arguments[1]
+	generateProject(genoclscript.loadGenOCL(), arguments[0], outputFile, arguments[2:])
+
+main(getattr(sys, 'argv', [])[1:])
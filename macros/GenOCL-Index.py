@@ -0,0 +1,101 @@
+"""
+=========================================================
+                    GenOCL-Index.py
+ Find the elements of the workspace projects by uuid,
+ name or metaclass
+=========================================================
+
+The elements of the EXML files of the projects of the
+workspace are indexed with lib/exmlindex.py in INDEX_FILE.
+The index is brought up to date at each run, only the
+files added or changed since the previous run being read,
+and is then searched without reading the projects:
+
+	python GenOCL-Index.py
+	python GenOCL-Index.py uid 7efd39a0-e33a-4ba8-afd9-0f3b519dfa60
+	python GenOCL-Index.py name Resid
+	python GenOCL-Index.py metaclass Enumeration
+	python GenOCL-Index.py owner 0e8266dd-dfc9-4238-a1b4-7500d4e25302
+	python GenOCL-Index.py classpart 1fd2cbde-aa65-4c7a-88af-f4c8f8eeb843
+	python GenOCL-Index.py rebuild
+
+The first form only updates the index, the next ones print
+the elements with the given uuid, with a name starting with
+the given prefix (ignoring the case), of the given metaclass,
+owned by the given element or linked to the given class part
+(the ClassAssociation of an association class), the last one
+builds the index again from scratch.
+"""
+
+import os
+import sys
+import time
+
+# The functions shared by the GenOCL scripts are in lib/genoclscript.py,
+# next to this file or in the macros directory of the Modelio workspace
+# when run as a macro
+if '__file__' in globals():
+	sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib'))
+else:
+	from org.modelio.api.modelio import Modelio
+	sys.path.append(os.path.join(Modelio.getInstance().getContext().getWorkspacePath().toString(), 'macros', 'lib'))
+import genoclscript
+
+# Index options
+# INDEX_PROJECTS: projects indexed, relative to the workspace (None
+#    for all the projects of the workspace)
+# INDEX_FILE: file of the index, relative to the workspace (in the
+#    .genocl-cache directory, ignored by git)
+# PARSE_WORKERS: number of processes (threads with jython) reading
+#    the EXML files (1 to read them in sequence)
+# SHOW_TIMING: print the update and search times
+INDEX_PROJECTS = ['CyberResidences', 'UMLTestCases', 'SandboxProject']
+INDEX_FILE = os.path.join('.genocl-cache', 'workspace.index')
+PARSE_WORKERS = 1
+SHOW_TIMING = True
+
+def printRecords(exmlindex, records):
+	'''
+	Print the records found, one per line
+	'''
+	for record in records:
+		print '%s %-20s %-30s %s  %s' % (record[exmlindex.UID], record[exmlindex.METACLASS],
+			record[exmlindex.NAME], record[exmlindex.FRAGMENT], record[exmlindex.PATH])
+	print '-- %d element(s)' % len(records)
+
+def main(arguments):
+	'''
+	Update the index and run the search named in the arguments (see
+	above)
+	'''
+	import exmlindex
+	workspace = os.path.dirname(genoclscript.macrosDirectory())
+	startTime = time.time()
+	index = exmlindex.WorkspaceIndex(workspace, os.path.join(workspace, INDEX_FILE), INDEX_PROJECTS)
+	if len(arguments) > 0 and arguments[0] == 'rebuild':
+		index.rebuild(PARSE_WORKERS)
+	else:
+		index.update(PARSE_WORKERS)
+	index.save()
+	if SHOW_TIMING:
+		print '-- %d element(s) indexed, %d file(s) read in %.3f s' % (len(index), index.read, time.time() - startTime)
+	if len(arguments) < 2:
+		return
+
+	searches = {
+		'uid'       : index.lookup,
+		'name'      : index.named,
+		'metaclass' : index.ofMetaclass,
+		'owner'     : index.ownedBy,
+		'classpart' : index.classAssociationOf }
+	if arguments[0] not in searches:
+		print '-- Usage: GenOCL-Index.py [uid | name | metaclass | owner | classpart value | rebuild]'
+		return
+	startTime = time.time()
+	records = searches[arguments[0]](arguments[1])
+	searchTime = time.time() - startTime
+	printRecords(exmlindex, records)
+	if SHOW_TIMING:
+		print '-- found in %.1f us' % (searchTime * 1e6)
+
+main(getattr(sys, 'argv', [])[1:])
@@ -0,0 +1,90 @@
+"""
+=========================================================
+                    GenOCL-Render.py
+ Render a GenOCL snapshot without the Modelio model
+=========================================================
+
+GenOCL.py saves the snapshot of the selected packages in
+a JSON file when its SNAPSHOT_FILE option is set. This
+script renders such a snapshot again, with the functions
+of GenOCL.py loaded as a library (see GENOCL_AS_LIBRARY),
+so it does not need the Modelio session and can be run
+with a plain python 2 interpreter:
+
+	python GenOCL-Render.py snapshot.json
+	python GenOCL-Render.py snapshot.json model.use
+	python GenOCL-Render.py snapshot.json state.soil 1000
+
+The first form prints the USE specification on the console,
+the second one writes it in a .use file (only the changed
+declarations with PATCH_OUTPUT_FILE), the third one writes a
+SOIL script with the given number of objects per class.
+"""
+
+import os
+import sys
+import time
+
+# The functions shared by the GenOCL scripts are in lib/genoclscript.py,
+# next to this file or in the macros directory of the Modelio workspace
+# when run as a macro
+if '__file__' in globals():
+	sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib'))
+else:
+	from org.modelio.api.modelio import Modelio
+	sys.path.append(os.path.join(Modelio.getInstance().getContext().getWorkspacePath().toString(), 'macros', 'lib'))
+import genoclscript
+
+# Render options
+# MODEL_NAME: name of the generated USE model (None for the name
+#    saved in the snapshot)
+# PATCH_OUTPUT_FILE: update only the declarations of the .use file
+#    that changed
+# CHECK_OUTPUT: check the specification with lib/usecheck.py
+# SOIL_INSTANCES: number of objects per class of the SOIL scripts
+MODEL_NAME = None
+PATCH_OUTPUT_FILE = False
+CHECK_OUTPUT = False
+SOIL_INSTANCES = 10
+
+def renderSnapshot(g, snapshotFile, outputFile=None, instances=SOIL_INSTANCES):
+	'''
+	Render the snapshot file on the console or in outputFile,
+	as a SOIL script if outputFile ends with .soil
+	'''
+	startTime = time.time()
+	(modelName, packages) = g['loadSnapshot'](snapshotFile)
+	modelName = MODEL_NAME or modelName
+	loadTime = time.time() - startTime
+
+	if outputFile is not None and outputFile.endswith('.soil'):
+		context = g['GenerationContext'](modelName)
+		nbLines = g['streamTo'](g['iterSnapshot2SOIL'](packages, instances, context), path=outputFile)
+		print '-- %s: %d line(s), load: %.3f s, render: %.3f s' % (outputFile, nbLines, loadTime, time.time() - startTime - loadTime)
+		return
+
+	context = g['GenerationContext'](modelName, outputFile is None, outputFile, patch=PATCH_OUTPUT_FILE, check=CHECK_OUTPUT)
+	nbLines = context.output(g['iterSnapshot2OCL'](packages, context))
+	if context.patched is not None:
+		print '-- %s: %d declaration(s) updated' % (outputFile, len(context.patched))
+	if context.problems is not None:
+		g['printProblems'](context.problems)
+	if outputFile is not None:
+		print '-- %s: %d line(s), load: %.3f s, render: %.3f s' % (outputFile, nbLines, loadTime, time.time() - startTime - loadTime)
+
+def main(arguments):
+	'''
+	Render the snapshot named in the arguments (see above)
+	'''
+	if len(arguments) == 0:
+		print '-- Usage: GenOCL-Render.py snapshot.json [output.use | output.soil [instances]]'
+		return
+	outputFile = None
+	instances = SOIL_INSTANCES
+	if len(arguments) > 1:
+		outputFile = arguments[1]
+	if len(arguments) > 2:
+		instances = int(arguments[2])
+	renderSnapshot(genoclscript.loadGenOCL(False), arguments[0], outputFile, instances)
+
+main(getattr(sys, 'argv', [])[1:])
@@ -44,6 +44,13 @@ Additional observations could go there
 	None
 """
 
+import os
+import sys
+import string
+import time
+import threading
+import Queue
+
 
 #---------------------------------------------------------
 #   Helpers on the source metamodel (UML metamodel)
@@ -81,40 +88,53 @@ def isAssociationClass(clazz):
 #--------------------------------------------------------- 
 
 # example
-def associationsInPackage(package):
-    """
-    Return the list of all associations that start or
-    arrive to a class which is recursively contained in
-    a package.
-    """
+def associationsInPackage(package, context=None):
+	"""
+	Return the list of all associations that start or
+	arrive to a class which is recursively contained in
+	a package (as AssociationRec snapshots, see below).
+	They are looked up in the association index of the
+	context, which holds the associations of all the
+	packages it collected: an association reaching the
+	package from a class of another collected package is
+	found too. The package is collected in a new context
+	if the given one did not collect it.
+	"""
+	if context is None or elementId(package) not in context.collectedPackages:
+		context = GenerationContext(useModelName(package.name))
+		collectPackageElements(package, context)
+	classIds = []
+	stack = [iter(package.ownedElement)]
+	while len(stack) > 0:
+		for element in stack[-1]:
+			if isinstance(element, Class):
+				classIds.append(elementId(element))
+			elif isinstance(element, Package):
+				stack.append(iter(element.ownedElement))
+				break
+		else:
+			stack.pop()
+	return context.associationIndex.ofClasses(classIds)
 
 def inheritance(clazz):
 	'''
 	Check if a class is subclass of another class 
 	then return the representation in OCL format
+	(using the parent names cached in the ClassRec)
 	'''	
-	parents = clazz.parent
-	i = 0
-	size = len(parents)
-	result = ' < '
-	
-	while i < (size - 1):
-		p = parents.get(i)
-		result = result + p.superType.name + ', '
-		i = i + 1
-	
-	if size > 0:
-		result = result + parents.get(i).superType.name
-	else:
-		result = ''
-		
-	return result
+	parents = clazz.parents
+	if len(parents) == 0:
+		return ''
+	if len(parents) == 1:
+		return ' < ' + parents[0]
+	
+	return ' < ' + ', '.join(parents)
 
 def abstract(clazz):
 	'''
 	Return 'abstract' if clazz is abstract
 	'''
-	if clazz.isIsAbstract():
+	if clazz.isAbstract:
 		return 'abstract '
 	
 	return ''
@@ -152,16 +172,16 @@ def associationClassString(asso):
 	Return 'associationClass' if asso is an association class or 'association' | 'composition'
 	| 'aggregation' if not
 	'''
-	if isAssociationRelationship(asso):
+	if asso.classPart is not None:
 		return 'associationclass '
 	
 	# Try to find the kind of association
 	kind = 'association '
-	for end in asso.end:
-		if end.aggregation == AggregationKind.KINDISCOMPOSITION:
+	for end in asso.ends:
+		if end.aggregation == 'composition':
 			kind = 'composition '
 			break
-		if end.aggregation == AggregationKind.KINDISAGGREGATION:
+		if end.aggregation == 'aggregation':
 			kind = 'aggregation '
 			break
 		
@@ -186,11 +206,490 @@ def orderedEndKeyWord(end):
 	'''
 	Return the key word 'ordered' if endAsso is ordered
 	'''
-	if end.isIsOrdered():
+	if end.isOrdered:
 		return ' ordered'
 		
 	return ''
 	 
+#---------------------------------------------------------
+#   Snapshot of the source model
+#---------------------------------------------------------
+# Each read of a property of a modelio element goes through
+# the Jython/Java bridge. The functions below read once the
+# properties needed by the transformation and copy them in
+# compact python records. The transformation functions
+# then only work on these records.
+#---------------------------------------------------------
+
+class EnumRec(object):
+	'''
+	Snapshot of an enumeration
+	'''
+	__slots__ = ('uuid', 'name', 'notes', 'literals')
+
+class AttributeRec(object):
+	'''
+	Snapshot of an attribute, also used for the parameters
+	and the return value of operations. The multiplicity is
+	only set for return values. typeId and typeName are the
+	uuid and the name of the UML type, oclType the USE type
+	(see TypeTable).
+	'''
+	__slots__ = ('name', 'typeId', 'typeName', 'oclType', 'notes', 'multiplicityMin', 'multiplicityMax')
+
+class OperationRec(object):
+	'''
+	Snapshot of an operation. returnValue is None if the
+	operation does not return anything.
+	'''
+	__slots__ = ('name', 'notes', 'parameters', 'returnValue')
+
+class ClassRec(object):
+	'''
+	Snapshot of a class. parents and parentIds are the names
+	and the uuids of the super classes.
+	'''
+	__slots__ = ('uuid', 'name', 'notes', 'isAbstract', 'parents', 'parentIds', 'attributes', 'operations')
+
+class EndRec(object):
+	'''
+	Snapshot of an association end (binary or nary).
+	aggregation is 'composition', 'aggregation' or ''.
+	'''
+	__slots__ = ('ownerId', 'ownerName', 'name', 'multiplicityMin', 'multiplicityMax', 'isOrdered', 'aggregation')
+
+class AssociationRec(object):
+	'''
+	Snapshot of an association (binary or nary). classPart is
+	the ClassRec of the class of an association class, None
+	otherwise.
+	'''
+	__slots__ = ('uuid', 'name', 'ends', 'classPart')
+
+class ConstraintRec(object):
+	'''
+	Snapshot of a constraint (a Signal owned by a class)
+	'''
+	__slots__ = ('ownerName', 'name', 'notes')
+
+def elementId(element):
+	'''
+	Return the UUID of a modelio element as a string
+	'''
+	return str(element.getUuid())
+
+def snapshotNotes(element):
+	'''
+	Return the contents of the notes of element
+	'''
+	return [note.content for note in element.descriptor]
+
+# Notes of the records of the elements whose notes are not read,
+# shared so that no list is allocated for them
+NO_NOTES = ()
+
+def noNotes(element):
+	'''
+	Used instead of snapshotNotes when the notes are not generated:
+	the notes of element are not read at all
+	'''
+	return NO_NOTES
+
+class GenerationProfile(object):
+	'''
+	Parts of the model read and generated, decided once before the
+	generation so that the parts left out are never navigated.
+	  name         name of the profile (see PROFILES)
+	  notes        False to leave the notes (descriptor) of the
+				   elements out, except those of the constraints
+	  constraints  False to leave out the Signals owned by the
+				   classes (constraints)
+	'''
+	__slots__ = ('name', 'notes', 'constraints')
+	
+	def __init__(self, name, notes, constraints):
+		self.name = name
+		self.notes = notes
+		self.constraints = constraints
+	
+	def readNotes(self, element):
+		'''
+		Return the notes of element with snapshotNotes, or noNotes
+		if they are left out. The functions are looked up by name at
+		each call so that the wrappers of a Profiler see the calls.
+		'''
+		if self.notes:
+			return snapshotNotes(element)
+		return noNotes(element)
+
+# Generation profiles by name
+PROFILES = {
+	'structure-only'   : GenerationProfile('structure-only', False, False),
+	'with-comments'    : GenerationProfile('with-comments', True, False),
+	'with-constraints' : GenerationProfile('with-constraints', False, True),
+	'full'             : GenerationProfile('full', True, True)}
+FULL_PROFILE = PROFILES['full']
+
+def snapshotType(rec, typedElement):
+	'''
+	Set the uuid and the name of the type of an attribute or a
+	parameter in its record (None and '' if no type is defined)
+	'''
+	type = typedElement.type
+	if type is None:
+		rec.typeId = None
+		rec.typeName = ''
+	else:
+		rec.typeId = elementId(type)
+		rec.typeName = type.name
+	rec.oclType = None
+
+def snapshotEnumeration(enumeration, profile=FULL_PROFILE):
+	rec = EnumRec()
+	rec.uuid = elementId(enumeration)
+	rec.name = enumeration.name
+	rec.notes = profile.readNotes(enumeration)
+	rec.literals = [literal.name for literal in enumeration.value]
+	return rec
+
+def snapshotAttribute(attribute, profile=FULL_PROFILE):
+	'''
+	Snapshot of an attribute or a parameter. The multiplicity
+	is only read for return values (see snapshotReturn).
+	'''
+	rec = AttributeRec()
+	rec.name = attribute.name
+	snapshotType(rec, attribute)
+	rec.notes = profile.readNotes(attribute)
+	rec.multiplicityMin = None
+	rec.multiplicityMax = None
+	return rec
+
+def snapshotReturn(retur):
+	rec = AttributeRec()
+	rec.name = ''
+	snapshotType(rec, retur)
+	rec.notes = []
+	rec.multiplicityMin = retur.multiplicityMin
+	rec.multiplicityMax = retur.multiplicityMax
+	return rec
+
+def snapshotOperation(operation, profile=FULL_PROFILE):
+	rec = OperationRec()
+	rec.name = operation.name
+	rec.notes = profile.readNotes(operation)
+	rec.parameters = [snapshotAttribute(parameter, profile) for parameter in operation.getIO()]
+	retur = operation.getReturn()
+	if retur is None:
+		rec.returnValue = None
+	else:
+		rec.returnValue = snapshotReturn(retur)
+	return rec
+
+def snapshotClass(clazz, profile=FULL_PROFILE):
+	rec = ClassRec()
+	rec.uuid = elementId(clazz)
+	rec.name = clazz.name
+	rec.notes = profile.readNotes(clazz)
+	rec.isAbstract = clazz.isIsAbstract()
+	rec.parents = []
+	rec.parentIds = []
+	for generalization in clazz.parent:
+		superType = generalization.superType
+		rec.parents.append(superType.name)
+		rec.parentIds.append(elementId(superType))
+	rec.attributes = [snapshotAttribute(attribute, profile) for attribute in clazz.ownedAttribute]
+	rec.operations = [snapshotOperation(operation, profile) for operation in clazz.ownedOperation]
+	return rec
+
+def snapshotEnd(end):
+	rec = EndRec()
+	owner = end.owner
+	rec.ownerId = elementId(owner)
+	rec.ownerName = owner.name
+	rec.name = end.name
+	rec.multiplicityMin = end.multiplicityMin
+	rec.multiplicityMax = end.multiplicityMax
+	rec.isOrdered = end.isIsOrdered()
+	aggregation = end.aggregation
+	if aggregation == AggregationKind.KINDISCOMPOSITION:
+		rec.aggregation = 'composition'
+	elif aggregation == AggregationKind.KINDISAGGREGATION:
+		rec.aggregation = 'aggregation'
+	else:
+		rec.aggregation = ''
+	return rec
+
+def snapshotAssociation(asso, uuid, classPart=None):
+	'''
+	Snapshot of a binary association whose elementId is uuid, or
+	of an association class if the ClassRec of its class part is
+	given
+	'''
+	rec = AssociationRec()
+	rec.uuid = uuid
+	rec.name = asso.name
+	rec.ends = [snapshotEnd(end) for end in asso.end]
+	rec.classPart = classPart
+	return rec
+
+def snapshotNaryAssociation(naryAsso, uuid):
+	rec = AssociationRec()
+	rec.uuid = uuid
+	rec.name = naryAsso.name
+	rec.ends = [snapshotEnd(end) for end in naryAsso.naryEnd]
+	rec.classPart = None
+	return rec
+
+def snapshotConstraint(signal, ownerName, profile=FULL_PROFILE):
+	'''
+	Snapshot of a constraint. Its notes are its OCL expression,
+	so they are read whenever the constraints are generated,
+	even with a profile leaving the other notes out.
+	'''
+	rec = ConstraintRec()
+	rec.ownerName = ownerName
+	rec.name = signal.name
+	rec.notes = snapshotNotes(signal)
+	return rec
+
+#---------------------------------------------------------
+#   Indexes on the snapshot
+#---------------------------------------------------------
+# The indexes below are built once per generation from the
+# snapshot records, so that the transformation functions
+# never have to search the model again.
+#---------------------------------------------------------
+
+class HierarchyIndex(object):
+	'''
+	Inheritance hierarchy of the ClassRec of a generation, built
+	once per GenerationContext and extended package by package
+	(see add). The class parts of the association classes are
+	given with the classes, since a class may specialize an
+	association class. Only the generalizations to the classes
+	already in the index or added with them are taken into account.
+	  parents[uuid]   uuids of the direct super classes
+	  children[uuid]  uuids of the direct sub classes
+	  depth[uuid]     0 for a root class, 1 + the depth of its
+					  deepest super class otherwise
+	  order           the ClassRec, each class after all its
+					  super classes, otherwise in the given order
+	  cycles          lists of ClassRec forming inheritance cycles
+	The order is computed in linear time with an iterative depth
+	first search on the parents of each class. A generalization
+	closing a cycle is ignored for the order and the cycle is
+	reported in cycles.
+	'''
+	def __init__(self, classes=()):
+		self.classes = {}
+		self.parents = {}
+		self.children = {}
+		self.depth = {}
+		self.order = []
+		self.cycles = []
+		self.rank = {}            # uuid -> position in order
+		self.add(classes)
+	
+	def add(self, classes):
+		'''
+		Add the classes not in the index yet and sort them
+		'''
+		added = [c for c in classes if c.uuid not in self.classes]
+		for clazz in added:
+			self.classes[clazz.uuid] = clazz
+			self.children[clazz.uuid] = []
+		for clazz in added:
+			parents = [p for p in clazz.parentIds if p in self.classes]
+			self.parents[clazz.uuid] = parents
+			for p in parents:
+				self.children[p].append(clazz.uuid)
+		
+		self._sort(added)
+	
+	def _sort(self, classes):
+		VISITING = 1
+		state = {}
+		
+		for clazz in classes:
+			if clazz.uuid in state or clazz.uuid in self.rank:
+				continue
+			state[clazz.uuid] = VISITING
+			stack = [(clazz.uuid, iter(self.parents[clazz.uuid]))]
+			
+			while len(stack) > 0:
+				(uuid, parents) = stack[-1]
+				for p in parents:
+					if p in self.rank:
+						continue
+					if p not in state:
+						# visit the super classes first
+						state[p] = VISITING
+						stack.append((p, iter(self.parents[p])))
+						break
+					else:
+						cycleIds = [u for (u, _) in stack]
+						cycleIds = cycleIds[cycleIds.index(p):]
+						self.cycles.append([self.classes[u] for u in cycleIds])
+				else:
+					# all the super classes are done
+					stack.pop()
+					depth = 0
+					for p in self.parents[uuid]:
+						if p in self.depth and self.depth[p] + 1 > depth:
+							depth = self.depth[p] + 1
+					self.depth[uuid] = depth
+					self.rank[uuid] = len(self.order)
+					self.order.append(self.classes[uuid])
+	
+	def part(self, classes):
+		'''
+		Add the classes (see add) and return their part of the
+		hierarchy as (order, cycles): the classes in the order of
+		the index and the cycles between them
+		'''
+		self.add(classes)
+		uuids = set([c.uuid for c in classes])
+		order = sorted(classes, key=lambda c: self.rank[c.uuid])
+		cycles = [cycle for cycle in self.cycles if cycle[0].uuid in uuids]
+		return (order, cycles)
+	
+	def descendants(self, uuid):
+		'''
+		Return the ClassRec of the class with uuid and of all its
+		sub classes, breadth first
+		'''
+		result = []
+		seen = set()
+		toVisit = [uuid]
+		while len(toVisit) > 0:
+			current = toVisit.pop(0)
+			if current in seen:
+				continue
+			seen.add(current)
+			result.append(self.classes[current])
+			toVisit.extend(self.children[current])
+		return result
+
+def contentsClasses(contents):
+	'''
+	Return the classes and the class parts of the association
+	classes of a PackageContents, the classes of its hierarchy
+	'''
+	return contents.classes + [asso.classPart for asso in contents.associationClasses]
+
+class AssociationIndex(object):
+	'''
+	Index of the AssociationRec (binary associations, association
+	classes and nary associations) collected by a GenerationContext,
+	filled in one pass while the package trees are walked.
+	  associations    all the AssociationRec in the order they were added
+	  byUuid[uuid]    the AssociationRec of the association with this uuid
+	  byClass[uuid]   the AssociationRec in which the class with this
+					  uuid participates, through one of the ends or as
+					  the class part of an association class
+	'''
+	def __init__(self):
+		self.associations = []
+		self.byUuid = {}
+		self.byClass = {}
+	
+	def add(self, asso):
+		self.associations.append(asso)
+		self.byUuid[asso.uuid] = asso
+		participants = [end.ownerId for end in asso.ends]
+		if asso.classPart is not None:
+			participants.append(asso.classPart.uuid)
+		for classId in participants:
+			associations = self.byClass.setdefault(classId, [])
+			# a reflexive association is listed once for its class
+			if len(associations) == 0 or associations[-1] is not asso:
+				associations.append(asso)
+	
+	def ofClasses(self, classIds):
+		'''
+		Return the AssociationRec in which the classes with the uuids
+		classIds participate, each one once
+		'''
+		result = []
+		found = set()
+		for classId in classIds:
+			for asso in self.byClass.get(classId, []):
+				if asso.uuid not in found:
+					found.add(asso.uuid)
+					result.append(asso)
+		return result
+
+# Modelio predefined types (DataType of the fragment
+# 'PredefinedTypes 3.2.00') indexed by uuid
+PREDEFINED_TYPES = {
+	'00000004-0000-0005-0000-000000000000' : 'Boolean',    # boolean
+	'00000004-0000-0007-0000-000000000000' : 'String',     # char
+	'00000004-0000-0009-0000-000000000000' : 'Integer',    # integer
+	'00000004-0000-000b-0000-000000000000' : 'Real',       # float
+	'00000004-0000-000d-0000-000000000000' : 'String',     # string
+	'00000004-0000-000f-0000-000000000000' : 'OclAny',     # undefined
+	'00000004-0000-0010-0000-000000000000' : 'Real',       # double
+	'00000004-0000-0011-0000-000000000000' : 'Integer',    # long
+	'00000004-0000-0012-0000-000000000000' : 'Integer',    # short
+	'00000004-0000-0013-0000-000000000000' : 'Integer',    # byte
+	'00000004-0000-0014-0000-000000000000' : 'String',     # date
+}
+
+class TypeTable(object):
+	'''
+	Resolution of the types used by attributes, parameters and
+	return values into USE types, indexed by the uuid of the
+	type. The table is initialized with the predefined types
+	and the classes and enumerations of the snapshots added with
+	add. Any other type is resolved from its name the first time
+	it is looked up (see umlBasicType2OCL) and then kept in the table,
+	so the packages generated together are all added before any of
+	them is resolved (see iterSelectionContents).
+	An element with no type gets OclAny.
+	'''
+	def __init__(self):
+		self.types = dict(PREDEFINED_TYPES)
+		self.types[None] = 'OclAny'
+	
+	def add(self, contents):
+		'''
+		Add the classes and enumerations of a PackageContents
+		'''
+		for enumeration in contents.enumerations:
+			self.types[enumeration.uuid] = enumeration.name
+		for clazz in contents.classes:
+			self.types[clazz.uuid] = clazz.name
+		for asso in contents.associationClasses:
+			self.types[asso.classPart.uuid] = asso.classPart.name
+	
+	def resolve(self, typeId, typeName):
+		'''
+		Return the USE type for the type with uuid typeId and name typeName
+		'''
+		try:
+			return self.types[typeId]
+		except KeyError:
+			oclType = umlBasicType2OCL(typeName)
+			self.types[typeId] = oclType
+			return oclType
+	
+	def resolveAll(self, contents):
+		'''
+		Set the USE type (oclType) of all the attributes, parameters
+		and return values of the classes of contents
+		'''
+		classes = contents.classes + [asso.classPart for asso in contents.associationClasses]
+		for clazz in classes:
+			for attribute in clazz.attributes:
+				attribute.oclType = self.resolve(attribute.typeId, attribute.typeName)
+			for operation in clazz.operations:
+				for parameter in operation.parameters:
+					parameter.oclType = self.resolve(parameter.typeId, parameter.typeName)
+				retur = operation.returnValue
+				if retur is not None:
+					retur.oclType = self.resolve(retur.typeId, retur.typeName)
+
 #---------------------------------------------------------
 #   Helpers for the target representation (text)
 #---------------------------------------------------------
@@ -204,49 +703,502 @@ def orderedEndKeyWord(end):
 # for instance a function to indent a multi line string if
 # needed, or to wrap long lines after 80 characters, etc.
 
+class Emitter(object):
+	'''
+	Accumulate the generated text as a list of chunks instead of
+	printing it line by line. The whole specification is then
+	obtained as one string with getvalue(), written to a file in
+	a single bulk write with writeTo(path), or printed on the
+	console in one go with flush() if the console sink is enabled.
+	'''
+	def __init__(self, console=False):
+		self.chunks = []
+		self.console = console
+
+	def line(self, text=''):
+		'''
+		Append a line of text (same output as 'print text')
+		'''
+		self.chunks.append(text)
+		self.chunks.append('\n')
+
+	def write(self, text):
+		'''
+		Append a piece of text as is (e.g. an already generated fragment)
+		'''
+		self.chunks.append(text)
+
+	def getvalue(self):
+		'''
+		Return the whole generated text as a single string
+		'''
+		return ''.join(self.chunks)
+
+	def writeTo(self, path):
+		'''
+		Write the whole generated text to the file at path
+		'''
+		f = open(path, 'w')
+		try:
+			f.write(self.getvalue())
+		finally:
+			f.close()
+
+	def patchTo(self, path):
+		'''
+		Update the file at path with the generated text, only
+		writing the declarations that changed (see lib/usepatch.py)
+		'''
+		useLibrary()
+		import usepatch
+		return usepatch.patchUseFile(path, self.getvalue())
+
+	def flush(self):
+		'''
+		Send the generated text to the console if this sink is enabled
+		'''
+		if self.console:
+			sys.stdout.write(self.getvalue())
+
+class Template(object):
+	'''
+	Text of a USE construct with {field} placeholders ('{{' and '}}'
+	for the braces themselves). The text is compiled once into a
+	format, so that render, or the format applied with % directly
+	as the transformation functions do, assembles the literal parts
+	and the values of the fields in a single operation. The values
+	are given in the order of the fields in the text.
+	'''
+	__slots__ = ('text', 'format')
+	
+	def __init__(self, text):
+		self.text = text
+		parts = []
+		for (literal, field, spec, conversion) in string.Formatter().parse(text):
+			parts.append(literal.replace('%', '%%'))
+			if field is not None:
+				parts.append('%s')
+		self.format = ''.join(parts)
+	
+	def render(self, *values):
+		'''
+		Return the text with the fields replaced by the values
+		'''
+		return self.format % values
+
+def fragment(transformation, element, context):
+	'''
+	Apply a transformation function taking (element, context, out)
+	to element and return the text it produces as a string
+	'''
+	out = Emitter()
+	transformation(element, context, out)
+	return out.getvalue()
+
+def replaceFile(source, target):
+	'''
+	Rename the file source to target, replacing target if it exists
+	'''
+	if os.path.isfile(target):
+		os.remove(target)
+	os.rename(source, target)
+
+def streamTo(fragments, console=False, path=None):
+	'''
+	Output each fragment of text as soon as it is produced, on
+	the console and/or in the file at path, so that only one
+	fragment is in memory at a time. Return the number of lines.
+	'''
+	nbLines = 0
+	f = None
+	if path is not None:
+		f = open(path, 'w')
+	try:
+		for text in fragments:
+			if console:
+				sys.stdout.write(text)
+			if f is not None:
+				f.write(text)
+			nbLines = nbLines + text.count('\n')
+	finally:
+		if f is not None:
+			f.close()
+	return nbLines
+
+#---------------------------------------------------------
+#           Generation context
+#---------------------------------------------------------
+# All the state of a generation is kept in a context that
+# is given to the transformation functions below, so that
+# several generations can run at the same time.
+#---------------------------------------------------------
+
+# Version of the rendered sections stored in the section caches.
+# To be increased when the transformation functions are changed
+# so that the sections rendered by the previous version are not
+# reused.
+SECTION_CACHE_VERSION = 1
+
+def useLibrary():
+	'''
+	Add the 'lib' directory of the macros to the python path: next
+	to this file, or in the macros directory of the Modelio workspace
+	when run as a macro (see CoExplorer). The directories of the
+	macros are then given by lib/genoclscript.py.
+	'''
+	if '__file__' in globals():
+		directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib')
+	else:
+		from org.modelio.api.modelio import Modelio
+		directory = os.path.join(Modelio.getInstance().getContext().getWorkspacePath().toString(), 'macros', 'lib')
+	if directory not in sys.path:
+		sys.path.append(directory)
+
+def checkSpecification(text=None, path=None):
+	'''
+	Check a USE specification, given as a text or as the path of
+	a .use file, with lib/usecheck.py. Return the problems found.
+	'''
+	useLibrary()
+	import usecheck
+	if text is None:
+		return usecheck.checkUseFile(path)
+	return usecheck.checkUse(text)
+
+class GenerationCancelled(Exception):
+	'''
+	Raised in the generation once its context is cancelled
+	'''
+
+class GenerationContext(object):
+	'''
+	State of one generation. Nothing is shared between two
+	contexts, so several generations can run concurrently
+	(e.g. one per worker thread), each with its own context.
+	  modelName            name of the USE model
+	  console, outputFile  output sinks (see output)
+	  stream               output each fragment as soon as it
+						   is generated instead of at the end
+	  associationIndex     AssociationIndex of the associations already
+						   collected, which are not generated again
+	  collectedPackages    uuids of the packages already collected
+	  unspecifiedCount     number of unnamed associations already named
+	  types                TypeTable shared by the generated packages
+	  hierarchy            HierarchyIndex of the classes of the generated
+						   packages, shared by the OCL and SOIL passes
+	  timings              durations measured by output (in seconds)
+	  sections             SectionCache of the rendered sections
+						   (see lib/sectioncache.py),
+						   None to render every section
+	  progress             function called with the context every
+						   progressInterval seconds (None for no report)
+	  discovered           number of sections found in the packages
+	  processed            number of sections generated
+	  currentPackage       name of the package being generated
+	  cancelled            set by cancel() to stop the generation
+	  truncated            True if the output was cut by a cancellation,
+						   it is then written in truncatedFile() and
+						   outputFile is left as it was
+	  patch                update the declarations of outputFile that
+						   changed instead of rewriting it (no stream)
+	  patched              declarations written by the last patch
+	  check                check the output with the USE checker
+	  problems             problems found by the check (None if
+						   the output was not checked)
+	  renderThreads        number of threads rendering the sections
+	  renderWorkers        RenderWorkers of the generation running on
+						   several threads (see iterSnapshot2OCL)
+	  profile              GenerationProfile (parts of the model read)
+	  associationNames     names given to the unnamed associations,
+						   by uuid (see nameAssociations)
+	'''
+	def __init__(self, modelName, console=False, outputFile=None, stream=False, sections=None,
+			progress=None, progressInterval=1.0, patch=False, renderThreads=1, profile=FULL_PROFILE, check=False):
+		self.modelName = modelName
+		self.console = console
+		self.outputFile = outputFile
+		self.stream = stream
+		self.sections = sections
+		self.associationIndex = AssociationIndex()
+		self.collectedPackages = set()
+		self.unspecifiedCount = 0
+		self.types = TypeTable()
+		self.hierarchy = HierarchyIndex()
+		self.timings = {}
+		self.progress = progress
+		self.progressInterval = progressInterval
+		self.nextProgress = time.time() + progressInterval
+		self.discovered = 0
+		self.processed = 0
+		self.currentPackage = ''
+		self.cancelled = False
+		self.truncated = False
+		self.patch = patch
+		self.patched = None
+		self.renderThreads = renderThreads
+		self.renderWorkers = None
+		self.profile = profile
+		self.check = check
+		self.problems = None
+		self.associationNames = {}
+	
+	def cancel(self):
+		'''
+		Ask the generation to stop (e.g. from another thread). It
+		stops before the next element.
+		'''
+		self.cancelled = True
+	
+	def step(self):
+		'''
+		Called between two elements: raise GenerationCancelled if
+		the generation was cancelled, and report the progress if
+		it is time to do so
+		'''
+		if self.cancelled:
+			raise GenerationCancelled()
+		if self.progress is not None:
+			now = time.time()
+			if now >= self.nextProgress:
+				self.nextProgress = now + self.progressInterval
+				self.progress(self)
+	
+	def unspecifiedName(self):
+		'''
+		Return a new name for an unnamed association
+		'''
+		name = 'unspecifiedName_' + str(self.unspecifiedCount)
+		self.unspecifiedCount = self.unspecifiedCount + 1
+		return name
+	
+	def nameAssociations(self, records):
+		'''
+		Give their generated names to the unnamed associations among
+		records, in the order of the records, before the sections
+		are rendered (possibly in parallel)
+		'''
+		for rec in records:
+			if isUnspecifiedAssociation(rec) and rec.uuid not in self.associationNames:
+				self.associationNames[rec.uuid] = self.unspecifiedName()
+	
+	def render(self, transformation, rec):
+		'''
+		Return the section of text produced by a transformation for
+		rec, reusing the section cache of the context if any
+		'''
+		self.step()
+		self.processed = self.processed + 1
+		return self.renderSection(transformation, rec)
+	
+	def renderSection(self, transformation, rec):
+		'''
+		Same as render without the progress and the cancellation,
+		so that it can be called by several threads
+		'''
+		if self.sections is None:
+			return fragment(transformation, rec, self)
+		suffix = ''
+		if isinstance(rec, AssociationRec) and isUnspecifiedAssociation(rec):
+			# The generated name depends on the unnamed associations before
+			suffix = ':' + self.associationNames.get(rec.uuid, '')
+		return self.sections.render(transformation.__name__, rec, lambda: fragment(transformation, rec, self), suffix)
+	
+	def truncatedFile(self):
+		'''
+		Return the file where the output of a cancelled generation
+		is written instead of outputFile
+		'''
+		return self.outputFile + '.truncated'
+	
+	def output(self, fragments):
+		'''
+		Output the fragments of text to the sinks of the context,
+		either as soon as they are produced or all at once at the
+		end. The output of a cancelled generation is not written
+		in outputFile (see truncated). Return the number of lines.
+		'''
+		startTime = time.time()
+		if self.stream and not self.patch:
+			path = None
+			if self.outputFile is not None:
+				# renamed once the generation is over, see below
+				path = self.outputFile + '.part'
+			nbLines = streamTo(fragments, self.console, path)
+			if path is not None:
+				if self.truncated:
+					replaceFile(path, self.truncatedFile())
+				else:
+					replaceFile(path, self.outputFile)
+			self.timings['generation and output'] = time.time() - startTime
+			if self.check and self.outputFile is not None:
+				# the streamed text is only available in the file
+				startTime = time.time()
+				if self.truncated:
+					self.problems = checkSpecification(path=self.truncatedFile())
+				else:
+					self.problems = checkSpecification(path=self.outputFile)
+				self.timings['check'] = time.time() - startTime
+			return nbLines
+		
+		out = Emitter(console=self.console)
+		for text in fragments:
+			out.write(text)
+		self.timings['generation'] = time.time() - startTime
+		
+		# Output the whole specification at once
+		startTime = time.time()
+		out.flush()
+		if self.outputFile is not None:
+			if self.truncated:
+				out.writeTo(self.truncatedFile())
+			elif self.patch:
+				self.patched = out.patchTo(self.outputFile)
+			else:
+				out.writeTo(self.outputFile)
+		self.timings['output'] = time.time() - startTime
+		if self.check:
+			startTime = time.time()
+			self.problems = checkSpecification(out.getvalue())
+			self.timings['check'] = time.time() - startTime
+		return out.getvalue().count('\n')
+
+def runInThreads(function, items, nbThreads):
+	'''
+	Apply function to each item on a pool of nbThreads worker
+	threads and return the results in the order of the items.
+	Jython threads have no global interpreter lock, so the items
+	are really processed in parallel. With one thread or less
+	the items are processed in the calling thread. The first
+	exception raised by function is raised again at the end.
+	'''
+	if nbThreads <= 1 or len(items) <= 1:
+		return [function(item) for item in items]
+	
+	results = [None] * len(items)
+	errors = []
+	todo = Queue.Queue()
+	for (index, item) in enumerate(items):
+		todo.put((index, item))
+	
+	def work():
+		while True:
+			try:
+				(index, item) = todo.get_nowait()
+			except Queue.Empty:
+				return
+			try:
+				results[index] = function(item)
+			except Exception:
+				errors.append(sys.exc_info())
+	
+	workers = [threading.Thread(target=work) for i in range(min(nbThreads, len(items)))]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+	if len(errors) > 0:
+		raise errors[0][0], errors[0][1], errors[0][2]
+	return results
+
+class RenderWorkers(object):
+	'''
+	Pool of nbThreads worker threads started once for a whole
+	generation and fed through a queue, so that no thread is
+	created per chunk of sections (see iterSectionsInThreads).
+	The threads stop when the pool is closed.
+	'''
+	def __init__(self, nbThreads):
+		self.todo = Queue.Queue()
+		self.workers = [threading.Thread(target=self._work) for i in range(nbThreads)]
+		for worker in self.workers:
+			worker.setDaemon(True)
+			worker.start()
+	
+	def _work(self):
+		while True:
+			job = self.todo.get()
+			if job is None:
+				return
+			(function, index, item, results, errors, done) = job
+			try:
+				results[index] = function(item)
+			except Exception:
+				errors.append(sys.exc_info())
+			done.put(index)
+	
+	def map(self, function, items):
+		'''
+		Apply function to each item on the workers and return the
+		results in the order of the items. The first exception
+		raised by function is raised again at the end.
+		'''
+		results = [None] * len(items)
+		errors = []
+		done = Queue.Queue()
+		for (index, item) in enumerate(items):
+			self.todo.put((function, index, item, results, errors, done))
+		for item in items:
+			done.get()
+		if len(errors) > 0:
+			raise errors[0][0], errors[0][1], errors[0][2]
+		return results
+	
+	def close(self):
+		'''
+		Stop the workers once the queued items are processed
+		'''
+		for worker in self.workers:
+			self.todo.put(None)
+		for worker in self.workers:
+			worker.join()
+
 #---------------------------------------------------------
 #           Transformation functions: UML2OCL
 #---------------------------------------------------------
 # The functions below transform each element of the
 # UML metamodel into relevant elements in the OCL language.
 # This is the core of the transformation. These functions
-# are based on the helpers defined before. They can use
-# print statement to produce the output sequentially.
-# Another alternative is to produce the output in a
-# string and output the result at the end.
+# are based on the helpers defined before. They work on
+# the snapshot records of the elements and produce the
+# output sequentially in an Emitter (parameter 'out')
+# that is output at the end. The state of the generation
+# is kept in a GenerationContext (parameter 'context').
 #---------------------------------------------------------
 
+# Templates of the USE constructs, compiled into % formats (see
+# Template): a construct is rendered with a single % operation and
+# only the variable-length lists are joined
+CLASS_HEADER = Template('{abstract}class {name}{parents}').format
+ATTRIBUTE = Template('\t{name} : {type} {note}').format
+OPERATION = Template('\t{name}({parameters}) {result}').format
+PARAMETER = Template('{name} : {type}').format
+ASSOCIATION_HEADER = Template('{kind}{name} between').format
+ASSOCIATION_END = Template('\t{owner}[{min}..{max}]{role}{ordered}').format
+ENUMERATION = Template('enum {name}\n{{\n{literals}\n}}\n').format
+INVARIANT = Template('-- context {owner} inv {name}').format
+INVARIANT_NOTE = Template('\t-- {note}').format
+
 
 
 # examples
 
-def umlEnumeration2OCL(enumeration):
+def umlEnumeration2OCL(enumeration, context, out):
 	"""
 	Generate USE OCL code for the enumeration
 	"""
-	i = 0
-	values = enumeration.value
-	n = len(values) 
-	
-	if n == 0:
+	if len(enumeration.literals) == 0:
 		return
 	
-	print normalizeNote(umlNote2OCL(enumeration.descriptor))
-	print 'enum ' + enumeration.name 
-	print '{'
+	out.line(normalizeNote(umlNote2OCL(enumeration.notes)))
+	out.line(ENUMERATION % (enumeration.name, ',\n'.join(['\t' + value for value in enumeration.literals])))
 	
-	while i < (n - 1):
-		print '\t' + values.get(i).name + ','
-		i = i + 1
-	print '\t' + values.get(i).name
-			
-	print '}\n'
-    
 
 def umlBasicType2OCL(basicType):
 	"""
 	Generate USE OCL basic type. Note that
 	type conversions are required.
+	This is only used for the types that are not in
+	the TypeTable (see above).
 	"""
 	if basicType == 'float':
 		return 'Real'
@@ -266,41 +1218,21 @@ def operationNotes(operation):
 	'''
 	Get an operation comment to OCL
 	'''
-	i = 0
-	parameters = operation.getIO()
-	n = len(parameters)
+	result = normalizeNote(umlNote2OCL(operation.notes)) 
 	
-	result = normalizeNote(umlNote2OCL(operation.descriptor)) 
-	
-	if n == 0:
+	if len(operation.parameters) == 0:
 		return result
-		
-	while i < (n-1):
-		result = result + normalizeNote(umlNote2OCL(parameters.get(i).descriptor)) + '\n'
-		i = i + 1
-	
-	result = result + normalizeNote(umlNote2OCL(parameters.get(i).descriptor))
 	
-	return result
+	return result + '\n'.join([normalizeNote(umlNote2OCL(parameter.notes)) for parameter in operation.parameters])
 
 def parameter2OCL(parameters):
 	"""
 	Parameter representation in OCL
 	"""
-	i = 0
-	n = len(parameters)
-	result = ''
-	
-	if n == 0:
-		return result
-		
-	while i < (n-1): 
-		result = result + parameters.get(i).name + ' : ' + upcaseFirstLetter(parameters.get(i).type.name) + ', '
-		i = i + 1
-
-	result = result + parameters.get(i).name + ' : ' + upcaseFirstLetter(parameters.get(i).type.name)
-	
-	return result
+	if len(parameters) == 1:
+		parameter = parameters[0]
+		return PARAMETER % (parameter.name, parameter.oclType)
+	return ', '.join([PARAMETER % (parameter.name, parameter.oclType) for parameter in parameters])
 
 def return2OCL(retur):
 	'''
@@ -312,166 +1244,388 @@ def return2OCL(retur):
 		return result
 		
 	if retur.multiplicityMax == '1' and retur.multiplicityMin == '1':
-		result = ' : ' + upcaseFirstLetter(retur.type.name)
+		result = ' : ' + retur.oclType
 		
 	else:
-		result = ' : ' + 'Set(' + upcaseFirstLetter(retur.type.name) + ')'
+		result = ' : ' + 'Set(' + retur.oclType + ')'
 	
 	return result
 	
-def umlAttribute2OCL(attribute):
+def umlAttribute2OCL(attribute, context, out):
 	"""
 	UML attribute generation
 	"""
-	print '\t' + attribute.name + ' : ' + umlBasicType2OCL(attribute.type.name) + ' ' + normalizeNote(umlNote2OCL(attribute.descriptor))
+	out.line(ATTRIBUTE % (attribute.name, attribute.oclType, normalizeNote(umlNote2OCL(attribute.notes))))
 	
-def umlOperation2OCL(operation):
+def umlOperation2OCL(operation, context, out):
 	"""
 	UML operation generation
 	"""
 	
-	print operationNotes(operation)
-	print '\t' + operation.name + '(' + parameter2OCL(operation.getIO()) + ') ' + return2OCL(operation.getReturn())
+	out.line(operationNotes(operation))
+	out.line(OPERATION % (operation.name, parameter2OCL(operation.parameters), return2OCL(operation.returnValue)))
 	
-def umlClass2OCL(clazz):
+def umlClass2OCL(clazz, context, out):
 	"""
 	UML class generation
 	"""
-	attributes = clazz.ownedAttribute
-	operations = clazz.ownedOperation
-	
-	print normalizeNote(umlNote2OCL(clazz.descriptor))
-	
-	if not isAssociationClass(clazz):
-		print abstract(clazz) + 'class ' + clazz.name + inheritance(clazz)	
-		commonUmlClass2OCL(clazz)			
-		print 'end\n'
-	# else:
-	# The else is handled by association generation
-	# see umlAssociation2OCL(clazz)
-	
-	
-	# UML association handling
-	umlAssociation2OCL(clazz)
+	out.line(normalizeNote(umlNote2OCL(clazz.notes)))
+	out.line(CLASS_HEADER % (abstract(clazz), clazz.name, inheritance(clazz)))
+	commonUmlClass2OCL(clazz, context, out)
+	out.line('end\n')
 
-def commonUmlClass2OCL(clazz):
+def commonUmlClass2OCL(clazz, context, out):
 	'''
 	Common class handling (association class or normal class) :
 	<< Essentially class attributes and operations >>
 	'''
-	attributes = clazz.ownedAttribute
-	operations = clazz.ownedOperation
+	attributes = clazz.attributes
+	operations = clazz.operations
 	
 	if len(attributes) > 0:
-		print 'attributes'
+		out.line('attributes')
 		for attr in attributes:
-			umlAttribute2OCL(attr)
+			umlAttribute2OCL(attr, context, out)
 	
 	if len(operations) > 0:
-		print 'operations'
+		out.line('operations')
 		for op in operations:
-			umlOperation2OCL(op)
+			umlOperation2OCL(op, context, out)
+
+def associationName(asso, context):
+	'''
+	Return the name of the association, or a generated name
+	'unspecifiedName_<n>' if the association is unnamed
+	'''
+	if isUnspecifiedAssociation(asso):
+		name = context.associationNames.get(asso.uuid)
+		if name is None:
+			name = context.unspecifiedName()
+		return name
 	
-def umlAssociation2OCL(clazz):
+	return asso.name
+
+def umlAssociationEnd2OCL(end, context, out):
 	'''
-	UML association to OCL
+	UML association end (binary or nary) to OCL
 	'''
-	ownedEnds = clazz.ownedEnd
-	global _global_assoAlreadyTreated
-	global _global_asso_unspecified
+	out.line(ASSOCIATION_END % (end.ownerName, end.multiplicityMin, end.multiplicityMax, associationRoleName(end), orderedEndKeyWord(end)))
+
+def umlAssociation2OCL(asso, context, out):
+	'''
+	UML association to OCL. Association classes are generated
+	with the attributes and operations of their class part.
+	'''
+	if asso.classPart is not None:
+		out.line(normalizeNote(umlNote2OCL(asso.classPart.notes)))
 	
-	# For all ownedEnd 
-	for owned in ownedEnds: 
-		# Get the association
-		asso = owned.association 
-		
-		# Avoid handling orphaned association ;)
-		if asso is None:
-			continue
-		
-		# Check if it's an unspecified asso
-		assoName = ''
-		if isUnspecifiedAssociation(asso):
-			assoName = 'unspecifiedName_' + str(_global_asso_unspecified)
-			_global_asso_unspecified = _global_asso_unspecified + 1
-		else:
-			assoName = asso.name
-				
-			
-		# Check if association isn't treat yet
-		if not (asso in _global_assoAlreadyTreated):
-			# Add the asso to the set
-			_global_assoAlreadyTreated.add(asso)
-			
-			print associationClassString(asso) + assoName + ' between'
-			
-			for end in asso.end:
-				print '\t' + end.owner.name + '[' + end.multiplicityMin + '..' + end.multiplicityMax + ']' + associationRoleName(end) + orderedEndKeyWord(end)			
+	out.line(ASSOCIATION_HEADER % (associationClassString(asso), associationName(asso, context)))
+	
+	for end in asso.ends:
+		umlAssociationEnd2OCL(end, context, out)
+	
+	if asso.classPart is not None:
+		# handle association class there
+		commonUmlClass2OCL(asso.classPart, context, out)
+	
+	out.line('end\n')
+
+def umlNaryAssociation2OCL(naryAsso, context, out):
+	'''
+	UML nary association to OCL
+	'''
+	out.line(ASSOCIATION_HEADER % ('association ', associationName(naryAsso, context)))
+	
+	for end in naryAsso.ends:
+		umlAssociationEnd2OCL(end, context, out)
+	
+	# Handle Nary asso class there not performed yet
+	
+	out.line('end\n')
 			
-			if isAssociationRelationship(asso):
-				# handle association class there
-				commonUmlClass2OCL(asso.linkToClass.classPart)
-				print 'end\n'
-				# handle recursively asso's class association
-				umlAssociation2OCL(asso.linkToClass.classPart)
-			else:
-				print 'end\n'			
+def constraint2OCL(constraint, context, out):
+	'''
+	constraint representation in OCL
+	'''
+	# Constraint are commented ('--') and let the user the freedom to add the body
+	text = INVARIANT % (constraint.ownerName, constraint.name)
+	notes = [INVARIANT_NOTE % note for note in constraint.notes if len(note) != 0]
+	if len(notes) > 0:
+		text = text + '\n' + '\n'.join(notes)
+	out.line(text + '\n\n')
+
+def umlNote2OCL(notes):
+	'''
+	Note to OCL comments
+	'''
+	if len(notes) == 1:
+		# the common case, with no list to join
+		if len(notes[0]) > 0:
+			return '-- ' + notes[0]
+		return ''
+	notes = [note for note in notes if len(note) > 0]
+	if len(notes) == 0:
+		return ''
+	return '-- ' + '-- '.join(notes)
+#####
+
+class PackageContents(object):
+	'''
+	Snapshot records of the elements useful for USE OCL found
+	in a package and its sub packages, sorted into buckets by
+	kind. In each bucket the records are kept in the order of
+	the package tree.
+	'''
+	def __init__(self):
+		self.enumerations = []
+		self.classes = []
+		self.associationClasses = []
+		self.associations = []
+		self.naryAssociations = []
+		self.constraints = []
 	
-	# Handle Nary there
-	naryEnds = clazz.ownedNaryEnd
-	for nary in naryEnds:
-		naryAsso = nary.naryAssociation
-		
-		# Avoid handling orphaned association
-		if naryAsso is None:
-			continue
+	def size(self):
+		'''
+		Return the number of records (sections to generate)
+		'''
+		return (len(self.enumerations) + len(self.classes) + len(self.associationClasses)
+			+ len(self.associations) + len(self.naryAssociations) + len(self.constraints))
+
+def collectAssociation(asso, contents, index, profile, classesToExplore):
+	'''
+	Put the snapshot of a binary association in the buckets of
+	contents and in the association index, unless it is orphaned
+	or already in the index. The class part of an association
+	class is appended to classesToExplore.
+	'''
+	# Avoid handling orphaned or already treated association
+	if asso is None:
+		return
+	uuid = elementId(asso)
+	if uuid in index.byUuid:
+		return
+	
+	link = asso.linkToClass
+	if link is not None:
+		classPart = link.classPart
+		rec = snapshotAssociation(asso, uuid, snapshotClass(classPart, profile))
+		contents.associationClasses.append(rec)
+		classesToExplore.append(classPart)
+	else:
+		rec = snapshotAssociation(asso, uuid)
+		contents.associations.append(rec)
+	index.add(rec)
+
+def collectClassAssociations(clazz, contents, index, profile=FULL_PROFILE, linkToAssociation=None):
+	'''
+	Put the snapshots of the associations starting from clazz
+	in the buckets of contents and in the association index of
+	the context. The associations already in the index are
+	ignored. The class part of an association class is explored
+	too, since it may own other association ends. The association
+	of a class part (whose linkToAssociation is given, as read
+	by the caller) is collected from it, since its ends may be
+	owned by classes of other packages.
+	'''
+	classesToExplore = []
+	if linkToAssociation is not None:
+		collectAssociation(linkToAssociation.associationPart, contents, index, profile, classesToExplore)
+	if len(classesToExplore) == 0:
+		classesToExplore.append(clazz)
+	while len(classesToExplore) > 0:
+		current = classesToExplore.pop()
 		
-		# Handle unspecified association
-		assoName = naryAsso.name
-		if len(assoName) <= 0:
-			assoName = 'unspecifiedName_' + str(_global_asso_unspecified)
-			_global_asso_unspecified = _global_asso_unspecified + 1
+		for owned in current.ownedEnd:
+			collectAssociation(owned.association, contents, index, profile, classesToExplore)
 		
-		##
-		if not(naryAsso in _global_assoAlreadyTreated):
-			_global_assoAlreadyTreated.add(naryAsso)
-			
-			print 'association ' + assoName + ' between'
+		for nary in current.ownedNaryEnd:
+			naryAsso = nary.naryAssociation
 			
-			for end in naryAsso.naryEnd:
-				print '\t' + end.owner.name + '[' + end.multiplicityMin + '..' + end.multiplicityMax + ']' + associationRoleName(end) + orderedEndKeyWord(end)
+			# Avoid handling orphaned or already treated association
+			if naryAsso is None:
+				continue
+			uuid = elementId(naryAsso)
+			if uuid in index.byUuid:
+				continue
 			
-			# Handle Nary asso class there not performed yet
-			
-			print 'end\n'
-			
-def constraint2OCL(constraint):
+			rec = snapshotNaryAssociation(naryAsso, uuid)
+			contents.naryAssociations.append(rec)
+			index.add(rec)
+
+def collectPackageElements(package, context):
 	'''
-	constraint representation in OCL
+	Walk once the package tree and return the PackageContents
+	with the snapshots of its elements. The walk uses an explicit
+	stack of iterators instead of recursion so that deeply nested
+	packages are not limited by the recursion limit. Elements are
+	visited in the same order as a recursive depth first walk.
+	The associations already collected in the context are ignored,
+	the new ones are added to its association index.
+	The progress of the context is updated after each element.
 	'''
-	# Constraint are commented ('--') and let the user the freedom to add the body
-	print '-- context ' + constraint.owner.name + ' inv ' + constraint.name 
+	contents = PackageContents()
+	profile = context.profile
+	stack = [iter(package.ownedElement)]
+	packageNames = [package.name]
+	packageIds = [elementId(package)]
+	discovered = context.discovered
 	
-	for note in constraint.descriptor:
-		if len(note.content) != 0:
-			print '\t-- ' + note.content
+	while len(stack) > 0:
+		context.discovered = discovered + contents.size()
+		context.currentPackage = packageNames[-1]
+		context.step()
+		try:
+			element = stack[-1].next()
+		except StopIteration:
+			stack.pop()
+			packageNames.pop()
+			continue
 		
-	print '\n'
+		if isinstance(element, Enumeration):
+			contents.enumerations.append(snapshotEnumeration(element, profile))
+		elif isinstance(element, Class):
+			linkToAssociation = element.linkToAssociation
+			if linkToAssociation is None:
+				contents.classes.append(snapshotClass(element, profile))
+			# else: the class is generated with its association
+			collectClassAssociations(element, contents, context.associationIndex, profile, linkToAssociation)
+			if profile.constraints:
+				className = None
+				for signal in element.ownedElement:
+					if isinstance(signal, Signal):
+						if className is None:
+							className = element.name
+						contents.constraints.append(snapshotConstraint(signal, className, profile))
+		elif isinstance(element, Package):
+			stack.append(iter(element.ownedElement)) # Handling other packages
+			packageNames.append(element.name)
+			packageIds.append(elementId(element))
+	
+	context.collectedPackages.update(packageIds)
+	context.discovered = discovered + contents.size()
+	return contents
 
-def umlNote2OCL(notes):
+def packageSections(contents, hierarchy):
 	'''
-	Note to OCL comments
+	Return the sections of the specification of a package in the
+	order of the output, as (transformation, record) pairs. The
+	sections with no transformation are texts output as is. The
+	classes of the package are added to the HierarchyIndex.
 	'''
-	result = ''
+	(order, cycles) = hierarchy.part(contentsClasses(contents))
+	sections = []
+	# Enumerations first (Mandatory in USE specs)
+	for enumeration in contents.enumerations:
+		sections.append((umlEnumeration2OCL, enumeration))
+	for cycle in cycles:
+		sections.append((None, '-- WARNING: inheritance cycle between ' + ', '.join([c.name for c in cycle]) + '\n\n'))
+	# Super classes before their sub classes. An association class
+	# specialized by other classes is generated in their place.
+	associationClasses = dict([(asso.classPart.uuid, asso) for asso in contents.associationClasses])
+	moved = set()
+	for clazz in order:
+		asso = associationClasses.get(clazz.uuid)
+		if asso is None:
+			sections.append((umlClass2OCL, clazz))
+		elif len(hierarchy.children[clazz.uuid]) > 0:
+			sections.append((umlAssociation2OCL, asso))
+			moved.add(asso.uuid)
+	for asso in contents.associationClasses:
+		if asso.uuid not in moved:
+			sections.append((umlAssociation2OCL, asso))
+	for asso in contents.associations:
+		sections.append((umlAssociation2OCL, asso))
+	for naryAsso in contents.naryAssociations:
+		sections.append((umlNaryAssociation2OCL, naryAsso))
+	# Constraints last
+	for constraint in contents.constraints:
+		sections.append((constraint2OCL, constraint))
+	return sections
+
+def iterSectionsInThreads(sections, context):
+	'''
+	Render the sections on the RenderWorkers of the context and
+	yield them in their order, one chunk of sections at a time.
+	Without workers (a package generated on its own), workers are
+	started for the sections. The transformation functions only
+	read the records and the unnamed associations are named
+	before, so the text is the same as the one rendered by a
+	single thread.
+	'''
+	def render(section):
+		(transformation, rec) = section
+		if transformation is None:
+			return rec
+		return context.renderSection(transformation, rec)
 	
-	for note in notes:
-		if len(note.content) > 0:
-			result = result + '-- '+ note.content
+	workers = context.renderWorkers
+	if workers is None:
+		workers = RenderWorkers(context.renderThreads)
+	try:
+		chunkSize = context.renderThreads * 32
+		for start in range(0, len(sections), chunkSize):
+			chunk = sections[start:start + chunkSize]
+			context.step()
+			texts = workers.map(render, chunk)
+			context.processed = context.processed + len([t for (t, rec) in chunk if t is not None])
+			for text in texts:
+				yield text
+	finally:
+		if workers is not context.renderWorkers:
+			workers.close()
+
+def packageContents(package, context):
+	'''
+	Walk the package tree and return the PackageContents of the
+	package, with the types of its records resolved. This is the
+	only step that reads the Modelio model: the contents can be
+	rendered, saved in a snapshot file (see saveSnapshot) and
+	rendered again later without the model.
+	'''
+	contents = collectPackageElements(package, context)
+	context.types.add(contents)
+	context.types.resolveAll(contents)
+	return contents
+
+def iterContents2OCL(name, contents, context):
+	'''
+	Generate the OCL specification of the PackageContents of the
+	package named name as a sequence of text fragments (see
+	iterPackage2OCL)
+	'''
+	context.currentPackage = name
+	sections = packageSections(contents, context.hierarchy)
+	context.nameAssociations(contents.associationClasses + contents.associations + contents.naryAssociations)
+	if context.renderThreads > 1:
+		for text in iterSectionsInThreads(sections, context):
+			yield text
+		return
 	
-	return result
-#####
+	for (transformation, rec) in sections:
+		if transformation is None:
+			yield rec
+		else:
+			yield context.render(transformation, rec)
 
-def package2OCL(package):
+def iterPackage2OCL(package, context=None):
+	'''
+	Generate the OCL specification of a package as a sequence of
+	text fragments. A fragment is yielded as soon as each
+	enumeration, class, association or constraint is generated,
+	so the specification can be output with bounded memory.
+	The package tree is walked first to sort its elements.
+	With several render threads in the context, the fragments
+	are rendered in parallel and yielded by chunks.
+	A new GenerationContext, named after the package, is used if
+	none is given.
+	'''
+	if context is None:
+		context = GenerationContext(useModelName(package.name))
+	contents = packageContents(package, context)
+	for text in iterContents2OCL(package.name, contents, context):
+		yield text
+
+def package2OCL(package, context, out):
 	"""
     Generate a complete OCL specification for a given package.
     The inner package structure is ignored. That is, all
@@ -482,45 +1636,133 @@ def package2OCL(package):
     might exist is not reflected in the USE OCL specification
     as USE is not supporting the concept of package.
     """
-	elements = package.ownedElement
-				
-	for element in elements:		
-		if isinstance(element, Class):
-			umlClass2OCL(element)
-		if isinstance(element, Package):
-			package2OCL(element) # Handling other packages
+	for text in iterPackage2OCL(package, context):
+		out.write(text)
+
+def iterContents2SOIL(contents, instances, context):
+	'''
+	Generate a SOIL script creating an object state of the
+	PackageContents of a package, with instances objects per
+	concrete class and links respecting the multiplicities of
+	the associations, as a sequence of text fragments (see
+	lib/gensoil.py). The names of the associations are those
+	of the OCL specification generated with the same context.
+	'''
+	context.nameAssociations(contents.associationClasses + contents.associations + contents.naryAssociations)
+	useLibrary()
+	import gensoil
+	context.hierarchy.add(contentsClasses(contents))
+	return gensoil.iterSoil(contents, context.hierarchy, lambda asso: associationName(asso, context), instances)
+
+def iterPackage2SOIL(package, instances, context=None):
+	'''
+	Generate the SOIL script of a package (see iterContents2SOIL)
+	'''
+	if context is None:
+		context = GenerationContext(useModelName(package.name))
+	return iterContents2SOIL(packageContents(package, context), instances, context)
+
+#---------------------------------------------------------
+#           Snapshot files
+#---------------------------------------------------------
+# The snapshot records of the selected packages are the
+# intermediate representation of the USE model between the
+# reading of the UML model and the rendering of the text.
+# They can be saved in a JSON file and loaded back, so that
+# the specification (or a SOIL script) is rendered again
+# without the Modelio model, e.g. by GenOCL-Render.py.
+#---------------------------------------------------------
+
+# To be increased when the snapshot records are changed
+SNAPSHOT_VERSION = 2
 
+# Records saved in the snapshots
+RECORD_TYPES = (EnumRec, AttributeRec, OperationRec, ClassRec, EndRec, AssociationRec, ConstraintRec)
 
-def enumPackageGeneration(package):
+# Buckets of a PackageContents saved in a snapshot
+CONTENTS_BUCKETS = ('enumerations', 'classes', 'associationClasses', 'associations', 'naryAssociations', 'constraints')
+
+def snapshotFormat():
 	'''
-	Generate enumerations for all packages : This allows us to have 
-	enum declaration at the top of generated OCL code 
-	(Mandatory in USE specs)
+	Return the format of the snapshot files of this version of
+	the records (see lib/snapshotjson.py)
 	'''
-	elements = package.ownedElement
-	
-	for element in elements:
-		if isinstance(element, Enumeration):
-			umlEnumeration2OCL(element)
-		if isinstance(element, Package):
-			enumPackageGeneration(element) # Handle other packages
+	useLibrary()
+	import snapshotjson
+	return snapshotjson.SnapshotFormat(SNAPSHOT_VERSION, RECORD_TYPES, CONTENTS_BUCKETS, PackageContents)
 
-def constraintGeneration(package):
+def saveSnapshot(path, modelName, packages):
 	'''
-	Constraint generation
+	Save the name of the USE model and a list of (package name,
+	PackageContents) in a JSON file
 	'''
-	elements = package.ownedElement
+	snapshotFormat().save(path, modelName, packages)
+
+def loadSnapshot(path):
+	'''
+	Return the name of the USE model and the list of (package name,
+	PackageContents) saved in a JSON file by saveSnapshot
+	'''
+	return snapshotFormat().load(path)
+
+def iterSelectionContents(elements, context):
+	'''
+	Return the (name, PackageContents) of the packages among the
+	selected elements, one package at a time. All the packages are
+	walked and their classes and enumerations added to the types
+	of the context first, so that a type of a package selected
+	after another one is not resolved from its name in the first.
+	'''
+	packages = [(e.name, collectPackageElements(e, context)) for e in elements if isinstance(e, Package)]
+	for (name, contents) in packages:
+		context.types.add(contents)
+	for (name, contents) in packages:
+		context.types.resolveAll(contents)
+		yield (name, contents)
+
+def iterSavedContents(packages, path, modelName):
+	'''
+	Return the (name, PackageContents) of packages one at a time
+	and save them all in the snapshot file at path at the end
+	'''
+	saved = []
+	for (name, contents) in packages:
+		saved.append((name, contents))
+		yield (name, contents)
+	saveSnapshot(path, modelName, saved)
+
+#---------------------------------------------------------
+#           Profiling
+#---------------------------------------------------------
+# A Profiler replaces the functions of this file by wrappers
+# measuring their calls, and the selected Modelio elements
+# by proxies counting the reads of their properties. Nothing
+# is wrapped when the profiling is not enabled, so it costs
+# nothing in normal runs.
+#---------------------------------------------------------
+
+# Functions never wrapped by the profiler
+PROFILER_EXCLUDED = set(['profileSelection'])
+
+def profileSelection(elements):
+	'''
+	Generate the selected elements as generateSelection does
+	while profiling the functions of this file, then print
+	the report of the profiler on the console. The sections
+	are rendered by a single thread, the one measured by the
+	profiler.
+	'''
+	useLibrary()
+	import genprofiler
+	profiler = genprofiler.Profiler(globals(), PROFILER_EXCLUDED)
+	profiler.install()
+	try:
+		generateSelection([profiler.proxy(e) for e in elements], renderThreads=1)
+	finally:
+		profiler.uninstall()
+	print profiler.report()
+	return profiler
 
-	for element in elements:
-		if isinstance(element, Class):
-			signals = element.ownedElement
-			for signal in signals:
-				if isinstance(signal, Signal):
-					constraint2OCL(signal)
-					
-		if isinstance(element, Package):
-			constraintGeneration(element) # treat other packages
-			
 #---------------------------------------------------------
 #           User interface for the Transformation 
 #---------------------------------------------------------
@@ -533,39 +1775,345 @@ def constraintGeneration(package):
 #---------------------------------------------------------
 
 # (1) computation of the 'package' parameter
-# (2) call of package2OCL(package)
+# (2) call of iterPackage2OCL(package, context)
 # (3) do something with the result
 
-# Elements selected by user in Modelio
-elements = selectedElements
+# Output options
+# MODEL_NAME: name of the generated USE model (None for the name
+#    of the first selected package)
+# OUTPUT_FILE: path of the .use file to write (None for no file). The
+#    output of a cancelled generation goes to OUTPUT_FILE.truncated
+# PRINT_ON_CONSOLE: print the specification on the script console
+# STREAM_OUTPUT: output each declaration as soon as it is generated
+#    instead of the whole specification at the end
+# SHOW_TIMING: print the generation and output times on the console
+MODEL_NAME = None
+OUTPUT_FILE = None
+PRINT_ON_CONSOLE = True
+STREAM_OUTPUT = False
+SHOW_TIMING = False
+# PROGRESS_INTERVAL: seconds between two progress reports on the
+#    console (None for no report)
+# PROGRESS_DIALOG: run the generation in a Modelio progress dialog
+#    with a Cancel button
+PROGRESS_INTERVAL = None
+PROGRESS_DIALOG = False
+# PATCH_OUTPUT_FILE: update only the declarations of OUTPUT_FILE that
+#    changed, and leave the file untouched if nothing changed
+PATCH_OUTPUT_FILE = False
+# RENDER_THREADS: number of threads rendering the sections of a
+#    package (1 to render them in sequence)
+RENDER_THREADS = 1
+# CHECK_OUTPUT: check the generated specification with the USE
+#    checker of lib/usecheck.py and print the problems found
+CHECK_OUTPUT = False
+# GENERATION_PROFILE: parts of the model generated, one of
+#    'structure-only' (no notes, no constraints), 'with-comments'
+#    (notes), 'with-constraints' (constraints) or 'full'
+GENERATION_PROFILE = 'full'
+# SECTION_CACHE_FILE: file where the rendered sections are kept
+#    between two runs so that only the changed elements are
+#    generated again (None for no cache)
+SECTION_CACHE_FILE = None
+# SNAPSHOT_FILE: JSON file where the snapshot of the selected packages
+#    is saved, to render the specification again without the model
+#    with GenOCL-Render.py (None for no snapshot). In batch mode, the
+#    snapshot of each package is saved next to its .use file.
+SNAPSHOT_FILE = None
+# PROFILE: measure the calls and the property reads of each
+#    function and print a report at the end (see Profiler)
+PROFILE = False
+
+# Batch options
+# BATCH_MODE: generate one .use file per package instead of one
+#    specification for the selection
+# BATCH_PACKAGES: 'selection' for the selected packages, 'session'
+#    for the root packages of all the projects of the session
+# BATCH_OUTPUT_DIRECTORY: directory where the .use files are written
+# BATCH_THREADS: number of packages generated at the same time
+BATCH_MODE = False
+BATCH_PACKAGES = 'selection'
+BATCH_OUTPUT_DIRECTORY = '.'
+BATCH_THREADS = 4
+
+# Object state options
+# SOIL_OUTPUT_FILE: path of a .soil script creating an object state
+#    of the selected packages, to load-test the constraints of the
+#    specification in USE (None for no script). It is rendered from
+#    the snapshot, so SNAPSHOT_FILE must be set too.
+# SOIL_INSTANCES: number of objects created per concrete class
+SOIL_OUTPUT_FILE = None
+SOIL_INSTANCES = 10
+
+def iterSnapshot2OCL(packages, context):
+	'''
+	Generate the OCL specification for a sequence of (package name,
+	PackageContents), read from the model (see iterSelectionContents)
+	or from a snapshot file (see loadSnapshot), as a sequence of text
+	fragments. With several render threads in the context, the
+	RenderWorkers are started once for all the packages.
+	'''
+	yield 'model ' + context.modelName + '\n\n'
+	
+	isPackageSelected = False
+	if context.renderThreads > 1:
+		context.renderWorkers = RenderWorkers(context.renderThreads)
+	try:
+		try:
+			for (name, contents) in packages:
+				isPackageSelected = True
+				for text in iterContents2OCL(name, contents, context):
+					yield text
+		except GenerationCancelled:
+			# Only whole sections were output before
+			context.truncated = True
+			yield '-- TRUNCATED: generation cancelled after %d of %d elements\n' % (context.processed, context.discovered)
+			return
+	finally:
+		if context.renderWorkers is not None:
+			context.renderWorkers.close()
+			context.renderWorkers = None
+	
+	if isPackageSelected == False:
+		yield '-- No selected valide package !\n'
+
+def iterSelection2OCL(elements, context, snapshotFile=None):
+	'''
+	Generate the OCL specification for the packages among the
+	selected elements as a sequence of text fragments. With a
+	snapshotFile, the snapshot of the packages is saved in it
+	too, unless the generation is cancelled.
+	'''
+	packages = iterSelectionContents(elements, context)
+	if snapshotFile is not None:
+		packages = iterSavedContents(packages, snapshotFile, context.modelName)
+	return iterSnapshot2OCL(packages, context)
+
+def progressText(context):
+	return '%d/%d elements (package %s)' % (context.processed, context.discovered, context.currentPackage)
+
+def printProgress(context):
+	'''
+	Report the progress of the generation on the console (on the
+	error stream so that it is not mixed with the specification)
+	'''
+	sys.stderr.write('-- ' + progressText(context) + '\n')
+
+def runInProgressDialog(context, generation):
+	'''
+	Run generation() in a Modelio progress dialog that shows the
+	progress of the context. The Cancel button of the dialog
+	cancels the context. Return the result of generation().
+	'''
+	from org.eclipse.swt.widgets import Display
+	from org.eclipse.core.runtime import IProgressMonitor
+	from org.eclipse.jface.dialogs import ProgressMonitorDialog
+	from org.eclipse.jface.operation import IRunnableWithProgress
+	
+	results = []
+	class Generation(IRunnableWithProgress):
+		def run(self, monitor):
+			def progress(context):
+				monitor.subTask(progressText(context))
+				if monitor.isCanceled():
+					context.cancel()
+			context.progress = progress
+			# frequent polling so that Cancel stops the generation at once
+			context.progressInterval = 0.05
+			context.nextProgress = time.time()
+			monitor.beginTask('Generate OCL', IProgressMonitor.UNKNOWN)
+			try:
+				results.append(generation())
+			finally:
+				monitor.done()
+	
+	ProgressMonitorDialog(Display.getDefault().getActiveShell()).run(True, True, Generation())
+	return results[0]
 
-# Check if a user has selected a package
-isPackageSelected = False
+def printProblems(problems, title='USE check'):
+	'''
+	Print the problems found by the USE checker on the console
+	'''
+	print '-- %s: %d problem(s)' % (title, len(problems))
+	for problem in problems:
+		print '--   ' + str(problem)
 
-# Contains associations whose OCL declaration are already generated
-# Avoid duplicate declaration
-global _global_assoAlreadyTreated 
-_global_assoAlreadyTreated = set()
-global _global_asso_unspecified
-_global_asso_unspecified = 0
+def generateSelection(elements, renderThreads=None):
+	'''
+	Generate the OCL specification for the selected elements
+	with the output options above and return the generation
+	context (None without selected element). renderThreads
+	replaces RENDER_THREADS if given.
+	'''
+	if len(elements) == 0:
+		print '-- No selected element !\n-- Please select one !'
+		return None
+	
+	sections = None
+	if SECTION_CACHE_FILE is not None:
+		useLibrary()
+		import sectioncache
+		sections = sectioncache.SectionCache(SECTION_CACHE_FILE, SECTION_CACHE_VERSION)
+	progress = None
+	if PROGRESS_INTERVAL is not None:
+		progress = printProgress
+	if renderThreads is None:
+		renderThreads = RENDER_THREADS
+	context = GenerationContext(selectionModelName(elements), PRINT_ON_CONSOLE, OUTPUT_FILE, STREAM_OUTPUT, sections,
+		progress, PROGRESS_INTERVAL or 1.0, PATCH_OUTPUT_FILE, renderThreads, PROFILES[GENERATION_PROFILE], CHECK_OUTPUT)
+	
+	if PROGRESS_DIALOG:
+		nbLines = runInProgressDialog(context, lambda: context.output(iterSelection2OCL(elements, context, SNAPSHOT_FILE)))
+	else:
+		nbLines = context.output(iterSelection2OCL(elements, context, SNAPSHOT_FILE))
+	
+	if context.truncated:
+		if OUTPUT_FILE is not None:
+			print '-- Generation cancelled: the truncated output is in %s, %s is unchanged' % (context.truncatedFile(), OUTPUT_FILE)
+		else:
+			print '-- Generation cancelled: the output is truncated'
+	if context.patched is not None:
+		print '-- %s: %d declaration(s) updated' % (OUTPUT_FILE, len(context.patched))
+	if context.problems is not None:
+		printProblems(context.problems)
+	if sections is not None:
+		if not context.truncated:
+			# the sections not rendered would be dropped from the cache
+			sections.save()
+		print '-- %d section(s) reused, %d section(s) generated' % (sections.reused, sections.rendered)
+	if SHOW_TIMING:
+		timings = ['%s: %.3f s' % (step, duration) for (step, duration) in sorted(context.timings.items())]
+		print '-- ' + ', '.join(timings) + ' (%d lines)' % nbLines
+	return context
 
-if len(elements) > 0:
-	print 'model CyberResidences\n'
+def iterSnapshot2SOIL(packages, instances, context):
+	'''
+	Generate the SOIL script for a sequence of (package name,
+	PackageContents) as a sequence of text fragments
+	'''
+	for (name, contents) in packages:
+		for text in iterContents2SOIL(contents, instances, context):
+			yield text
 
+def generateSoil(snapshotFile, context=None):
+	'''
+	Write the SOIL script of the snapshot saved by the generation
+	in SOIL_OUTPUT_FILE, one statement at a time. The model is not
+	read again. The context of the generation, if given, is reused
+	with its hierarchy and association names.
+	'''
+	if snapshotFile is None:
+		print '-- SOIL_OUTPUT_FILE needs SNAPSHOT_FILE: the SOIL script is rendered from the snapshot'
+		return
+	startTime = time.time()
+	(modelName, packages) = loadSnapshot(snapshotFile)
+	if context is None:
+		context = GenerationContext(modelName)
+	nbLines = streamTo(iterSnapshot2SOIL(packages, SOIL_INSTANCES, context), path=SOIL_OUTPUT_FILE)
+	print '-- %s: %d line(s) in %.3f s' % (SOIL_OUTPUT_FILE, nbLines, time.time() - startTime)
+
+def sessionRootPackages():
+	'''
+	Return the root package of each project of the Modelio session
+	'''
+	from org.modelio.api.modelio import Modelio
+	from org.modelio.metamodel.mda import Project
+	session = Modelio.getInstance().getModelingSession()
+	return [root.getModel() for root in session.getModel().getModelRoots() if isinstance(root, Project)]
+
+def useModelName(name):
+	'''
+	Return a valid USE identifier for the name of a package
+	'''
+	chars = [c if c.isalnum() else '_' for c in name]
+	if len(chars) == 0 or not (chars[0].isalpha() or chars[0] == '_'):
+		chars.insert(0, '_')
+	return ''.join(chars)
+
+def selectionModelName(elements):
+	'''
+	Return MODEL_NAME, or if it is None the USE identifier of the
+	name of the first package among the selected elements
+	'''
+	if MODEL_NAME is not None:
+		return MODEL_NAME
 	for e in elements:
 		if isinstance(e, Package):
-			isPackageSelected = True
-			# Generate enumerations first
-			enumPackageGeneration(e)
-			# Generate the rest
-			package2OCL(e)
-			# Generate the constraints
-			constraintGeneration(e)
+			return useModelName(e.name)
+	return useModelName(elements[0].name)
+
+def batchJobs(packages, directory):
+	'''
+	Return a (package, modelName, path) job for each package.
+	Packages with the same name get distinct model names.
+	'''
+	jobs = []
+	nameCounts = {}
+	for package in packages:
+		modelName = useModelName(package.name)
+		count = nameCounts.get(modelName, 0) + 1
+		nameCounts[modelName] = count
+		if count > 1:
+			modelName = modelName + '_' + str(count)
+		jobs.append((package, modelName, os.path.join(directory, modelName + '.use')))
+	return jobs
+
+def generatePackageFile(job):
+	'''
+	Generate the .use file of a batch job with its own context.
+	Return (modelName, path, number of lines, duration, problems).
+	'''
+	(package, modelName, path) = job
+	startTime = time.time()
+	context = GenerationContext(modelName, False, path, STREAM_OUTPUT, profile=PROFILES[GENERATION_PROFILE], check=CHECK_OUTPUT)
+	snapshotFile = None
+	if SNAPSHOT_FILE is not None:
+		# one snapshot per package, next to its .use file
+		snapshotFile = os.path.splitext(path)[0] + '.json'
+	nbLines = context.output(iterSelection2OCL([package], context, snapshotFile))
+	return (modelName, path, nbLines, time.time() - startTime, context.problems)
+
+def generateBatch(packages, directory, nbThreads):
+	'''
+	Generate one .use file per package on nbThreads worker threads
+	and print a timing summary per package on the console
+	'''
+	if len(packages) == 0:
+		print '-- No package to generate !'
+		return []
+	if not os.path.isdir(directory):
+		os.makedirs(directory)
 	
-	if isPackageSelected == False:
-		print '-- No selected valide package !'
-else:
-		print '-- No selected element !\n-- Please select one !'
-				
+	startTime = time.time()
+	results = runInThreads(generatePackageFile, batchJobs(packages, directory), nbThreads)
+	totalTime = time.time() - startTime
 	
-	
\ No newline at end of file
+	for (modelName, path, nbLines, duration, problems) in results:
+		print '-- %-30s %8.3f s %8d lines  %s' % (modelName, duration, nbLines, path)
+	for (modelName, path, nbLines, duration, problems) in results:
+		if problems is not None and len(problems) > 0:
+			printProblems(problems, modelName)
+	print '-- %d package(s) in %.3f s on %d thread(s)' % (len(results), totalTime, max(1, min(nbThreads, len(results))))
+	return results
+
+def batchSelection(elements):
+	'''
+	Return the packages to generate in batch mode
+	'''
+	if BATCH_PACKAGES == 'session':
+		return sessionRootPackages()
+	return [e for e in elements if isinstance(e, Package)]
+
+# When this file is executed by another script with GENOCL_AS_LIBRARY
+# defined, e.g. execfile(path, {'GENOCL_AS_LIBRARY' : True, ...}),
+# only the functions above are defined and nothing is generated.
+if not globals().get('GENOCL_AS_LIBRARY', False):
+	# Elements selected by user in Modelio
+	if BATCH_MODE:
+		generateBatch(batchSelection(selectedElements), BATCH_OUTPUT_DIRECTORY, BATCH_THREADS)
+	elif PROFILE:
+		profileSelection(selectedElements)
+	else:
+		context = generateSelection(selectedElements)
+		if SOIL_OUTPUT_FILE is not None and context is not None and not context.truncated:
+			generateSoil(SNAPSHOT_FILE, context)
@@ -0,0 +1,983 @@
+#
+# exml
+#
+# Reader of the Modelio projects stored as EXML files, to run GenOCL
+# without Modelio (see GenOCL-Headless.py).
+#
+# A Modelio project stores each fragment of its model in
+#     data/fragments/<fragment>/model/<Metaclass>/<uuid>.exml
+# (data/fragments/<fragment>/content/model/model/... for the fragments
+# of the modules and libraries). Each file holds one element (a "CMS
+# node": project, package, class, signal, ...) and the elements it is
+# composed of, as nested OBJECT blocks:
+#
+#   <OBJECT>
+#     <ID name=".." mc="Class" uid=".."/>          the element
+#     <PID name=".." mc="Package" uid=".."/>       the CMS node owning it
+#     <ATTRIBUTES> <ATT name="Name">..</ATT> ... </ATTRIBUTES>
+#     <DEPENDENCIES>
+#       <LINK relation="Type"> <ID .../> or <FOREIGNID .../> </LINK>
+#       <COMP relation="OwnedAttribute">
+#         <OBJECT>...</OBJECT>            element composed in this file
+#         <COMPID .../>                   element stored in its own file
+#         <REFOBJ><ID/><PID/></REFOBJ>    element composed in the file of PID
+#       </COMP>
+#     </DEPENDENCIES>
+#   </OBJECT>
+#
+# A model is read in two steps:
+#   - parseExml reads a file into ExmlObject records, plain data with the
+#     uid, the metaclass, the name, the attributes and the references of
+#     each relation of the elements of the file,
+#   - ExmlModel builds the elements of lib/umlmodel.py from the records
+#     of all the files and links them with the properties navigated by
+#     GenOCL (ownedElement, ownedAttribute, ownedOperation, ownedEnd,
+#     ownedNaryEnd, parent/superType, linkToClass, descriptor,
+#     multiplicityMin/Max, ...).
+# The references to elements that are not read (e.g. the predefined types
+# when their fragment is left out) give stub elements, built from the
+# name and the metaclass written in the reference.
+#
+#     model = loadProject('CyberResidences')
+#     for package in model.rootPackages('CyberResidences'): ...
+#
+# LazyModel gives the same elements but reads the file of an element only
+# when it is first dereferenced (see "Lazy loading").
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import os
+import threading
+import cPickle
+try:
+  import xml.etree.cElementTree as ElementTree
+except ImportError:
+  import xml.etree.ElementTree as ElementTree
+
+import umlmodel
+from genoclscript import isJython
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "ExmlObject",
+  "parseExml",
+  "objectContainers",
+  "fragmentDirectories",
+  "exmlFiles",
+  "projectFiles",
+  "parseFiles",
+  "ParseCache",
+  "ExmlModel",
+  "loadProject",
+  "readDeps",
+  "LazyModel" ]
+
+
+#-----------------------------------------------------------------------------------
+#   EXML files
+#-----------------------------------------------------------------------------------
+
+# Tags of the references to other elements
+REFERENCE_TAGS = set(['ID','FOREIGNID','EXTID','COMPID'])
+
+class ExmlObject(object):
+  """ An element read in an EXML file. pid is the uid of the CMS node
+      owning the element (None for a project). comps and links are the
+      compositions (COMP) and references (LINK) of the element, as lists
+      of (relation,[(uid,mc,name,pid)]) in the order of the file, pid
+      being the CMS node of the elements composed in another file
+      (REFOBJ) and None for the other references.
+  """
+  __slots__ = ('uid','mc','name','pid','attributes','comps','links')
+  def __init__(self,uid,mc,name,pid):
+    self.uid = uid
+    self.mc = mc
+    self.name = name
+    self.pid = pid
+    self.attributes = {}
+    self.comps = []
+    self.links = []
+  def __getstate__(self):
+    return tuple([getattr(self,slot) for slot in self.__slots__])
+  def __setstate__(self,state):
+    for (slot,value) in zip(self.__slots__,state):
+      setattr(self,slot,value)
+  def __repr__(self):
+    return 'ExmlObject(%s %s %s)' % (self.mc,self.name,self.uid)
+
+def _text(value):
+  """ Texts as utf-8 strings (the attributes and the names are returned
+      as unicode strings by ElementTree when they are not ascii)
+  """
+  if value is None:
+    return ''
+  if isinstance(value,unicode):
+    return value.encode('utf-8')
+  return value
+
+def _reference(node,pid=None):
+  if pid is not None:
+    pid = pid.get('uid')
+  return (node.get('uid'),node.get('mc'),_text(node.get('name')),pid)
+
+def _readObject(node,objects):
+  """ Read an OBJECT block and the blocks nested in it into objects.
+      Return the reference of the element of the block.
+  """
+  id = node.find('ID')
+  pid = node.find('PID')
+  if pid is not None:
+    pid = pid.get('uid')
+  obj = ExmlObject(id.get('uid'),id.get('mc'),_text(id.get('name')),pid)
+  objects.append(obj)
+  attributes = node.find('ATTRIBUTES')
+  if attributes is not None:
+    for att in attributes:
+      obj.attributes[att.get('name')] = _text(att.text)
+  dependencies = node.find('DEPENDENCIES')
+  if dependencies is not None:
+    for dependency in dependencies:
+      references = []
+      for child in dependency:
+        if child.tag == 'OBJECT':
+          references.append(_readObject(child,objects))
+        elif child.tag == 'REFOBJ':
+          references.append(_reference(child.find('ID'),child.find('PID')))
+        elif child.tag in REFERENCE_TAGS:
+          references.append(_reference(child))
+      if dependency.tag == 'COMP':
+        obj.comps.append((dependency.get('relation'),references))
+      else:
+        obj.links.append((dependency.get('relation'),references))
+  return (obj.uid,obj.mc,obj.name,None)
+
+def parseExml(path):
+  """ Return the ExmlObject of the elements of an EXML file, each element
+      before the ones it is composed of
+      (str) -> [ExmlObject]
+  """
+  objects = []
+  for node in ElementTree.parse(path).getroot().findall('OBJECT'):
+    _readObject(node,objects)
+  return objects
+
+def objectContainers(objects):
+  """ Return the element composing each element of a file (the first one
+      in the order of the file, which is not always the block the element
+      is written in, e.g. for the association of two ends) and the
+      relation composing it. The elements of the file composed by no
+      other one (its CMS node) are left out.
+      ([ExmlObject]) -> { str : (str,str) }
+  """
+  uids = set([obj.uid for obj in objects])
+  containers = {}
+  for obj in objects:
+    for (relation,references) in obj.comps:
+      for reference in references:
+        if reference[0] in uids and reference[0] not in containers:
+          containers[reference[0]] = (obj.uid,relation)
+  return containers
+
+def fragmentDirectories(projectDirectory):
+  """ Return the name and the model directory of the fragments of a
+      project, sorted by name
+      (str) -> [(str,str)]
+  """
+  fragments = os.path.join(projectDirectory,'data','fragments')
+  result = []
+  for name in sorted(os.listdir(fragments)):
+    for parts in (('model',),('content','model','model')):
+      directory = os.path.join(fragments,name,*parts)
+      if os.path.isdir(directory):
+        result.append((name,directory))
+        break
+  return result
+
+def exmlFiles(modelDirectory):
+  """ Return the paths of the EXML files of a fragment, sorted by
+      metaclass and uid
+      (str) -> [str]
+  """
+  paths = []
+  for mc in sorted(os.listdir(modelDirectory)):
+    directory = os.path.join(modelDirectory,mc)
+    if os.path.isdir(directory):
+      for name in sorted(os.listdir(directory)):
+        if name.endswith('.exml'):
+          paths.append(os.path.join(directory,name))
+  return paths
+
+def projectFiles(projectDirectory,fragments=None):
+  """ Return the fragment and the path of the EXML files of the fragments
+      of a project (all of them if fragments is None), sorted by fragment,
+      metaclass and uid
+      (str,[str]?) -> [(str,str)]
+  """
+  files = []
+  for (fragment,directory) in fragmentDirectories(projectDirectory):
+    if fragments is None or fragment in fragments:
+      files.extend([(fragment,path) for path in exmlFiles(directory)])
+  return files
+
+
+#-----------------------------------------------------------------------------------
+#   Parallel parsing
+#-----------------------------------------------------------------------------------
+# The files are parsed by a pool of worker processes with CPython, whose
+# threads would be serialized by the global interpreter lock, and by a
+# pool of threads with Jython, which has no such lock but no
+# multiprocessing module. The results are returned in the order of the
+# files whatever the order in which the workers finish, so the model
+# built is the same as with a sequential parsing.
+
+def _parseInThreads(paths,workers):
+  results = [None] * len(paths)
+  errors = []
+  lock = threading.Lock()
+  indexes = iter(range(len(paths)))
+  def work():
+    while True:
+      lock.acquire()
+      try:
+        index = next(indexes,None)
+      finally:
+        lock.release()
+      if index is None or errors:
+        return
+      try:
+        results[index] = parseExml(paths[index])
+      except Exception, e:
+        errors.append(e)
+  threads = [threading.Thread(target=work) for i in range(workers)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  if errors:
+    raise errors[0]
+  return results
+
+def _parseInProcesses(paths,workers):
+  import multiprocessing
+  pool = multiprocessing.Pool(workers)
+  try:
+    # a few chunks per worker to balance the load and limit the messages
+    chunksize = max(1,len(paths) // (workers * 4))
+    return pool.map(parseExml,paths,chunksize)
+  finally:
+    pool.close()
+    pool.join()
+
+def parseFiles(paths,workers=1):
+  """ Parse EXML files with workers parallel workers (processes with
+      CPython, threads with Jython) and return the ExmlObject of each
+      file, in the order of the paths
+      ([str],int) -> [[ExmlObject]]
+  """
+  workers = min(workers,len(paths))
+  if workers <= 1:
+    return [parseExml(path) for path in paths]
+  if isJython():
+    return _parseInThreads(paths,workers)
+  return _parseInProcesses(paths,workers)
+
+
+#-----------------------------------------------------------------------------------
+#   Parse cache
+#-----------------------------------------------------------------------------------
+# The ExmlObject parsed from the files of a project are kept on disk between
+# two runs. A fragment is parsed again entirely when one of its admin files
+# (stamp.dat, mmversion.dat, format_version.dat) changed, e.g. when it was
+# recreated or migrated; otherwise only its files whose size or modification
+# time changed are parsed again, and the records of the other files are
+# reused. The model is then built from the records as after a full parsing.
+
+# To be increased when ExmlObject or parseExml are changed so that the
+# records parsed by the previous version are not reused
+PARSE_CACHE_VERSION = 2
+
+# Admin files of a fragment that identify its repository
+ADMIN_FILES = ('stamp.dat','mmversion.dat','format_version.dat')
+
+def fragmentStamp(modelDirectory):
+  """ Return the content of the admin files of the fragment of a model
+      directory ('' for the missing ones)
+      (str) -> (str,str,str)
+  """
+  admin = os.path.join(os.path.dirname(modelDirectory),'admin')
+  stamp = []
+  for name in ADMIN_FILES:
+    path = os.path.join(admin,name)
+    content = ''
+    if os.path.isfile(path):
+      f = open(path,'rb')
+      try:
+        content = f.read()
+      finally:
+        f.close()
+    stamp.append(content)
+  return tuple(stamp)
+
+class ParseCache(object):
+  """ Persistent cache of the ExmlObject parsed from the EXML files of a
+      project.
+        path       file where the cache is kept (None for no file)
+        fragments  by fragment name, its stamp (see fragmentStamp) and its
+                   files as { path in the fragment : (size,mtime,[ExmlObject]) }
+        reused     number of files taken from the cache by the last parsing
+        parsed     number of files parsed by the last parsing
+        changed    True if the cache must be saved
+  """
+  def __init__(self,path=None):
+    self.path = path
+    self.fragments = {}
+    self.reused = 0
+    self.parsed = 0
+    self.changed = False
+    if path is not None and os.path.isfile(path):
+      self.load()
+
+  def load(self):
+    """ Read the cache of the previous run. A cache written by another
+        version is ignored.
+    """
+    f = open(self.path,'rb')
+    try:
+      try:
+        (version,fragments) = cPickle.load(f)
+      except Exception:
+        return
+    finally:
+      f.close()
+    if version == PARSE_CACHE_VERSION:
+      self.fragments = fragments
+
+  def save(self):
+    """ Write the cache if it changed since it was read
+    """
+    if self.path is None or not self.changed:
+      return
+    f = open(self.path,'wb')
+    try:
+      cPickle.dump((PARSE_CACHE_VERSION,self.fragments),f,2)
+    finally:
+      f.close()
+    self.changed = False
+
+  def parseProject(self,projectDirectory,fragments=None,workers=1):
+    """ Return the fragment and the ExmlObject of each EXML file of the
+        fragments of a project (all of them if fragments is None), in the
+        order of projectFiles. Only the files that changed since they were
+        cached are parsed, with workers parallel workers (see parseFiles).
+        (str,[str]?,int) -> [(str,[ExmlObject])]
+    """
+    results = []      # (fragment,[ExmlObject]) of the files, None if to parse
+    toParse = []      # (index in results,fragment,path,files of the fragment,key,size,mtime)
+    cache = {}
+    if fragments is not None:
+      # the fragments that are not read are kept as they are
+      cache.update(self.fragments)
+    for (fragment,directory) in fragmentDirectories(projectDirectory):
+      if fragments is not None and fragment not in fragments:
+        continue
+      stamp = fragmentStamp(directory)
+      (cachedStamp,cached) = self.fragments.get(fragment,(None,{}))
+      if cachedStamp != stamp:
+        cached = {}
+      files = {}
+      cache[fragment] = (stamp,files)
+      for path in exmlFiles(directory):
+        key = os.path.relpath(path,directory)
+        info = os.stat(path)
+        entry = cached.get(key)
+        if entry is not None and entry[0] == info.st_size and entry[1] == info.st_mtime:
+          files[key] = entry
+          results.append((fragment,entry[2]))
+        else:
+          toParse.append((len(results),fragment,path,files,key,info.st_size,info.st_mtime))
+          results.append(None)
+      if len(files) != len(cached):
+        # some files were removed or changed
+        self.changed = True
+
+    parsed = parseFiles([path for (index,fragment,path,files,key,size,mtime) in toParse],workers)
+    for ((index,fragment,path,files,key,size,mtime),objects) in zip(toParse,parsed):
+      files[key] = (size,mtime,objects)
+      results[index] = (fragment,objects)
+    if len(toParse) > 0 or set(cache) != set(self.fragments):
+      self.changed = True
+    self.fragments = cache
+    self.parsed = len(toParse)
+    self.reused = len(results) - self.parsed
+    return results
+
+
+#-----------------------------------------------------------------------------------
+#   Model
+#-----------------------------------------------------------------------------------
+
+# Elements of lib/umlmodel.py by metaclass, umlmodel.Element for the others
+METACLASSES = {
+  'Package'            : umlmodel.Package,
+  'Class'              : umlmodel.Class,
+  'DataType'           : umlmodel.DataType,
+  'Enumeration'        : umlmodel.Enumeration,
+  'EnumerationLiteral' : umlmodel.EnumerationLiteral,
+  'Attribute'          : umlmodel.Attribute,
+  'Parameter'          : umlmodel.Parameter,
+  'Operation'          : umlmodel.Operation,
+  'Generalization'     : umlmodel.Generalization,
+  'Association'        : umlmodel.Association,
+  'AssociationEnd'     : umlmodel.AssociationEnd,
+  'ClassAssociation'   : umlmodel.ClassAssociation,
+  'NaryAssociation'    : umlmodel.NaryAssociation,
+  'NaryAssociationEnd' : umlmodel.NaryAssociationEnd,
+  'Signal'             : umlmodel.Signal,
+  'Note'               : umlmodel.Note }
+
+def _isTrue(value):
+  return value == 'true'
+
+def _same(value):
+  return value
+
+# Attributes read, with the property they set and their conversion
+ATTRIBUTES = {
+  'Name'            : ('name',_same),
+  'Content'         : ('content',_same),
+  'MultiplicityMin' : ('multiplicityMin',_same),
+  'MultiplicityMax' : ('multiplicityMax',_same),
+  'IsAbstract'      : ('isAbstract',_isTrue),
+  'IsOrdered'       : ('isOrdered',_isTrue),
+  'Aggregation'     : ('aggregation',_same) }
+
+# Relations to one element, with the property they set
+SINGLE_RELATIONS = {
+  'Type'            : 'type',
+  'SuperType'       : 'superType',
+  'Target'          : 'target',
+  'Opposite'        : 'opposite',
+  'Association'     : 'association',
+  'NaryAssociation' : 'naryAssociation',
+  'LinkToClass'     : 'linkToClass',
+  'ClassPart'       : 'classPart',
+  'Return'          : 'ret',
+  'Model'           : 'model' }
+
+# Relations to a list of elements, with the property they set.
+# The other relations are not read.
+LIST_RELATIONS = {
+  'OwnedElement'    : 'ownedElement',
+  'OwnedAttribute'  : 'ownedAttribute',
+  'OwnedOperation'  : 'ownedOperation',
+  'OwnedEnd'        : 'ownedEnd',
+  'OwnedNaryEnd'    : 'ownedNaryEnd',
+  'Parent'          : 'parent',
+  'Descriptor'      : 'descriptor',
+  'Value'           : 'value',
+  'IO'              : 'io',
+  'NaryEnd'         : 'naryEnd' }
+
+def newElement(mc,name,uid):
+  """ Return a new element of lib/umlmodel.py for the metaclass mc
+      (str,str,str) -> umlmodel.Element
+  """
+  element = METACLASSES.get(mc,umlmodel.Element)()
+  element.name = name
+  element.uuid = uid
+  return element
+
+def setAttributes(element,obj):
+  """ Set the properties of an element from the attributes of its
+      ExmlObject
+      (umlmodel.Element,ExmlObject) -> None
+  """
+  for (attribute,value) in obj.attributes.items():
+    if attribute in ATTRIBUTES:
+      (property,convert) = ATTRIBUTES[attribute]
+      setattr(element,property,convert(value))
+
+def setRelations(element,obj,resolve):
+  """ Set the properties of an element from the relations of its
+      ExmlObject, resolve(reference) returning the element of a reference
+      (umlmodel.Element,ExmlObject,function) -> None
+  """
+  for (relation,references) in obj.comps + obj.links:
+    if relation in SINGLE_RELATIONS:
+      value = None
+      if len(references) > 0:
+        value = resolve(references[0])
+      setattr(element,SINGLE_RELATIONS[relation],value)
+    elif relation in LIST_RELATIONS:
+      setattr(element,LIST_RELATIONS[relation],[resolve(reference) for reference in references])
+
+
+class ExmlModel(object):
+  """ Elements of lib/umlmodel.py built from the ExmlObject of EXML files.
+        objects[uid]    ExmlObject of the elements read
+        order           uids of the elements in the order they were added
+        fragments[uid]  name of the fragment of each element read
+        elements[uid]   umlmodel element of each element read (see build)
+        stubs[uid]      umlmodel elements of the references to elements
+                        that were not read
+  """
+  def __init__(self):
+    self.objects = {}
+    self.order = []
+    self.fragments = {}
+    self.elements = {}
+    self.stubs = {}
+
+  def add(self,objects,fragment=None):
+    """ Add the ExmlObject read in a file of a fragment
+        ([ExmlObject],str?) -> None
+    """
+    for obj in objects:
+      if obj.uid not in self.objects:
+        self.order.append(obj.uid)
+      self.objects[obj.uid] = obj
+      self.fragments[obj.uid] = fragment
+
+  def resolve(self,reference):
+    """ Return the element of a reference (uid,mc,name,pid), a stub if
+        the element was not read
+        ((str,str,str,str)) -> umlmodel.Element
+    """
+    (uid,mc,name,pid) = reference
+    element = self.elements.get(uid)
+    if element is None:
+      element = self.stubs.get(uid)
+      if element is None:
+        element = newElement(mc,name,uid)
+        self.stubs[uid] = element
+    return element
+
+  def build(self):
+    """ Build the elements of the objects added and link them
+        () -> ExmlModel
+    """
+    for uid in self.order:
+      obj = self.objects[uid]
+      element = newElement(obj.mc,obj.name,uid)
+      setAttributes(element,self.objects[uid])
+      self.elements[uid] = element
+    for uid in self.order:
+      setRelations(self.elements[uid],self.objects[uid],self.resolve)
+    for uid in self.order:
+      self._linkOwned(self.elements[uid])
+    for uid in self.order:
+      self._linkOpposites(self.elements[uid])
+    return self
+
+  def _linkOwned(self,element):
+    """ Set the owner of the ends and the sub type of the generalizations
+        of an element
+    """
+    for end in getattr(element,'ownedEnd',[]) + getattr(element,'ownedNaryEnd',[]):
+      end.owner = element
+    for generalization in getattr(element,'parent',[]):
+      generalization.subType = element
+
+  def _linkOpposites(self,element):
+    """ Set the properties that are the opposites of the relations
+        written in the files (end, naryEnd, associationPart,
+        linkToAssociation, ...), once the ends have their owner
+    """
+    if isinstance(element,umlmodel.NaryAssociationEnd):
+      naryAssociation = element.naryAssociation
+      if naryAssociation is not None and element not in naryAssociation.naryEnd:
+        naryAssociation.naryEnd.append(element)
+    elif isinstance(element,umlmodel.AssociationEnd):
+      association = element.association
+      if association is not None and element not in association.end:
+        association.end.append(element)
+      opposite = element.opposite
+      if opposite is not None:
+        opposite.opposite = element
+        # a non navigable end is owned by no class: its source is
+        # the target of its opposite
+        if element.owner is None:
+          element.owner = opposite.target
+        if opposite.owner is None:
+          opposite.owner = element.target
+    elif isinstance(element,(umlmodel.Association,umlmodel.NaryAssociation)):
+      if element.linkToClass is not None:
+        element.linkToClass.associationPart = element
+    elif isinstance(element,umlmodel.ClassAssociation):
+      if element.classPart is not None:
+        element.classPart.linkToAssociation = element
+
+  def elementsOf(self,mc,fragment=None):
+    """ Return the elements of the metaclass mc, in the order they were
+        read, only those of a fragment if given
+        (str,str?) -> [umlmodel.Element]
+    """
+    return [self.elements[uid] for uid in self.order
+            if self.objects[uid].mc == mc and (fragment is None or self.fragments[uid] == fragment)]
+
+  def rootPackages(self,fragment=None):
+    """ Return the root package (model) of the projects, only those of
+        a fragment if given
+        (str?) -> [umlmodel.Package]
+    """
+    return [project.model for project in self.elementsOf('Project',fragment)
+            if isinstance(getattr(project,'model',None),umlmodel.Package)]
+
+  def packagesNamed(self,name,fragment=None):
+    """ Return the packages with a given name
+        (str,str?) -> [umlmodel.Package]
+    """
+    return [package for package in self.elementsOf('Package',fragment) if package.name == name]
+
+
+def loadProject(projectDirectory,fragments=None,workers=1,cache=None):
+  """ Read the EXML files of the fragments of a project (all of them if
+      fragments is None) with workers parallel workers (see parseFiles)
+      and return the ExmlModel built. With a ParseCache, only the files
+      that changed since the previous run are parsed.
+      (str,[str]?,int,ParseCache?) -> ExmlModel
+  """
+  model = ExmlModel()
+  if cache is not None:
+    for (fragment,objects) in cache.parseProject(projectDirectory,fragments,workers):
+      model.add(objects,fragment)
+    return model.build()
+  files = projectFiles(projectDirectory,fragments)
+  results = parseFiles([path for (fragment,path) in files],workers)
+  for ((fragment,path),objects) in zip(files,results):
+    model.add(objects,fragment)
+  return model.build()
+
+
+#-----------------------------------------------------------------------------------
+#   Lazy loading
+#-----------------------------------------------------------------------------------
+# A LazyModel reads no file when it is created: it only lists the files of
+# the project, which gives the fragment, the metaclass and the file of each
+# CMS node (data/fragments/<fragment>/.../<Metaclass>/<uid>.exml), and reads
+# the DEPS block of a file when the name of its node is needed. A file is
+# parsed when one of its elements is first dereferenced (first access to a
+# property other than its name and uuid), so that the load time and the
+# memory follow what the transformation navigates rather than the size of
+# the workspace (the stereotypes of the modules, the types of the
+# libraries, ... are read only if they are used).
+#
+# The file of a referenced element is known without reading it:
+#   - the file named by its uid for a CMS node,
+#   - the file of the PID of a REFOBJ for an element composed in another
+#     file,
+#   - the file of the reference for the other elements (composed in it).
+#
+# The properties that are the opposites of relations written in other
+# elements (owner, subType, end, associationPart, ...) are computed on
+# their first access, from the element composing the element in its file
+# (its "container"). Class.linkToAssociation is the exception: the class
+# part of an association class is written in the file of its association
+# only. It is looked up in the index of the workspace (see
+# lib/exmlindex.py) when the model is given one, which also gives the file
+# of the class owning an end; without index, the files containing them
+# are searched (once for the class parts) when they are first needed.
+
+def readDeps(path):
+  """ Return the references of the DEPS block of an EXML file, the first
+      one being the element of the file. The rest of the file is not read.
+      (str) -> [(str,str,str,str)]
+  """
+  references = []
+  f = open(path,'rb')
+  try:
+    for (event,node) in ElementTree.iterparse(f,('start',)):
+      if node.tag == 'OBJECT':
+        break
+      if node.tag in REFERENCE_TAGS:
+        references.append(_reference(node))
+  finally:
+    f.close()
+  return references
+
+# Properties computed on their first access when they are not written in
+# the file of the element (see LazyModel._<property>)
+OPPOSITE_PROPERTIES = ('owner','opposite','subType','end','associationPart','linkToAssociation')
+
+class _LazyElement(object):
+  """ Mixin of the elements of a LazyModel: the properties of an element
+      that are not yet set are asked to its model
+  """
+  def __getattr__(self,name):
+    model = self.__dict__.get('_model')
+    if model is None or name.startswith('__'):
+      raise AttributeError(name)
+    return model.access(self,name)
+
+_lazyClasses = {}
+
+def _lazyClass(cls):
+  """ The subclass of a class of lib/umlmodel.py for the lazy elements
+  """
+  lazyClass = _lazyClasses.get(cls)
+  if lazyClass is None:
+    lazyClass = type(cls.__name__,(_LazyElement,cls),{})
+    _lazyClasses[cls] = lazyClass
+  return lazyClass
+
+
+class LazyModel(object):
+  """ Elements of lib/umlmodel.py read from the EXML files of a project
+      when they are first dereferenced.
+        files[uid]       (fragment,metaclass,path) of each CMS node
+        paths            paths of the files, in the order of projectFiles
+        loaded           paths of the files parsed
+        objects[uid]     ExmlObject of the elements of the files parsed
+        elements[uid]    element of each uid referenced, read or not
+        index            exmlindex.WorkspaceIndex up to date of the project,
+                         giving the files of the class parts and of the
+                         owners of the ends (None to search the files)
+  """
+  def __init__(self,projectDirectory,fragments=None,index=None):
+    self.index = index
+    self.files = {}
+    self.paths = []
+    self.indexes = {}       # path -> index in paths
+    for (fragment,path) in projectFiles(projectDirectory,fragments):
+      (directory,name) = os.path.split(path)
+      self.files[name[:-len('.exml')]] = (fragment,os.path.basename(directory),path)
+      self.indexes[path] = len(self.paths)
+      self.paths.append(path)
+    self.loaded = set()
+    self.objects = {}
+    self.elements = {}
+    self.positions = {}     # uid -> (index of its file,index in its file)
+    self.containers = {}    # uid -> (uid of its container,relation,path)
+    self.owners = {}        # uid of an end -> (uid of its class,relation,path)
+    self.classParts = {}    # uid of a class -> (reference,path) of its ClassAssociation
+    self.classPartsRead = False
+    self.indexedPaths = None  # absolute path -> path in paths
+    self.names = {}         # uid of a CMS node -> name (read in its DEPS)
+    self.lock = threading.RLock()
+
+  def load(self,path):
+    """ Parse an EXML file, once
+        (str) -> None
+    """
+    if path in self.loaded:
+      return
+    self.loaded.add(path)
+    objects = parseExml(path)
+    fileIndex = self.indexes.get(path,len(self.paths))
+    for (index,obj) in enumerate(objects):
+      if obj.uid in self.objects:
+        continue
+      self.objects[obj.uid] = obj
+      self.positions[obj.uid] = (fileIndex,index)
+    for (uid,(container,relation)) in objectContainers(objects).items():
+      if uid not in self.containers:
+        self.containers[uid] = (container,relation,path)
+    for obj in objects:
+      for (relation,references) in obj.comps:
+        for reference in references:
+          # the ends may be owned by a class of another file
+          if relation in ('OwnedEnd','OwnedNaryEnd'):
+            self.owners[reference[0]] = (obj.uid,relation,path)
+      if obj.mc == 'ClassAssociation':
+        for (relation,references) in obj.links:
+          if relation == 'ClassPart' and len(references) > 0:
+            self.classParts[references[0][0]] = ((obj.uid,obj.mc,obj.name,None),path)
+
+  def element(self,reference,path=None):
+    """ Return the element of a reference (uid,mc,name,pid) found in the
+        file at path, not read until it is dereferenced. The references
+        to the elements of the files that are not listed give stubs.
+        ((str,str,str,str),str?) -> umlmodel.Element
+    """
+    (uid,mc,name,pid) = reference
+    element = self.elements.get(uid)
+    if element is not None:
+      return element
+    if uid in self.files:
+      path = self.files[uid][2]
+    elif pid is not None:
+      path = self.files.get(pid,(None,None,None))[2]
+    if path is None:
+      element = newElement(mc,name,uid)
+    else:
+      lazyClass = _lazyClass(METACLASSES.get(mc,umlmodel.Element))
+      element = lazyClass.__new__(lazyClass)
+      element.__dict__.update({ 'name' : name, 'uuid' : uid, '_model' : self, '_path' : path })
+    self.elements[uid] = element
+    return element
+
+  def node(self,uid):
+    """ Return the element of the CMS node uid (see element)
+        (str) -> umlmodel.Element
+    """
+    (fragment,mc,path) = self.files[uid]
+    return self.element((uid,mc,self.nodeName(uid),None))
+
+  def nodeName(self,uid):
+    """ Return the name of a CMS node, read in the DEPS of its file
+        (str) -> str
+    """
+    if uid not in self.names:
+      name = ''
+      for reference in readDeps(self.files[uid][2]):
+        if reference[0] == uid:
+          name = reference[2]
+          break
+      self.names[uid] = name
+    return self.names[uid]
+
+  def access(self,element,name):
+    """ Return the property name of a lazy element: read the element if
+        it was not, or compute the property if it is the opposite of a
+        relation (see _LazyElement)
+    """
+    self.lock.acquire()
+    try:
+      state = element.__dict__
+      if '_path' in state:
+        self._read(element)
+      if name in state:
+        return state[name]
+      if name in state.get('_opposites',()):
+        state[name] = getattr(self,'_' + name)(element)
+        return state[name]
+      raise AttributeError(name)
+    finally:
+      self.lock.release()
+
+  def _read(self,element):
+    state = element.__dict__
+    path = state.pop('_path')
+    self.load(path)
+    (name,uid) = (element.name,element.uuid)
+    element.__class__.__init__(element)
+    (element.name,element.uuid) = (name,uid)
+    obj = self.objects.get(uid)
+    if obj is None:
+      # not found in its file: a stub
+      return
+    element.name = obj.name
+    opposites = set()
+    for property in OPPOSITE_PROPERTIES:
+      if property in state:
+        opposites.add(property)
+        del state[property]
+    state['_opposites'] = opposites
+    setAttributes(element,obj)
+    setRelations(element,obj,lambda reference: self.element(reference,path))
+
+  def _container(self,element,relations,containers=None):
+    """ The element composing element in its file if it is by one of the
+        relations, else None
+    """
+    if containers is None:
+      containers = self.containers
+    container = containers.get(element.uuid)
+    if container is None or container[1] not in relations:
+      return None
+    (uid,relation,path) = container
+    obj = self.objects[uid]
+    return self.element((uid,obj.mc,obj.name,None),path)
+
+  def _owner(self,end):
+    # the class owning the end in another file is known if its file was
+    # read, which is the case when the end is reached from this class
+    owner = self._container(end,('OwnedEnd','OwnedNaryEnd'),self.owners)
+    if owner is None and end.opposite is not None:
+      # a non navigable end is owned by no class: its source is the
+      # target of its opposite
+      owner = end.opposite.target
+    if owner is None:
+      # neither: the class owning it in another file is read
+      if self.index is not None:
+        self._loadIndexed(self.index.composedIn(end.uuid))
+      else:
+        self._loadReferences(end.uuid)
+      owner = self._container(end,('OwnedEnd','OwnedNaryEnd'),self.owners)
+    return owner
+
+  def _opposite(self,end):
+    return self._container(end,('Opposite',))
+
+  def _subType(self,generalization):
+    return self._container(generalization,('Parent',))
+
+  def _associationPart(self,classAssociation):
+    return self._container(classAssociation,('LinkToClass',))
+
+  def _end(self,association):
+    end = self._container(association,('Association',))
+    if end is None:
+      return []
+    ends = [end]
+    if end.opposite is not None and end.opposite is not end:
+      ends.append(end.opposite)
+    ends = [end for end in ends if end.association is association]
+    return sorted(ends,key=lambda end: self.positions.get(end.uuid))
+
+  def _loadReferences(self,text):
+    """ Read the files that are not read yet and contain text
+    """
+    for path in self.paths:
+      if path not in self.loaded and _contains(path,text):
+        self.load(path)
+
+  def _loadIndexed(self,records):
+    """ Read the files of the project of index records
+    """
+    if self.indexedPaths is None:
+      self.indexedPaths = dict([(os.path.abspath(path),path) for path in self.paths])
+    for record in records:
+      path = self.indexedPaths.get(os.path.abspath(self.index.absolutePath(record)))
+      if path is not None:
+        self.load(path)
+
+  def _linkToAssociation(self,clazz):
+    if self.index is not None:
+      self._loadIndexed(self.index.classAssociationOf(clazz.uuid))
+    elif not self.classPartsRead:
+      self.classPartsRead = True
+      self._loadReferences('relation="ClassPart"')
+    found = self.classParts.get(clazz.uuid)
+    if found is None:
+      return None
+    return self.element(*found)
+
+  def elementsOf(self,mc,fragment=None):
+    """ Return the CMS nodes of the metaclass mc, in the order of their
+        files, only those of a fragment if given
+        (str,str?) -> [umlmodel.Element]
+    """
+    nodes = []
+    for path in self.paths:
+      uid = os.path.basename(path)[:-len('.exml')]
+      (nodeFragment,nodeMc,nodePath) = self.files[uid]
+      if nodeMc == mc and (fragment is None or nodeFragment == fragment):
+        nodes.append(self.node(uid))
+    return nodes
+
+  def rootPackages(self,fragment=None):
+    """ Return the root package (model) of the projects, only those of
+        a fragment if given
+        (str?) -> [umlmodel.Package]
+    """
+    return [project.model for project in self.elementsOf('Project',fragment)
+            if isinstance(getattr(project,'model',None),umlmodel.Package)]
+
+  def packagesNamed(self,name,fragment=None):
+    """ Return the packages with a given name, found without reading the
+        other packages
+        (str,str?) -> [umlmodel.Package]
+    """
+    return [package for package in self.elementsOf('Package',fragment) if package.name == name]
+
+def _contains(path,text):
+  f = open(path,'rb')
+  try:
+    return text in f.read()
+  finally:
+    f.close()
@@ -0,0 +1,336 @@
+#
+# exmlindex
+#
+# On-disk index of the elements of the Modelio projects of a workspace, to
+# find an element by uuid, name prefix, metaclass or owner without scanning
+# the directories and reading the EXML files (see GenOCL-Index.py).
+#
+# The index keeps one record per element of the EXML files of the projects
+#     (uid,metaclass,name,owner uid,fragment,path,class part uid)
+# where the owner is the element composing it in its file, or the CMS node
+# owning it (its PID) for the element of the file, the path is relative
+# to the workspace and the class part is the class linked to a
+# ClassAssociation (None for the other elements), which is written in the
+# file of the association only (see exml.LazyModel). The elements composed
+# in a file but written in another one (REFOBJ, e.g. the end of an
+# association owned by a class of another file) have a record of the same
+# form in the file composing them, kept apart from the records of the
+# elements. The records are stored with the files they were read from,
+# with the size and the modification time of each file, so that an update
+# only reads the files that were added or changed (all the files of a
+# fragment whose admin files changed, as the parse cache of lib/exml.py).
+#
+# The lookups are binary searches (bisect) in sorted arrays of keys built
+# from the records, one per column searched (uid, lower-case name,
+# metaclass, owner, class part, and uid of the elements composed by
+# reference); the arrays are saved with the records so that the
+# index is ready to use as soon as it is read. An update only removes the
+# records of the files changed or removed from the arrays and inserts the
+# records read at their place, the arrays being sorted again entirely only
+# when most of the records changed. sqlite3 would do the same but is not
+# available in Jython.
+#
+#     index = WorkspaceIndex('..','.genocl-cache/workspace.index',['CyberResidences'])
+#     index.update()
+#     index.save()
+#     for record in index.named('Resid'): ...
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import os
+import bisect
+import cPickle
+
+import exml
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "INDEX_VERSION",
+  "UID", "METACLASS", "NAME", "OWNER", "FRAGMENT", "PATH", "CLASS_PART",
+  "fileRecords",
+  "fileReferences",
+  "WorkspaceIndex" ]
+
+# To be increased when the records or the arrays change so that the index
+# written by the previous version is rebuilt
+INDEX_VERSION = 3
+
+# Fields of the records
+(UID,METACLASS,NAME,OWNER,FRAGMENT,PATH,CLASS_PART) = range(7)
+
+
+def fileRecords(objects,fragment,path):
+  """ Return the records of the ExmlObject read in a file of a fragment,
+      path being the path of the file in the index
+      ([ExmlObject],str,str) -> [(str,str,str,str,str,str,str)]
+  """
+  containers = exml.objectContainers(objects)
+  records = []
+  for obj in objects:
+    owner = obj.pid
+    if obj.uid in containers:
+      owner = containers[obj.uid][0]
+    classPart = None
+    if obj.mc == 'ClassAssociation':
+      for (relation,references) in obj.links:
+        if relation == 'ClassPart' and len(references) > 0:
+          classPart = references[0][0]
+    records.append((obj.uid,obj.mc,obj.name,owner,fragment,path,classPart))
+  return records
+
+def fileReferences(objects,fragment,path):
+  """ Return the records of the elements composed by the ExmlObject read in
+      a file but written in another file (REFOBJ), their owner being the
+      element composing them in this file
+      ([ExmlObject],str,str) -> [(str,str,str,str,str,str,str)]
+  """
+  uids = set([obj.uid for obj in objects])
+  records = []
+  for obj in objects:
+    for (relation,references) in obj.comps:
+      for (uid,mc,name,pid) in references:
+        if uid not in uids:
+          records.append((uid,mc,name,obj.uid,fragment,path,None))
+  return records
+
+
+# Columns searched: the records of the files they sort (2 for the records
+# of the elements, 3 for the elements composed by reference, see the files
+# of WorkspaceIndex) and their key
+_COLUMNS = {
+  'uid'       : (2,lambda record: record[UID]),
+  'name'      : (2,lambda record: record[NAME].lower()),
+  'metaclass' : (2,lambda record: record[METACLASS]),
+  'owner'     : (2,lambda record: record[OWNER] or ''),
+  'classPart' : (2,lambda record: record[CLASS_PART] or ''),
+  'composed'  : (3,lambda record: record[UID]) }
+
+
+class _Column(object):
+  """ A column of the records of files sorted for binary searches: keys[i]
+      is the key of records[i], the records of a key being sorted too
+  """
+  __slots__ = ('name','keys','records')
+  def __init__(self,name,entries):
+    (part,key) = _COLUMNS[name]
+    pairs = sorted([(key(record),record) for entry in entries for record in entry[part]])
+    self.name = name
+    self.keys = [k for (k,record) in pairs]
+    self.records = [record for (k,record) in pairs]
+  def __getstate__(self):
+    return (self.name,self.keys,self.records)
+  def __setstate__(self,state):
+    (self.name,self.keys,self.records) = state
+  def _position(self,k,record):
+    low = bisect.bisect_left(self.keys,k)
+    high = bisect.bisect_right(self.keys,k,low)
+    return bisect.bisect_left(self.records,record,low,high)
+  def merge(self,removed,added):
+    """ Remove the records of the files removed and insert the records of
+        the files added at their place
+    """
+    (part,key) = _COLUMNS[self.name]
+    for entry in removed:
+      for record in entry[part]:
+        position = self._position(key(record),record)
+        del self.keys[position]
+        del self.records[position]
+    for entry in added:
+      for record in entry[part]:
+        k = key(record)
+        position = self._position(k,record)
+        self.keys.insert(position,k)
+        self.records.insert(position,record)
+  def equal(self,key):
+    low = bisect.bisect_left(self.keys,key)
+    high = bisect.bisect_right(self.keys,key,low)
+    return self.records[low:high]
+  def prefixed(self,prefix):
+    low = bisect.bisect_left(self.keys,prefix)
+    high = low
+    while high < len(self.keys) and self.keys[high].startswith(prefix):
+      high = high + 1
+    return self.records[low:high]
+
+
+class WorkspaceIndex(object):
+  """ Index of the elements of projects of a workspace.
+        workspace  directory of the projects
+        path       file where the index is kept (None for no file)
+        projects   names of the projects indexed
+        fragments  by (project,fragment), the stamp of the fragment (see
+                   exml.fragmentStamp) and its files as
+                   { path : (size,mtime,[record],[reference record]) }
+        columns    sorted records by column searched (see _Column)
+        read       number of files read by the last update
+        changed    True if the index must be saved
+  """
+  def __init__(self,workspace,path=None,projects=None):
+    self.workspace = workspace
+    self.path = path
+    self.projects = projects
+    self.fragments = {}
+    self.columns = {}
+    self.read = 0
+    self.changed = False
+    if path is not None and os.path.isfile(path):
+      self.load()
+    if self.projects is None:
+      self.projects = sorted([name for name in os.listdir(workspace)
+                              if os.path.isdir(os.path.join(workspace,name,'data','fragments'))])
+    if not self.columns:
+      self._sort()
+
+  def __len__(self):
+    return len(self.columns['uid'].keys)
+
+  def load(self):
+    """ Read the index saved. An index written by another version, or for
+        other projects when projects is given, is ignored.
+    """
+    f = open(self.path,'rb')
+    try:
+      try:
+        (version,projects,fragments,columns) = cPickle.load(f)
+      except Exception:
+        return
+    finally:
+      f.close()
+    if version != INDEX_VERSION or (self.projects is not None and projects != self.projects):
+      return
+    (self.projects,self.fragments,self.columns) = (projects,fragments,columns)
+
+  def save(self):
+    """ Write the index if it changed since it was read, creating the
+        directory of the file if needed
+    """
+    if self.path is None or not self.changed:
+      return
+    directory = os.path.dirname(self.path)
+    if directory and not os.path.isdir(directory):
+      os.makedirs(directory)
+    f = open(self.path,'wb')
+    try:
+      cPickle.dump((INDEX_VERSION,self.projects,self.fragments,self.columns),f,2)
+    finally:
+      f.close()
+    self.changed = False
+
+  def update(self,workers=1):
+    """ Read the files of the projects added or changed since the index
+        was built (with workers parallel workers, see exml.parseFiles),
+        forget the files removed and merge the records of the files
+        changed into the sorted columns. Return the number of files read.
+        (int) -> int
+    """
+    fragments = {}
+    toRead = []       # (files of the fragment,fragment,path,size,mtime)
+    for project in self.projects:
+      for (fragment,directory) in exml.fragmentDirectories(os.path.join(self.workspace,project)):
+        stamp = exml.fragmentStamp(directory)
+        (cachedStamp,cached) = self.fragments.get((project,fragment),(None,{}))
+        if cachedStamp != stamp:
+          cached = {}
+        files = {}
+        fragments[(project,fragment)] = (stamp,files)
+        for path in exml.exmlFiles(directory):
+          key = os.path.relpath(path,self.workspace)
+          info = os.stat(path)
+          entry = cached.get(key)
+          if entry is not None and entry[0] == info.st_size and entry[1] == info.st_mtime:
+            files[key] = entry
+          else:
+            toRead.append((files,fragment,key,info.st_size,info.st_mtime))
+        if len(files) != len(cached):
+          self.changed = True
+
+    parsed = exml.parseFiles([os.path.join(self.workspace,key) for (files,fragment,key,size,mtime) in toRead],workers)
+    added = []
+    for ((files,fragment,key,size,mtime),objects) in zip(toRead,parsed):
+      files[key] = (size,mtime,fileRecords(objects,fragment,key),fileReferences(objects,fragment,key))
+      added.append(files[key])
+    if len(toRead) > 0 or set(fragments) != set(self.fragments):
+      self.changed = True
+    # the entries of the files kept unchanged are the same objects
+    removed = []
+    for (fragment,(stamp,cached)) in self.fragments.items():
+      files = fragments.get(fragment,(None,{}))[1]
+      for (key,entry) in cached.items():
+        if files.get(key) is not entry:
+          removed.append(entry)
+    self.fragments = fragments
+    self.read = len(toRead)
+    if sum([len(entry[2]) for entry in removed + added]) > len(self) // 2:
+      self._sort()
+    elif self.changed:
+      for column in self.columns.values():
+        column.merge(removed,added)
+    return self.read
+
+  def rebuild(self,workers=1):
+    """ Build the index from scratch, reading every file once
+        (int) -> int
+    """
+    self.fragments = {}
+    self.changed = True
+    return self.update(workers)
+
+  def absolutePath(self,record):
+    """ Return the path of the file of a record
+        (record) -> str
+    """
+    return os.path.join(self.workspace,record[PATH])
+
+  def _sort(self):
+    entries = []
+    for (stamp,files) in self.fragments.values():
+      entries.extend(files.values())
+    self.columns = dict([(name,_Column(name,entries)) for name in _COLUMNS])
+
+  #---- lookups
+
+  def lookup(self,uid):
+    """ Return the records of an uid (one per project for the elements of
+        the libraries shared by several projects)
+        (str) -> [record]
+    """
+    return self.columns['uid'].equal(uid)
+
+  def named(self,prefix,ignoreCase=True):
+    """ Return the records whose name starts with prefix, sorted by name
+        (str,bool?) -> [record]
+    """
+    records = self.columns['name'].prefixed(prefix.lower())
+    if not ignoreCase:
+      records = [record for record in records if record[NAME].startswith(prefix)]
+    return records
+
+  def ofMetaclass(self,mc):
+    """ Return the records of the elements of the metaclass mc
+        (str) -> [record]
+    """
+    return self.columns['metaclass'].equal(mc)
+
+  def ownedBy(self,uid):
+    """ Return the records of the elements owned by uid
+        (str) -> [record]
+    """
+    return self.columns['owner'].equal(uid)
+
+  def classAssociationOf(self,uid):
+    """ Return the records of the ClassAssociation whose class part is the
+        class uid
+        (str) -> [record]
+    """
+    return self.columns['classPart'].equal(uid)
+
+  def composedIn(self,uid):
+    """ Return the records of the files composing the element uid written
+        in another file (see fileReferences)
+        (str) -> [record]
+    """
+    return self.columns['composed'].equal(uid)
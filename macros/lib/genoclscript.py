@@ -0,0 +1,66 @@
+#
+# genoclscript
+#
+# Functions shared by the scripts running GenOCL.py outside of a Modelio
+# selection (GenOCL-Headless.py, GenOCL-Render.py, GenOCL-Benchmark.py,
+# GenOCL-Index.py): the directories of the macros and the loading of
+# GenOCL.py as a library (see GENOCL_AS_LIBRARY in GenOCL.py).
+#
+# The directories are computed from the place of this module in the 'lib'
+# directory of the macros, so they are the same whether the scripts are
+# run with a plain python 2 interpreter or as Modelio macros. A script
+# only has to put the 'lib' directory on the python path first:
+#
+#     import genoclscript
+#     g = genoclscript.loadGenOCL()
+#     context = g['GenerationContext']('CyberResidences')
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import os
+import sys
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "isJython",
+  "libraryDirectory",
+  "macrosDirectory",
+  "loadGenOCL" ]
+
+
+def isJython():
+  """ Return True when running on Jython (in Modelio or not)
+      () -> bool
+  """
+  return sys.platform.startswith('java')
+
+def libraryDirectory():
+  """ Return the 'lib' directory of the macros, the directory of this
+      module
+      () -> str
+  """
+  return os.path.dirname(os.path.abspath(__file__))
+
+def macrosDirectory():
+  """ Return the macros directory, where GenOCL.py is
+      () -> str
+  """
+  return os.path.dirname(libraryDirectory())
+
+def loadGenOCL(umlModel=True):
+  """ Return the namespace of GenOCL.py loaded as a library. With umlModel,
+      the metaclasses of the namespace are the ones of lib/umlmodel.py, so
+      that GenOCL works on the models of umlmodel and exml.
+      (bool?) -> dict
+  """
+  path = os.path.join(macrosDirectory(),'GenOCL.py')
+  genocl = {'GENOCL_AS_LIBRARY' : True, '__name__' : 'GenOCL', '__file__' : path}
+  if umlModel:
+    import umlmodel
+    genocl = umlmodel.genoclNamespace(genocl)
+  execfile(path,genocl)
+  return genocl
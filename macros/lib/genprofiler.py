@@ -0,0 +1,216 @@
+#
+# genprofiler
+#
+# Opt-in profiler of GenOCL (see PROFILE in GenOCL.py): call counts,
+# cumulative and self times of the functions of a namespace, and number
+# of properties of the model elements read by each function.
+#
+# The functions of the namespace are replaced by measuring wrappers while
+# the profiler is installed, and the model elements are wrapped in proxies
+# counting each property read (CountingProxy). Nothing is wrapped when
+# the profiler is not used, so it costs nothing in normal runs.
+#
+#     profiler = Profiler(globals())
+#     profiler.install()
+#     try:
+#       generate([profiler.proxy(e) for e in elements])
+#     finally:
+#       profiler.uninstall()
+#     print profiler.report()
+#
+# A profiler keeps one stack of the calls in progress, so it measures a
+# generation running in one thread.
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import time
+import inspect
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "PLAIN_VALUES",
+  "CountingProxy",
+  "FunctionStats",
+  "Profiler" ]
+
+# Values returned as is by the proxies (not model elements)
+PLAIN_VALUES = (basestring,bool,int,long,float,type(None))
+
+
+class CountingProxy(object):
+  """ Stand-in for a model element (or a collection, a method or any other
+      value obtained from an element) that counts each property read on
+      the profiler and returns the values read wrapped in proxies too.
+      isinstance and comparisons see the wrapped element.
+  """
+  __slots__ = ('_target','_profiler')
+
+  def __init__(self,target,profiler):
+    self._target = target
+    self._profiler = profiler
+
+  @property
+  def __class__(self):
+    return self._target.__class__
+
+  def __getattr__(self,name):
+    value = getattr(self._target,name)
+    self._profiler.countRead()
+    return self._profiler.proxy(value)
+
+  def __call__(self,*args):
+    return self._profiler.proxy(self._target(*args))
+
+  def __iter__(self):
+    for item in self._target:
+      yield self._profiler.proxy(item)
+
+  def __len__(self):
+    return len(self._target)
+
+  def __getitem__(self,index):
+    return self._profiler.proxy(self._target[index])
+
+  def __contains__(self,item):
+    return _unwrapped(item) in self._target
+
+  def __add__(self,other):
+    return self._profiler.proxy(self._target + _unwrapped(other))
+
+  def __radd__(self,other):
+    return self._profiler.proxy(_unwrapped(other) + self._target)
+
+  def __nonzero__(self):
+    return bool(self._target)
+
+  def __eq__(self,other):
+    return self._target == _unwrapped(other)
+
+  def __ne__(self,other):
+    return not self.__eq__(other)
+
+  def __hash__(self):
+    return hash(self._target)
+
+  def __str__(self):
+    return str(self._target)
+
+  def __repr__(self):
+    return repr(self._target)
+
+
+def _unwrapped(value):
+  """ The value wrapped by a CountingProxy, or value itself
+  """
+  if isinstance(value,CountingProxy):
+    return object.__getattribute__(value,'_target')
+  return value
+
+
+class FunctionStats(object):
+  """ Measures of a profiled function (times in seconds)
+  """
+  __slots__ = ('name','calls','cumulative','self','reads','active')
+
+  def __init__(self,name):
+    self.name = name
+    self.calls = 0
+    self.cumulative = 0.0
+    self.self = 0.0
+    self.reads = 0
+    self.active = 0
+
+
+class Profiler(object):
+  """ Call counts, cumulative and self times and property reads of the
+      functions of a namespace. Property reads are counted for the
+      innermost profiled function being called.
+        namespace  dictionary of the functions profiled (None to only
+                   count the property reads)
+        excluded   names of the functions never wrapped
+        stats      FunctionStats by function name
+        calls      stack of [FunctionStats,time of the children]
+        wrapped    original functions by name while installed
+  """
+  def __init__(self,namespace=None,excluded=()):
+    self.namespace = namespace
+    self.excluded = set(excluded)
+    self.stats = {'<outside functions>' : FunctionStats('<outside functions>')}
+    self.calls = []
+    self.wrapped = {}
+
+  def proxy(self,value):
+    """ Return value wrapped in a CountingProxy unless it is a plain value
+        or already a proxy
+    """
+    if isinstance(value,PLAIN_VALUES) or isinstance(value,CountingProxy):
+      return value
+    return CountingProxy(value,self)
+
+  def countRead(self):
+    if len(self.calls) > 0:
+      self.calls[-1][0].reads += 1
+    else:
+      self.stats['<outside functions>'].reads += 1
+
+  def wrap(self,function):
+    """ Return a function measuring the calls to function
+    """
+    stats = self.stats.setdefault(function.__name__,FunctionStats(function.__name__))
+    calls = self.calls
+    def profiled(*args,**kwargs):
+      frame = [stats,0.0]
+      calls.append(frame)
+      stats.calls += 1
+      stats.active += 1
+      startTime = time.time()
+      try:
+        return function(*args,**kwargs)
+      finally:
+        elapsed = time.time() - startTime
+        calls.pop()
+        stats.active -= 1
+        stats.self += elapsed - frame[1]
+        if stats.active == 0:
+          # not counted again for recursive calls
+          stats.cumulative += elapsed
+        if len(calls) > 0:
+          calls[-1][1] += elapsed
+    profiled.__name__ = function.__name__
+    profiled.__doc__ = function.__doc__
+    return profiled
+
+  def install(self):
+    """ Replace the functions defined in the namespace by measuring
+        wrappers. Generators are not wrapped as their bodies run after
+        the call.
+    """
+    for (name,value) in self.namespace.items():
+      if (inspect.isfunction(value)
+          and value.func_globals is self.namespace
+          and not inspect.isgeneratorfunction(value)
+          and name not in self.excluded):
+        self.wrapped[name] = value
+        self.namespace[name] = self.wrap(value)
+
+  def uninstall(self):
+    """ Restore the original functions of the namespace
+    """
+    self.namespace.update(self.wrapped)
+    self.wrapped = {}
+
+  def report(self,limit=30):
+    """ Return the report of the functions ranked by self time
+        (int?) -> str
+    """
+    ranked = [stats for stats in self.stats.values() if stats.calls > 0 or stats.reads > 0]
+    ranked.sort(key=lambda stats: (stats.self,stats.reads),reverse=True)
+    lines = ['-- %-28s %8s %10s %10s %8s' % ('function','calls','cumul (s)','self (s)','reads')]
+    for stats in ranked[:limit]:
+      lines.append('-- %-28s %8d %10.4f %10.4f %8d' % (stats.name,stats.calls,stats.cumulative,stats.self,stats.reads))
+    lines.append('-- %d property reads in total' % sum([stats.reads for stats in ranked]))
+    return '\n'.join(lines)
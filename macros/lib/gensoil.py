@@ -0,0 +1,427 @@
+#
+# gensoil
+#
+# Generator of USE object states (SOIL scripts) for the snapshot records
+# collected by GenOCL (PackageContents), to load-test the constraints of a
+# generated specification on large states.
+#
+# The script creates a given number of objects per concrete class, gives
+# a type-correct value to each attribute (including the inherited ones)
+# and inserts the links of the binary associations so that every object
+# has a number of links within the multiplicities of the ends:
+#
+#   - the objects that may play an end are the instances of the class of
+#     the end and of its concrete subclasses ("pool" of the end),
+#   - the n-th link joins the object (n mod size0) of the first pool to
+#     the object ((n + n / lcm(size0, size1)) mod size1) of the second
+#     one. This circulant scheme spreads the links evenly (the numbers of
+#     links of two objects of a pool differ by one at most) and never
+#     repeats a pair, so the number of links is simply chosen in the
+#     range allowed by the multiplicities of both ends. In an association
+#     from a class to itself, no object is linked to itself: the second
+#     object is shifted by one and there are at most s*(s-1) links
+#     between the s objects of the pool.
+#
+# Association classes get one object per link ("new ... between"). Their
+# objects may play the ends of other associations, so they belong to the
+# pools too. The script is written in three steps, so that every object
+# exists before it is referenced:
+#
+#   1. the objects of the classes, then those of the association classes,
+#      each association class after the ones whose objects play its ends,
+#   2. the attributes of all the objects, class-typed attributes
+#      referencing objects of the pool of their type,
+#   3. the links of the binary associations, then of the n-ary ones.
+#
+# N-ary associations get one link per object of their largest pool; their
+# multiplicities are not checked.
+#
+# Nothing is kept per object: the names of the objects are computed from
+# their class and their index, so states of millions of objects are
+# written with bounded memory.
+#
+#     for text in iterSoil(contents, hierarchy, associationName, 1000):
+#       f.write(text)
+#
+# Running the module checks the links of small states:
+#
+#     python gensoil.py
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "parseMultiplicity",
+  "linkCount",
+  "Pool",
+  "iterSoil",
+  "writeSoil" ]
+
+
+def parseMultiplicity(low,high):
+  """ Return the multiplicity (min,max) of an end as integers, with
+      None as max for '*'
+  """
+  try:
+    low = int(low)
+  except (TypeError,ValueError):
+    low = 0
+  try:
+    high = int(high)
+  except (TypeError,ValueError):
+    high = None
+  return (low,high)
+
+def _gcd(a,b):
+  while b:
+    (a,b) = (b,a % b)
+  return a
+
+def linkCount(size0,multiplicity0,size1,multiplicity1,maxLinks=None):
+  """ Return the number of links to insert between two pools of size0
+      and size1 objects, the multiplicities being those of the ends of
+      the pools, or None if they cannot be satisfied. The objects of the
+      second pool have between min0 and max0 links, those of the first
+      one between min1 and max1 links. maxLinks, if given, bounds the
+      number of links too (see _Links).
+  """
+  (min0,max0) = multiplicity0
+  (min1,max1) = multiplicity1
+  low = max(size1 * min0,size0 * min1)
+  high = size0 * size1
+  if maxLinks is not None:
+    high = min(high,maxLinks)
+  if max0 is not None:
+    high = min(high,size1 * max0)
+  if max1 is not None:
+    high = min(high,size0 * max1)
+  if low > high:
+    return None
+  # about one link per object of the largest pool when it is allowed
+  return max(low,min(high,max(size0,size1)))
+
+def _link(n,size0,size1,lcm,shift=0):
+  """ Indexes of the objects of the n-th link (see the circulant scheme).
+      shift moves the second object, e.g. to avoid linking an object to
+      itself in the associations from a class to itself. With size0 ==
+      size1 == s and shift 1, the links n < s*(s-1) are all the pairs
+      of distinct objects, the next ones link each object to itself.
+  """
+  return (n % size0,(n + n // lcm + shift) % size1)
+
+
+class Pool(object):
+  """ The objects that may play an end of class: the instances of the
+      class and of its concrete subclasses, as segments (prefix,count)
+  """
+  __slots__ = ('segments','size')
+  def __init__(self,segments):
+    self.segments = segments
+    self.size = sum([count for (prefix,count) in segments])
+  def name(self,index):
+    for (prefix,count) in self.segments:
+      if index < count:
+        return prefix + str(index)
+      index = index - count
+    raise IndexError(index)
+
+
+def _lowerFirst(name):
+  return name[:1].lower() + name[1:]
+
+def objectPrefix(clazz):
+  """ Prefix of the names of the objects of a class (name_<index>)
+  """
+  return _lowerFirst(clazz.name) + '_'
+
+
+class _State(object):
+  """ What is known of the model to generate its state
+  """
+  def __init__(self,contents,hierarchy,instances):
+    self.instances = instances
+    self.hierarchy = hierarchy
+    self.enumerations = {}    # name -> EnumRec
+    for enumeration in contents.enumerations:
+      self.enumerations[enumeration.name] = enumeration
+    self.associationClasses = {}
+    for asso in contents.associationClasses:
+      self.associationClasses[asso.classPart.uuid] = asso
+    # the hierarchy may hold the classes of other packages too
+    self.classes = set([c.uuid for c in contents.classes])
+    self.classes.update(self.associationClasses.keys())
+    self.counts = {}          # uuid -> number of objects of a class
+    self.links = {}           # association uuid -> _Links
+    self.created = []         # association classes in creation order
+    self.pools = {}           # uuid -> Pool
+    self.poolsByName = {}     # class name -> Pool
+    for uuid in self.classes:
+      pool = self.pool(uuid)
+      self.poolsByName[hierarchy.classes[uuid].name] = pool
+
+  def count(self,clazz):
+    """ Number of objects of a class: instances for a concrete class,
+        one per link for an association class
+    """
+    if clazz.isAbstract:
+      return 0
+    asso = self.associationClasses.get(clazz.uuid)
+    if asso is None:
+      return self.instances
+    if len(asso.ends) != 2:
+      return 0
+    count = self.counts.get(clazz.uuid)
+    if count is None:
+      # an association class whose ends reach its own objects gets none
+      self.counts[clazz.uuid] = 0
+      count = self.associationLinks(asso).count
+      self.counts[clazz.uuid] = count
+      self.created.append(asso)
+    return count
+
+  def pool(self,uuid):
+    """ Pool of the ends of the class with uuid, None if it is unknown
+    """
+    if uuid not in self.classes:
+      return None
+    pool = self.pools.get(uuid)
+    if pool is None:
+      segments = [(objectPrefix(c),self.count(c)) for c in self.hierarchy.descendants(uuid)
+                  if c.uuid in self.classes]
+      pool = Pool([(prefix,count) for (prefix,count) in segments if count > 0])
+      self.pools[uuid] = pool
+    return pool
+
+  def associationLinks(self,asso):
+    """ The _Links of a binary association
+    """
+    links = self.links.get(asso.uuid)
+    if links is None:
+      links = _Links(self,asso)
+      self.links[asso.uuid] = links
+    return links
+
+  def attributes(self,clazz):
+    """ Own and inherited attributes of a class, the inherited first
+    """
+    result = []
+    seen = set()
+    def visit(current):
+      if current.uuid in seen:
+        return
+      seen.add(current.uuid)
+      for parentId in self.hierarchy.parents[current.uuid]:
+        visit(self.hierarchy.classes[parentId])
+      result.extend(current.attributes)
+    visit(clazz)
+    return result
+
+  def value(self,oclType,attribute,index):
+    """ A value of type oclType for the object index, None for the
+        types that have no simple value (collections, OclAny, ...)
+    """
+    if oclType == 'Integer':
+      return str(index)
+    if oclType == 'Real':
+      return '%d.5' % index
+    if oclType == 'Boolean':
+      return index % 2 == 0 and 'true' or 'false'
+    if oclType == 'String':
+      return "'%s_%d'" % (attribute.name,index)
+    enumeration = self.enumerations.get(oclType)
+    if enumeration is not None:
+      if not enumeration.literals:
+        return None
+      return '%s::%s' % (enumeration.name,enumeration.literals[index % len(enumeration.literals)])
+    pool = self.poolsByName.get(oclType)
+    if pool is not None and pool.size > 0:
+      return pool.name(index % pool.size)
+    return None
+
+  def setAttributes(self,name,attributes,index):
+    lines = []
+    for attribute in attributes:
+      value = self.value(attribute.oclType,attribute,index)
+      if value is not None:
+        lines.append('!%s.%s := %s\n' % (name,attribute.name,value))
+    return ''.join(lines)
+
+
+class _Links(object):
+  """ The links of a binary association: the pools of its ends and the
+      number of links, or the reason why there is none (problem)
+  """
+  __slots__ = ('pool0','pool1','count','lcm','shift','problem')
+  def __init__(self,state,asso):
+    (end0,end1) = asso.ends
+    self.pool0 = state.pool(end0.ownerId)
+    self.pool1 = state.pool(end1.ownerId)
+    self.count = 0
+    self.problem = None
+    if self.pool0 is None or self.pool1 is None:
+      self.problem = 'no object for %s' % (self.pool0 is None and end0.ownerName or end1.ownerName)
+      return
+    multiplicity0 = parseMultiplicity(end0.multiplicityMin,end0.multiplicityMax)
+    multiplicity1 = parseMultiplicity(end1.multiplicityMin,end1.multiplicityMax)
+    maxLinks = None
+    if end0.ownerId == end1.ownerId:
+      # no object linked to itself (see _link)
+      maxLinks = self.pool0.size * (self.pool0.size - 1)
+    count = linkCount(self.pool0.size,multiplicity0,self.pool1.size,multiplicity1,maxLinks)
+    if count is None:
+      self.problem = 'the multiplicities cannot be satisfied with %d %s and %d %s' % (
+        self.pool0.size,end0.ownerName,self.pool1.size,end1.ownerName)
+      return
+    self.count = count
+    if count > 0:
+      self.lcm = self.pool0.size * self.pool1.size // _gcd(self.pool0.size,self.pool1.size)
+      self.shift = int(end0.ownerId == end1.ownerId)
+
+  def names(self,n):
+    """ Names of the objects of the n-th link
+    """
+    (i,j) = _link(n,self.pool0.size,self.pool1.size,self.lcm,self.shift)
+    return (self.pool0.name(i),self.pool1.name(j))
+
+
+def _iterObjects(state,clazz):
+  prefix = objectPrefix(clazz)
+  for index in xrange(state.count(clazz)):
+    yield "!new %s('%s')\n" % (clazz.name,prefix + str(index))
+
+def _iterAssociationObjects(state,asso,name):
+  links = state.associationLinks(asso)
+  if links.problem is not None:
+    yield '-- %s: %s\n' % (name,links.problem)
+    return
+  prefix = objectPrefix(asso.classPart)
+  for n in xrange(links.count):
+    yield "!new %s('%s') between (%s, %s)\n" % ((name,prefix + str(n)) + links.names(n))
+
+def _iterAttributes(state,clazz):
+  prefix = objectPrefix(clazz)
+  attributes = state.attributes(clazz)
+  if len(attributes) == 0:
+    return
+  for index in xrange(state.count(clazz)):
+    text = state.setAttributes(prefix + str(index),attributes,index)
+    if text:
+      yield text
+
+def _iterBinaryLinks(state,asso,name):
+  links = state.associationLinks(asso)
+  if links.problem is not None:
+    yield '-- %s: %s\n' % (name,links.problem)
+    return
+  for n in xrange(links.count):
+    yield '!insert (%s, %s) into %s\n' % (links.names(n) + (name,))
+
+def _iterNaryLinks(state,asso,name):
+  pools = [state.pools.get(end.ownerId) for end in asso.ends]
+  if None in pools or 0 in [pool.size for pool in pools]:
+    yield '-- %s: no object for one of its ends\n' % name
+    return
+  for n in xrange(max([pool.size for pool in pools])):
+    names = [pool.name(n % pool.size) for pool in pools]
+    yield '!insert (%s) into %s\n' % (', '.join(names),name)
+
+def iterSoil(contents,hierarchy,associationName,instances):
+  """ Generate the SOIL script creating instances objects per concrete
+      class of contents (a PackageContents whose types are resolved)
+      as a sequence of text fragments. hierarchy is a HierarchyIndex
+      holding the classes and class parts of contents (see GenOCL), only
+      these classes get objects, and
+      associationName(asso) returns the name of an association in the
+      specification.
+  """
+  state = _State(contents,hierarchy,instances)
+  yield '-- %d object(s) per class\n' % instances
+  # 1. objects
+  for clazz in contents.classes:
+    for text in _iterObjects(state,clazz):
+      yield text
+  for asso in state.created:
+    for text in _iterAssociationObjects(state,asso,associationName(asso)):
+      yield text
+  # 2. attributes
+  for clazz in contents.classes + [asso.classPart for asso in state.created]:
+    for text in _iterAttributes(state,clazz):
+      yield text
+  # 3. links
+  for asso in contents.associations:
+    if len(asso.ends) == 2:
+      for text in _iterBinaryLinks(state,asso,associationName(asso)):
+        yield text
+  for asso in contents.naryAssociations:
+    for text in _iterNaryLinks(state,asso,associationName(asso)):
+      yield text
+
+def writeSoil(path,contents,hierarchy,associationName,instances):
+  """ Write the SOIL script of iterSoil in the file at path.
+      Return the number of lines.
+  """
+  nbLines = 0
+  f = open(path,'w')
+  try:
+    for text in iterSoil(contents,hierarchy,associationName,instances):
+      f.write(text)
+      nbLines = nbLines + text.count('\n')
+  finally:
+    f.close()
+  return nbLines
+
+
+#-----------------------------------------------------------------------------------
+#   Self test
+#-----------------------------------------------------------------------------------
+
+class _Rec(object):
+  def __init__(self,**values):
+    self.__dict__.update(values)
+
+class _Hierarchy(object):
+  """ The part of the HierarchyIndex of GenOCL used here, for classes
+      with no generalization
+  """
+  def __init__(self,classes):
+    self.classes = dict([(c.uuid,c) for c in classes])
+    self.parents = dict([(c.uuid,[]) for c in classes])
+  def descendants(self,uuid):
+    return [self.classes[uuid]]
+
+def _selfLinks(instances,low):
+  """ Return the SOIL script of a class A with an association R from A
+      to itself, each object having at least low links
+  """
+  clazz = _Rec(uuid='a',name='A',isAbstract=False,attributes=[],parentIds=[])
+  ends = [_Rec(ownerId='a',ownerName='A',multiplicityMin=str(low),multiplicityMax='*') for i in range(2)]
+  asso = _Rec(uuid='r',name='R',ends=ends,classPart=None)
+  contents = _Rec(classes=[clazz],enumerations=[],associationClasses=[],associations=[asso],naryAssociations=[])
+  return ''.join(iterSoil(contents,_Hierarchy([clazz]),lambda asso: asso.name,instances))
+
+def _selfTest():
+  """ Check that no object is linked to itself, raise AssertionError
+      on the first wrong result
+  """
+  for s in range(1,8):
+    for n in range(s * (s - 1)):
+      (i,j) = _link(n,s,s,s,1)
+      assert i != j, (s,n)
+  for instances in range(1,6):
+    for low in range(0,instances + 1):
+      links = [line for line in _selfLinks(instances,low).splitlines() if line.startswith('!insert')]
+      pairs = [line[len('!insert ('):line.index(')')].split(', ') for line in links]
+      for (first,second) in pairs:
+        assert first != second, (instances,low,first)
+      assert len(set([tuple(pair) for pair in pairs])) == len(pairs), (instances,low)
+      if instances * low > instances * (instances - 1):
+        # at least low links per object need low other objects
+        assert len(links) == 0, (instances,low)
+
+if __name__ == '__main__':
+  _selfTest()
+  print 'gensoil: self test passed'
@@ -0,0 +1,124 @@
+#
+# sectioncache
+#
+# Persistent cache of the sections of a generated specification (see
+# SECTION_CACHE_FILE in GenOCL.py), so that a regeneration only renders
+# again the sections whose snapshot record changed since the last run.
+#
+# A section is keyed by the name of the transformation rendering it and
+# the fingerprint of its record, an md5 of the content of the record
+# (nested __slots__ records and lists flattened into tuples of plain
+# values). The sections are pickled with the version of the transformation
+# that rendered them; the sections of another version are never reused.
+#
+#     cache = SectionCache('sections.cache',1)
+#     text = cache.render('umlClass2OCL',rec,lambda: render(rec))
+#     cache.save()
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import os
+import hashlib
+import cPickle
+import threading
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "recordData",
+  "recordFingerprint",
+  "SectionCache" ]
+
+
+def recordData(value):
+  """ Return the content of a snapshot record (or of a list of records)
+      as nested tuples of plain values
+  """
+  if isinstance(value,(list,tuple)):
+    return tuple([recordData(item) for item in value])
+  if hasattr(value,'__slots__'):
+    return (value.__class__.__name__,) + tuple([recordData(getattr(value,slot)) for slot in value.__slots__])
+  return value
+
+def recordFingerprint(rec):
+  """ Return a fingerprint of the content of a snapshot record. The
+      records hold everything their section depends on (names of the
+      super classes, resolved types, ends of the associations, ...).
+      (record) -> str
+  """
+  return hashlib.md5(repr(recordData(rec))).hexdigest()
+
+
+class SectionCache(object):
+  """ Rendered sections of a specification, keyed by the transformation
+      and the fingerprint of the record.
+        path      file where the cache is kept (None for no file)
+        version   version of the transformation rendering the sections
+        sections  rendered sections of the previous run by key
+        used      rendered sections of this run by key
+        reused    number of sections taken from the cache
+        rendered  number of sections rendered in this run
+  """
+  def __init__(self,path=None,version=1):
+    self.path = path
+    self.version = version
+    self.sections = {}
+    self.used = {}
+    self.reused = 0
+    self.rendered = 0
+    # render may be called by several threads
+    self.lock = threading.Lock()
+    if path is not None and os.path.isfile(path):
+      self.load()
+
+  def load(self):
+    """ Read the sections of the previous run. A cache written by another
+        version of the transformation is ignored.
+    """
+    f = open(self.path,'rb')
+    try:
+      try:
+        (version,sections) = cPickle.load(f)
+      except Exception:
+        return
+    finally:
+      f.close()
+    if version == self.version:
+      self.sections = sections
+
+  def save(self):
+    """ Write the sections used in this run, so that the sections of the
+        elements that no longer exist are dropped
+    """
+    if self.path is None:
+      return
+    f = open(self.path,'wb')
+    try:
+      cPickle.dump((self.version,self.used),f,2)
+    finally:
+      f.close()
+
+  def render(self,name,rec,render,suffix=''):
+    """ Return the section of rec rendered by the transformation name,
+        from the cache if rec did not change, by calling render()
+        otherwise. suffix is added to the key for the sections that
+        depend on more than their record.
+        (str,record,() -> str,str?) -> str
+    """
+    key = name + ':' + recordFingerprint(rec) + suffix
+    text = self.sections.get(key)
+    if text is None:
+      text = render()
+    self.lock.acquire()
+    try:
+      if key in self.sections:
+        self.reused = self.reused + 1
+      else:
+        self.rendered = self.rendered + 1
+      self.used[key] = text
+    finally:
+      self.lock.release()
+    return text
@@ -0,0 +1,126 @@
+#
+# snapshotjson
+#
+# JSON files of the snapshot records of GenOCL (see SNAPSHOT_FILE in
+# GenOCL.py), the intermediate representation of a USE model between the
+# reading of the UML model and the rendering of the text, so that the
+# specification or a SOIL script can be rendered again without the model
+# (see GenOCL-Render.py).
+#
+# A record (an object with __slots__) is saved as a JSON object with its
+# slots and the name of its class in 'record'; the contents of a package
+# as an object with its name and one list of records per bucket; the file
+# with the name of the USE model and the contents of the packages:
+#
+#     { "version" : 2,
+#       "modelName" : "CyberResidences",
+#       "packages" : [ { "name" : "CyberResidences",
+#                        "classes" : [ { "record" : "ClassRec", ... } ],
+#                        ... } ] }
+#
+#     format = SnapshotFormat(2,[ClassRec,...],('classes',...),PackageContents)
+#     format.save('snapshot.json','CyberResidences',[('CyberResidences',contents)])
+#     (modelName,packages) = format.load('snapshot.json')
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import json
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "recordToJson",
+  "SnapshotFormat" ]
+
+
+def recordToJson(value):
+  """ Return a snapshot record (or a list of records) as JSON values
+  """
+  if isinstance(value,(list,tuple)):
+    return [recordToJson(item) for item in value]
+  if hasattr(value,'__slots__'):
+    data = {'record' : value.__class__.__name__}
+    for slot in value.__slots__:
+      data[slot] = recordToJson(getattr(value,slot))
+    return data
+  return value
+
+
+class SnapshotFormat(object):
+  """ Snapshot files of a version of the records.
+        version      version of the records, to be increased when they
+                     change (the files of another version are refused)
+        recordTypes  classes of the records by name
+        buckets      attributes of the contents holding lists of records
+        newContents  function returning new empty contents
+  """
+  def __init__(self,version,recordTypes,buckets,newContents):
+    self.version = version
+    self.recordTypes = dict([(recordType.__name__,recordType) for recordType in recordTypes])
+    self.buckets = buckets
+    self.newContents = newContents
+
+  def recordFromJson(self,data):
+    """ Return the snapshot record (or the list of records) of JSON values
+        produced by recordToJson. The texts are utf-8 strings, like the
+        ones read in the model.
+    """
+    if isinstance(data,list):
+      return [self.recordFromJson(item) for item in data]
+    if isinstance(data,dict):
+      rec = self.recordTypes[data['record']]()
+      for slot in rec.__slots__:
+        setattr(rec,slot,self.recordFromJson(data.get(slot)))
+      return rec
+    if isinstance(data,unicode):
+      return data.encode('utf-8')
+    return data
+
+  def contentsToJson(self,name,contents):
+    """ Return the contents of the package named name as JSON values
+    """
+    data = {'name' : name}
+    for bucket in self.buckets:
+      data[bucket] = recordToJson(getattr(contents,bucket))
+    return data
+
+  def contentsFromJson(self,data):
+    """ Return the package name and the contents of JSON values produced
+        by contentsToJson
+    """
+    contents = self.newContents()
+    for bucket in self.buckets:
+      setattr(contents,bucket,self.recordFromJson(data[bucket]))
+    return (self.recordFromJson(data['name']),contents)
+
+  def save(self,path,modelName,packages):
+    """ Save the name of the USE model and a list of (package name,
+        contents) in a JSON file
+        (str,str,[(str,contents)]) -> None
+    """
+    data = {
+      'version' : self.version,
+      'modelName' : modelName,
+      'packages' : [self.contentsToJson(name,contents) for (name,contents) in packages] }
+    f = open(path,'w')
+    try:
+      json.dump(data,f,sort_keys=True,separators=(',',':'))
+    finally:
+      f.close()
+
+  def load(self,path):
+    """ Return the name of the USE model and the list of (package name,
+        contents) saved in a JSON file
+        (str) -> (str,[(str,contents)])
+    """
+    f = open(path)
+    try:
+      data = json.load(f)
+    finally:
+      f.close()
+    if data.get('version') != self.version:
+      raise ValueError('%s: snapshot version %s instead of %s' % (path,data.get('version'),self.version))
+    return (self.recordFromJson(data['modelName']),[self.contentsFromJson(package) for package in data['packages']])
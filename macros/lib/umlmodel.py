@@ -0,0 +1,359 @@
+#
+# umlmodel
+#
+# Lightweight UML model in plain python objects.
+#
+# The classes below have the same names and properties as the Modelio
+# metamodel elements read by GenOCL (ownedElement, ownedAttribute, parent,
+# ownedEnd, linkToClass, descriptor, getUuid(), isIsAbstract(), ...), so
+# that GenOCL can be run outside of Modelio on models built in python,
+# for instance the synthetic models of syntheticModel below. To run GenOCL
+# on such models, these classes must be given to GenOCL in place of the
+# Modelio ones:
+#     execfile('GenOCL.py', umlmodel.genoclNamespace({'GENOCL_AS_LIBRARY' : True}))
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import random
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "Element", "Note", "Package", "Class", "DataType", "Enumeration",
+  "EnumerationLiteral", "Attribute", "Operation", "Parameter", "Generalization",
+  "Association", "AssociationEnd", "ClassAssociation", "NaryAssociation",
+  "NaryAssociationEnd", "Signal", "AggregationKind",
+  "predefinedTypes", "genoclNamespace", "syntheticModel", "modelSize" ]
+
+
+#-----------------------------------------------------------------------------------
+#   Model elements
+#-----------------------------------------------------------------------------------
+
+class Element(object):
+  """ Root of the model elements: a name, a uuid and notes (descriptor)
+  """
+  def __init__(self,name='',uuid=None):
+    self.name = name
+    self.uuid = uuid
+    self.descriptor = []
+  def getUuid(self):
+    return self.uuid
+  def getName(self):
+    return self.name
+  def __repr__(self):
+    return '%s(%s)' % (self.__class__.__name__,self.name)
+
+class Note(Element):
+  def __init__(self,content='',uuid=None):
+    Element.__init__(self,'',uuid)
+    self.content = content
+
+class Package(Element):
+  def __init__(self,name='',uuid=None):
+    Element.__init__(self,name,uuid)
+    self.ownedElement = []
+
+class DataType(Element):
+  pass
+
+class Class(Element):
+  def __init__(self,name='',uuid=None,isAbstract=False):
+    Element.__init__(self,name,uuid)
+    self.isAbstract = isAbstract
+    self.ownedElement = []
+    self.ownedAttribute = []
+    self.ownedOperation = []
+    self.parent = []
+    self.ownedEnd = []
+    self.ownedNaryEnd = []
+    self.linkToAssociation = None
+  def isIsAbstract(self):
+    return self.isAbstract
+
+class Enumeration(Element):
+  def __init__(self,name='',uuid=None):
+    Element.__init__(self,name,uuid)
+    self.value = []
+
+class EnumerationLiteral(Element):
+  pass
+
+class Attribute(Element):
+  def __init__(self,name='',uuid=None,type=None):
+    Element.__init__(self,name,uuid)
+    self.type = type
+    self.multiplicityMin = '1'
+    self.multiplicityMax = '1'
+
+class Parameter(Attribute):
+  pass
+
+class Operation(Element):
+  def __init__(self,name='',uuid=None):
+    Element.__init__(self,name,uuid)
+    self.io = []
+    self.ret = None
+  def getIO(self):
+    return self.io
+  def getReturn(self):
+    return self.ret
+
+class Generalization(Element):
+  def __init__(self,subType=None,superType=None,uuid=None):
+    Element.__init__(self,'',uuid)
+    self.subType = subType
+    self.superType = superType
+
+class AggregationKind(object):
+  KINDISASSOCIATION = 'KindIsAssociation'
+  KINDISAGGREGATION = 'KindIsAggregation'
+  KINDISCOMPOSITION = 'KindIsComposition'
+
+class Association(Element):
+  def __init__(self,name='',uuid=None):
+    Element.__init__(self,name,uuid)
+    self.end = []
+    self.linkToClass = None
+
+class AssociationEnd(Element):
+  """ End of a binary association. As in Modelio the owner of an end is
+      the class from which the end is navigated (its source).
+  """
+  def __init__(self,name='',uuid=None,owner=None,multiplicityMin='0',multiplicityMax='*'):
+    Element.__init__(self,name,uuid)
+    self.owner = owner
+    self.target = None
+    self.opposite = None
+    self.association = None
+    self.multiplicityMin = multiplicityMin
+    self.multiplicityMax = multiplicityMax
+    self.isOrdered = False
+    self.aggregation = AggregationKind.KINDISASSOCIATION
+  def isIsOrdered(self):
+    return self.isOrdered
+
+class ClassAssociation(Element):
+  """ Link between the association and the class of an association class
+  """
+  def __init__(self,associationPart=None,classPart=None,uuid=None):
+    Element.__init__(self,'',uuid)
+    self.associationPart = associationPart
+    self.classPart = classPart
+
+class NaryAssociation(Element):
+  def __init__(self,name='',uuid=None):
+    Element.__init__(self,name,uuid)
+    self.naryEnd = []
+    self.linkToClass = None
+
+class NaryAssociationEnd(AssociationEnd):
+  def __init__(self,name='',uuid=None,owner=None,multiplicityMin='0',multiplicityMax='*'):
+    AssociationEnd.__init__(self,name,uuid,owner,multiplicityMin,multiplicityMax)
+    self.naryAssociation = None
+
+class Signal(Element):
+  pass
+
+
+#-----------------------------------------------------------------------------------
+#   Predefined types and GenOCL namespace
+#-----------------------------------------------------------------------------------
+
+# uuids of the data types of the Modelio PredefinedTypes library
+PREDEFINED_TYPE_IDS = {
+  'boolean' : '00000004-0000-0005-0000-000000000000',
+  'char'    : '00000004-0000-0007-0000-000000000000',
+  'integer' : '00000004-0000-0009-0000-000000000000',
+  'float'   : '00000004-0000-000b-0000-000000000000',
+  'string'  : '00000004-0000-000d-0000-000000000000',
+  'undefined' : '00000004-0000-000f-0000-000000000000',
+  'double'  : '00000004-0000-0010-0000-000000000000',
+  'long'    : '00000004-0000-0011-0000-000000000000',
+  'short'   : '00000004-0000-0012-0000-000000000000',
+  'byte'    : '00000004-0000-0013-0000-000000000000',
+  'date'    : '00000004-0000-0014-0000-000000000000' }
+
+def predefinedTypes():
+  """ Return a new DataType for each predefined type, by name
+      () -> { str : DataType }
+  """
+  return dict([(name,DataType(name,uuid)) for (name,uuid) in PREDEFINED_TYPE_IDS.items()])
+
+def genoclNamespace(namespace=None):
+  """ Return a namespace in which GenOCL.py can be executed on the
+      elements of this module instead of the Modelio elements.
+      (dict?) -> dict
+  """
+  if namespace is None:
+    namespace = {}
+  namespace.update({
+    'Class'           : Class,
+    'Package'         : Package,
+    'Enumeration'     : Enumeration,
+    'Signal'          : Signal,
+    'AggregationKind' : AggregationKind })
+  return namespace
+
+
+#-----------------------------------------------------------------------------------
+#   Synthetic models
+#-----------------------------------------------------------------------------------
+
+class _Factory(object):
+  """ Create elements with deterministic uuids
+  """
+  def __init__(self,seed):
+    self.count = 0
+    self.seed = seed
+  def uuid(self):
+    self.count = self.count + 1
+    return '%08x-0000-0000-0000-%012x' % (self.seed,self.count)
+  def new(self,elementClass,*args,**kwargs):
+    kwargs['uuid'] = self.uuid()
+    return elementClass(*args,**kwargs)
+  def note(self,element,text):
+    element.descriptor.append(Note(text,self.uuid()))
+
+def _linkEnds(association,ends,ownedEndsName):
+  for end in ends:
+    getattr(end.owner,ownedEndsName).append(end)
+
+def syntheticModel(classes=100,attributes=5,operations=2,parameters=2,
+                   inheritanceDepth=3,associations=100,naryAssociations=10,
+                   associationClasses=10,enumerations=10,literals=5,
+                   constraints=20,packages=1,notes=True,seed=1):
+  """ Return the root Package of a synthetic UML model. The model has
+      the given number of classes (spread in the given number of nested
+      packages), of attributes, operations and parameters per class and
+      operation, of associations of each kind, of enumerations with their
+      literals and of constraints (Signals owned by classes). Classes form
+      inheritance chains of inheritanceDepth classes. Attribute types are
+      chosen among the predefined types and the enumerations. Elements are
+      documented with notes if notes is True. The same parameters always
+      give the same model.
+      (...) -> Package
+  """
+  rand = random.Random(seed)
+  factory = _Factory(seed)
+  types = predefinedTypes()
+  basicTypes = [types[name] for name in sorted(types) if name != 'undefined']
+  root = factory.new(Package,'Synthetic')
+  containers = [root]
+  for i in range(1,packages):
+    package = factory.new(Package,'package' + str(i))
+    rand.choice(containers).ownedElement.append(package)
+    containers.append(package)
+
+  enums = []
+  for i in range(enumerations):
+    enum = factory.new(Enumeration,'Enumeration' + str(i))
+    for j in range(literals):
+      enum.value.append(factory.new(EnumerationLiteral,'LITERAL' + str(j)))
+    if notes:
+      factory.note(enum,'enumeration ' + str(i))
+    rand.choice(containers).ownedElement.append(enum)
+    enums.append(enum)
+  attributeTypes = basicTypes + enums
+
+  allClasses = []
+  for i in range(classes):
+    clazz = factory.new(Class,'Class' + str(i),isAbstract=(i % 7 == 0))
+    if inheritanceDepth > 1 and i % inheritanceDepth != 0:
+      superType = allClasses[i - 1]
+      generalization = factory.new(Generalization,clazz,superType)
+      clazz.parent.append(generalization)
+    for j in range(attributes):
+      attribute = factory.new(Attribute,'attribute' + str(j),type=rand.choice(attributeTypes))
+      if notes:
+        factory.note(attribute,'attribute ' + str(j) + ' of class ' + str(i))
+      clazz.ownedAttribute.append(attribute)
+    for j in range(operations):
+      operation = factory.new(Operation,'operation' + str(j))
+      for k in range(parameters):
+        operation.io.append(factory.new(Parameter,'parameter' + str(k),type=rand.choice(attributeTypes)))
+      if j % 2 == 0:
+        operation.ret = factory.new(Parameter,'',type=rand.choice(attributeTypes))
+        if j % 4 == 0:
+          operation.ret.multiplicityMax = '*'
+      if notes:
+        factory.note(operation,'operation ' + str(j) + '\nof class ' + str(i))
+      clazz.ownedOperation.append(operation)
+    if notes:
+      factory.note(clazz,'class ' + str(i))
+    rand.choice(containers).ownedElement.append(clazz)
+    allClasses.append(clazz)
+
+  if len(allClasses) > 0:
+    for i in range(associations):
+      source = rand.choice(allClasses)
+      target = rand.choice(allClasses)
+      name = '' if i % 10 == 9 else 'association' + str(i)
+      association = factory.new(Association,name)
+      sourceEnd = factory.new(AssociationEnd,'source' + str(i),owner=source,multiplicityMin='0',multiplicityMax='1')
+      targetEnd = factory.new(AssociationEnd,'target' + str(i),owner=target,multiplicityMin='0',multiplicityMax='*')
+      targetEnd.isOrdered = (i % 5 == 0)
+      if i % 6 == 0:
+        sourceEnd.aggregation = AggregationKind.KINDISCOMPOSITION
+      elif i % 6 == 3:
+        sourceEnd.aggregation = AggregationKind.KINDISAGGREGATION
+      for end in (sourceEnd,targetEnd):
+        end.association = association
+        association.end.append(end)
+      _linkEnds(association,association.end,'ownedEnd')
+
+    for i in range(associationClasses):
+      source = rand.choice(allClasses)
+      target = rand.choice(allClasses)
+      association = factory.new(Association,'')
+      for (name,owner) in (('from' + str(i),source),('to' + str(i),target)):
+        end = factory.new(AssociationEnd,name,owner=owner)
+        end.association = association
+        association.end.append(end)
+      _linkEnds(association,association.end,'ownedEnd')
+      classPart = factory.new(Class,'AssociationClass' + str(i))
+      attribute = factory.new(Attribute,'since',type=types['date'])
+      classPart.ownedAttribute.append(attribute)
+      if notes:
+        factory.note(classPart,'association class ' + str(i))
+      link = factory.new(ClassAssociation,association,classPart)
+      association.linkToClass = link
+      classPart.linkToAssociation = link
+      rand.choice(containers).ownedElement.append(classPart)
+
+    for i in range(naryAssociations):
+      nary = factory.new(NaryAssociation,'naryAssociation' + str(i))
+      for (j,owner) in enumerate(rand.sample(allClasses,min(3,len(allClasses)))):
+        end = factory.new(NaryAssociationEnd,'member' + str(j),owner=owner)
+        end.naryAssociation = nary
+        nary.naryEnd.append(end)
+      _linkEnds(nary,nary.naryEnd,'ownedNaryEnd')
+
+    for i in range(constraints):
+      signal = factory.new(Signal,'constraint' + str(i))
+      if notes:
+        factory.note(signal,'self.attribute0 <> null')
+      rand.choice(allClasses).ownedElement.append(signal)
+
+  return root
+
+def modelSize(package):
+  """ Return the number of elements of each kind in a package, recursively
+      (Package) -> { str : int }
+  """
+  counts = {}
+  stack = [package]
+  while len(stack) > 0:
+    element = stack.pop()
+    kind = element.__class__.__name__
+    counts[kind] = counts.get(kind,0) + 1
+    for owned in getattr(element,'ownedElement',[]):
+      stack.append(owned)
+    if isinstance(element,Class):
+      counts['Attribute'] = counts.get('Attribute',0) + len(element.ownedAttribute)
+      counts['Operation'] = counts.get('Operation',0) + len(element.ownedOperation)
+      counts['AssociationEnd'] = counts.get('AssociationEnd',0) + len(element.ownedEnd) + len(element.ownedNaryEnd)
+  return counts
@@ -0,0 +1,400 @@
+#
+# usecheck
+#
+# Parser and checker for the subset of the USE specification language
+# generated by GenOCL (model, enum, class, associationclass, association,
+# composition, aggregation, attributes and operations). OCL expressions
+# (constraints sections, derived attributes, operation bodies) are not
+# parsed.
+#
+# The checker reports, with their line numbers:
+#   - syntax errors (unexpected lines, unterminated declarations)
+#   - duplicate names (types, associations, attributes, operations,
+#     literals, roles)
+#   - undeclared types and classes
+#   - bad multiplicities
+#   - superclasses declared after their subclasses
+#   - malformed association ends
+#
+# The text is read in one pass with a few precompiled regular expressions,
+# so that large specifications are checked quickly.
+#
+#     problems = checkUse(text)
+#     for problem in problems: print problem
+#
+# Running the module checks the checker on a few specifications:
+#
+#     python usecheck.py
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import re
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "Problem",
+  "checkUse",
+  "checkUseFile" ]
+
+BASIC_TYPES = set(['Integer','Real','Boolean','String','OclAny','OclVoid'])
+COLLECTION_TYPES = set(['Set','Bag','Sequence','OrderedSet','Collection'])
+ASSOCIATION_KINDS = set(['association','composition','aggregation'])
+
+_IDENTIFIER = r'[A-Za-z_][A-Za-z0-9_]*'
+_isIdentifier = re.compile('^' + _IDENTIFIER + '$').match
+_classHeader = re.compile(r'^(abstract\s+)?class\s+(' + _IDENTIFIER + r')\s*(?:<\s*(.*?))?\s*$').match
+_associationClassHeader = re.compile(r'^(abstract\s+)?associationclass\s+(' + _IDENTIFIER + r')\s*(?:<\s*(.*?))?\s+between\s*$').match
+_associationHeader = re.compile(r'^(association|composition|aggregation)\s+(' + _IDENTIFIER + r')\s+between\s*$').match
+_enumHeader = re.compile(r'^enum\s+(' + _IDENTIFIER + r')\s*(\{.*)?$').match
+_attribute = re.compile(r'^(' + _IDENTIFIER + r')\s*:\s*(.+?)\s*$').match
+_operation = re.compile(r'^(' + _IDENTIFIER + r')\s*\(([^()]*)\)\s*(?::\s*(.+?))?\s*(?:=.*)?$').match
+_end = re.compile(r'^(' + _IDENTIFIER + r')\s*\[([^\]]*)\]\s*(?:role\s+(' + _IDENTIFIER + r'))?\s*(ordered)?\s*$').match
+_collection = re.compile(r'^(' + _IDENTIFIER + r')\s*\((.*)\)$').match
+
+
+class Problem(object):
+  """ A problem found in a specification, at a given line (1 for the first)
+  """
+  __slots__ = ('line','message')
+  def __init__(self,line,message):
+    self.line = line
+    self.message = message
+  def __str__(self):
+    return 'line %d: %s' % (self.line,self.message)
+  def __repr__(self):
+    return 'Problem(%d, %r)' % (self.line,self.message)
+
+
+class _Checker(object):
+  """ State of the check of one specification
+  """
+  def __init__(self):
+    self.problems = []
+    self.types = {}          # type name -> line of its declaration
+    self.associations = {}   # association name -> line of its declaration
+    self.typeUses = []       # (line, type) of the types used
+    self.classUses = []      # (line, class) of the classes of the association ends
+    self.parentUses = []     # (line, class, parent)
+    self.declaration = None  # (kind, name, line) of the open declaration
+    self.section = None      # 'ends', 'attributes', 'operations', 'constraints', 'literals'
+    self.features = {}       # attribute or operation name -> line, in the open declaration
+    self.roles = {}          # role name -> line, in the open association
+    self.ends = 0
+    self.literals = {}
+    self.hasModel = False
+
+  def error(self,line,message):
+    self.problems.append(Problem(line,message))
+
+  #---- declarations -------------------------------------------------------------
+  def declareType(self,line,name):
+    if name in BASIC_TYPES or name in COLLECTION_TYPES:
+      self.error(line,"'%s' is a predefined type" % name)
+    elif name in self.types:
+      self.error(line,"duplicate type '%s' (already declared line %d)" % (name,self.types[name]))
+    else:
+      self.types[name] = line
+
+  def declareAssociation(self,line,name):
+    if name in self.associations:
+      self.error(line,"duplicate association '%s' (already declared line %d)" % (name,self.associations[name]))
+    else:
+      self.associations[name] = line
+
+  def parents(self,line,name,text):
+    if text is None:
+      return
+    for parent in text.split(','):
+      parent = parent.strip()
+      if not _isIdentifier(parent):
+        self.error(line,"malformed superclass '%s' of '%s'" % (parent,name))
+      elif parent == name:
+        self.error(line,"'%s' cannot be its own superclass" % name)
+      else:
+        self.parentUses.append((line,name,parent))
+
+  def open(self,kind,name,line,section):
+    self.declaration = (kind,name,line)
+    self.section = section
+    self.features = {}
+    self.roles = {}
+    self.ends = 0
+    self.literals = {}
+
+  def close(self,line):
+    (kind,name,start) = self.declaration
+    if kind in ASSOCIATION_KINDS or kind == 'associationclass':
+      if self.ends < 2:
+        self.error(start,"association '%s' must have at least two ends" % name)
+      elif kind != 'association' and self.ends > 2:
+        self.error(start,"%s '%s' must have exactly two ends" % (kind,name))
+    if kind == 'enum' and len(self.literals) == 0:
+      self.error(start,"enumeration '%s' has no literal" % name)
+    self.declaration = None
+    self.section = None
+
+  #---- lines --------------------------------------------------------------------
+  def topLine(self,line,text):
+    words = text.split(None,1)
+    keyword = words[0]
+    if keyword == 'model':
+      if self.hasModel:
+        self.error(line,'duplicate model declaration')
+      elif len(words) != 2 or not _isIdentifier(words[1].strip()):
+        self.error(line,'malformed model declaration')
+      self.hasModel = True
+      return
+    if not self.hasModel:
+      self.error(line,"the specification must start with 'model <name>'")
+      self.hasModel = True
+    match = _enumHeader(text)
+    if match is not None:
+      self.declareType(line,match.group(1))
+      self.open('enum',match.group(1),line,'header')
+      if match.group(2) is not None:
+        self.enumLine(line,match.group(2))
+      return
+    match = _classHeader(text)
+    if match is not None:
+      self.declareType(line,match.group(2))
+      self.parents(line,match.group(2),match.group(3))
+      self.open('class',match.group(2),line,None)
+      return
+    match = _associationClassHeader(text)
+    if match is not None:
+      self.declareType(line,match.group(2))
+      self.declareAssociation(line,match.group(2))
+      self.parents(line,match.group(2),match.group(3))
+      self.open('associationclass',match.group(2),line,'ends')
+      return
+    match = _associationHeader(text)
+    if match is not None:
+      self.declareAssociation(line,match.group(2))
+      self.open(match.group(1),match.group(2),line,'ends')
+      return
+    if keyword in ('class','abstract','associationclass','enum') or keyword in ASSOCIATION_KINDS:
+      self.error(line,"malformed %s declaration" % keyword)
+      # skip the body of the declaration
+      self.open('malformed',keyword,line,'skip')
+    else:
+      self.error(line,"unexpected '%s'" % text)
+
+  def enumLine(self,line,text):
+    if self.section == 'header':
+      if not text.startswith('{'):
+        self.error(line,"'{' expected after enum '%s'" % self.declaration[1])
+        return
+      text = text[1:]
+      self.section = 'literals'
+    closed = text.endswith('}')
+    if closed:
+      text = text[:-1]
+    for literal in text.split(','):
+      literal = literal.strip()
+      if len(literal) == 0:
+        continue
+      if not _isIdentifier(literal):
+        self.error(line,"malformed literal '%s'" % literal)
+      elif literal in self.literals:
+        self.error(line,"duplicate literal '%s' (already declared line %d)" % (literal,self.literals[literal]))
+      else:
+        self.literals[literal] = line
+    if closed:
+      self.close(line)
+
+  def useType(self,line,text):
+    text = text.strip()
+    match = _collection(text)
+    if match is not None:
+      if match.group(1) not in COLLECTION_TYPES:
+        self.error(line,"unknown collection type '%s'" % match.group(1))
+      self.useType(line,match.group(2))
+    elif _isIdentifier(text):
+      if text not in BASIC_TYPES:
+        self.typeUses.append((line,text))
+    else:
+      self.error(line,"malformed type '%s'" % text)
+
+  def feature(self,line,name,kind):
+    if name in self.features:
+      self.error(line,"duplicate %s '%s' in '%s' (already declared line %d)" % (kind,name,self.declaration[1],self.features[name]))
+    else:
+      self.features[name] = line
+
+  def attributeLine(self,line,text):
+    match = _attribute(text)
+    if match is None:
+      self.error(line,"malformed attribute '%s'" % text)
+      return
+    self.feature(line,match.group(1),'attribute')
+    self.useType(line,match.group(2))
+
+  def operationLine(self,line,text):
+    match = _operation(text)
+    if match is None:
+      self.error(line,"malformed operation '%s'" % text)
+      return
+    self.feature(line,match.group(1) + '()','operation')
+    parameters = {}
+    for parameter in match.group(2).split(','):
+      if len(parameter.strip()) == 0:
+        continue
+      parameterMatch = _attribute(parameter.strip())
+      if parameterMatch is None:
+        self.error(line,"malformed parameter '%s' of '%s'" % (parameter.strip(),match.group(1)))
+        continue
+      if parameterMatch.group(1) in parameters:
+        self.error(line,"duplicate parameter '%s' of '%s'" % (parameterMatch.group(1),match.group(1)))
+      parameters[parameterMatch.group(1)] = line
+      self.useType(line,parameterMatch.group(2))
+    if match.group(3) is not None:
+      self.useType(line,match.group(3))
+
+  def endLine(self,line,text):
+    match = _end(text)
+    if match is None:
+      self.error(line,"malformed association end '%s'" % text)
+      return
+    self.ends = self.ends + 1
+    self.classUses.append((line,match.group(1)))
+    self.multiplicity(line,match.group(2))
+    role = match.group(3)
+    if role is not None:
+      if role in self.roles:
+        self.error(line,"duplicate role '%s' in '%s' (already used line %d)" % (role,self.declaration[1],self.roles[role]))
+      else:
+        self.roles[role] = line
+
+  def multiplicity(self,line,text):
+    for part in text.split(","):
+      bounds = [bound.strip() for bound in part.split("..")]
+      if len(bounds) > 2 or len(bounds[0]) == 0:
+        self.error(line,"bad multiplicity '[%s]'" % text)
+        return
+      if len(bounds) == 1:
+        bounds = [bounds[0],bounds[0]]
+      (lower,upper) = bounds
+      if not lower.isdigit() and not (lower == '*' and upper == '*'):
+        self.error(line,"bad multiplicity '[%s]': lower bound '%s'" % (text,lower))
+      elif not (upper.isdigit() or upper == '*'):
+        self.error(line,"bad multiplicity '[%s]': upper bound '%s'" % (text,upper))
+      elif upper != '*' and lower != '*' and int(lower) > int(upper):
+        self.error(line,"bad multiplicity '[%s]': lower bound greater than upper bound" % text)
+      elif upper == '0':
+        self.error(line,"bad multiplicity '[%s]': upper bound 0" % text)
+
+  def bodyLine(self,line,text):
+    kind = self.declaration[0]
+    if self.section == 'skip':
+      if text == 'end' or text == '}':
+        self.declaration = None
+        self.section = None
+      return
+    if kind == 'enum':
+      self.enumLine(line,text)
+      return
+    if text == 'end':
+      self.close(line)
+      return
+    if text in ('attributes','operations','constraints','statemachines'):
+      # an association class with less than two ends is reported by close
+      if kind in ASSOCIATION_KINDS:
+        self.error(line,"'%s' section in association '%s'" % (text,self.declaration[1]))
+      self.section = text
+      return
+    if self.section == 'ends':
+      self.endLine(line,text)
+    elif self.section == 'attributes':
+      self.attributeLine(line,text)
+    elif self.section == 'operations':
+      self.operationLine(line,text)
+    elif self.section in ('constraints','statemachines'):
+      pass # OCL is not checked
+    else:
+      self.error(line,"unexpected '%s' in '%s'" % (text,self.declaration[1]))
+
+  #---- whole specification ------------------------------------------------------
+  def check(self,text):
+    line = 0
+    for rawLine in text.splitlines():
+      line = line + 1
+      comment = rawLine.find('--')
+      if comment >= 0:
+        rawLine = rawLine[:comment]
+      stripped = rawLine.strip()
+      if len(stripped) == 0:
+        continue
+      if self.declaration is None:
+        self.topLine(line,stripped)
+      else:
+        self.bodyLine(line,stripped)
+    if self.declaration is not None:
+      self.error(self.declaration[2],"declaration of '%s' is not terminated" % self.declaration[1])
+    if not self.hasModel:
+      self.error(1,"the specification must start with 'model <name>'")
+    self.checkReferences()
+    self.problems.sort(key=lambda problem: problem.line)
+    return self.problems
+
+  def checkReferences(self):
+    for (line,name) in self.typeUses:
+      if name not in self.types:
+        self.error(line,"undeclared type '%s'" % name)
+    for (line,name) in self.classUses:
+      if name not in self.types:
+        self.error(line,"undeclared class '%s' in association end" % name)
+    for (line,name,parent) in self.parentUses:
+      if parent not in self.types:
+        self.error(line,"undeclared superclass '%s' of '%s'" % (parent,name))
+      elif self.types[parent] > line:
+        self.error(line,"superclass '%s' of '%s' is declared after it (line %d)" % (parent,name,self.types[parent]))
+
+
+def checkUse(text):
+  """ Check a USE specification and return the list of the problems found,
+      sorted by line number (empty if the specification is correct)
+      (str) -> [ Problem ]
+  """
+  return _Checker().check(text)
+
+def checkUseFile(path):
+  """ Check the USE specification in a file
+      (str) -> [ Problem ]
+  """
+  f = open(path)
+  try:
+    return checkUse(f.read())
+  finally:
+    f.close()
+
+
+#-----------------------------------------------------------------------------------
+#   Self test
+#-----------------------------------------------------------------------------------
+
+def _problems(text):
+  return [(problem.line,problem.message) for problem in checkUse(text)]
+
+def _selfTest():
+  """ Check the checker on small specifications, raise AssertionError
+      on the first wrong result
+  """
+  assert _problems('model M\n\nclass A\nend\n') == []
+  # an association with less than two ends is reported once, at its
+  # header, with or without a section after its ends
+  oneEnd = 'model M\n\nclass A\nend\n\nassociationclass R between\n\tA[0..1] role a\n%send\n'
+  expected = [(6,"association 'R' must have at least two ends")]
+  assert _problems(oneEnd % '') == expected, _problems(oneEnd % '')
+  assert _problems(oneEnd % 'attributes\n\tx : Integer\n') == expected, _problems(oneEnd % 'attributes\n\tx : Integer\n')
+  assert _problems('model M\n\nclass A\nend\n\nassociation R between\nend\n') == [
+    (6,"association 'R' must have at least two ends")]
+  assert _problems('model M\n\nclass A < B\nend\n\nclass B\nend\n') == [
+    (3,"superclass 'B' of 'A' is declared after it (line 6)")]
+
+if __name__ == '__main__':
+  _selfTest()
+  print 'usecheck: self test passed'
@@ -0,0 +1,127 @@
+#
+# usepatch
+#
+# In-place update of a .use file with a new version of its text, writing
+# only the declarations that changed (see PATCH_OUTPUT_FILE in GenOCL.py),
+# so that tools watching the file see small changes and the unchanged part
+# of a large file is not written again.
+#
+# The text is split into declaration blocks (class, association, enum,
+# ...) ending with their 'end' or '}' line, each block including the
+# comments and blank lines before its declaration. The blocks of the file
+# and of the new text are compared in order:
+#   - a changed block of the same size is overwritten in place,
+#   - from the first block whose size changed, the rest of the file is
+#     rewritten and the file is truncated at the end of the new text.
+#
+#     written = patchUseFile('CyberResidences.use', text)
+#     print '%d declaration(s) written' % len(written)
+#
+# Compatibility: Jython 2.7, python 2.7
+#
+
+import os
+
+#-----------------------------------------------------------------------------------
+#   Interface
+#-----------------------------------------------------------------------------------
+# exported symbols for this module
+__all__ = [
+  "USE_DECLARATIONS",
+  "useBlocks",
+  "useDeclaration",
+  "patchUseFile" ]
+
+# Keywords starting the declarations of a .use file
+USE_DECLARATIONS = ('class','abstract','associationclass','association','composition','aggregation','enum')
+
+
+def useBlocks(text):
+  """ Split the text of a .use file into declaration blocks. A block goes
+      up to the end of a declaration ('end' or '}' line) and includes the
+      comments and blank lines before the declaration. The text after the
+      last declaration is the last block, so the blocks joined give back
+      the text.
+      (str) -> [str]
+  """
+  blocks = []
+  start = 0
+  position = 0
+  inDeclaration = False
+  for line in text.splitlines(True):
+    position = position + len(line)
+    words = line.split()
+    if len(words) == 0:
+      continue
+    if not inDeclaration and words[0] in USE_DECLARATIONS:
+      inDeclaration = True
+    elif inDeclaration and words[0] in ('end','}') and len(words) == 1:
+      inDeclaration = False
+      blocks.append(text[start:position])
+      start = position
+  blocks.append(text[start:])
+  return blocks
+
+def useDeclaration(block):
+  """ Return the first line of the declaration of a block
+      (str) -> str
+  """
+  for line in block.splitlines():
+    words = line.split()
+    if len(words) > 0 and words[0] in USE_DECLARATIONS:
+      return line.strip()
+  return ''
+
+def patchUseFile(path,text):
+  """ Update the .use file at path so that it contains text, only writing
+      the declaration blocks that changed. The file is not touched at all
+      if it already contains text. Return the declarations written.
+      (str,str) -> [str]
+  """
+  if not os.path.isfile(path):
+    f = open(path,'wb')
+    try:
+      f.write(text)
+    finally:
+      f.close()
+    return [useDeclaration(block) for block in useBlocks(text)]
+
+  f = open(path,'rb')
+  try:
+    previous = f.read()
+  finally:
+    f.close()
+  if '\r\n' in previous:
+    # keep the line endings of the file
+    text = text.replace('\r\n','\n').replace('\n','\r\n')
+  if previous == text:
+    return []
+
+  oldBlocks = useBlocks(previous)
+  newBlocks = useBlocks(text)
+  written = []
+  offset = 0
+  f = open(path,'r+b')
+  try:
+    for (i,block) in enumerate(newBlocks):
+      oldBlock = None
+      if i < len(oldBlocks):
+        oldBlock = oldBlocks[i]
+      if block == oldBlock:
+        offset = offset + len(block)
+      elif oldBlock is not None and len(block) == len(oldBlock):
+        f.seek(offset)
+        f.write(block)
+        written.append(useDeclaration(block))
+        offset = offset + len(block)
+      else:
+        f.seek(offset)
+        f.write(''.join(newBlocks[i:]))
+        unchanged = set(oldBlocks)
+        written.extend([useDeclaration(b) for b in newBlocks[i:] if b not in unchanged])
+        offset = offset + sum([len(b) for b in newBlocks[i:]])
+        break
+    f.truncate(offset)
+  finally:
+    f.close()
+  return written